@@ -1,4 +1,8 @@
 from .ofd import OFD
+from .draw.draw_img import RasterOptions
+from .cache import ConversionCache, DocumentCache
+from .aio import AsyncExecutor
+from .stats import ConversionStats
 from importlib.metadata import version, PackageNotFoundError
 
 try:
@@ -8,4 +12,4 @@ except PackageNotFoundError:
 __author__ = "ihadyou"
 __email__ = "wohen@nivbi.com"
 __description__ = "一个用于OFD文档处理的Python库"
-__all__ = ["OFD"]
\ No newline at end of file
+__all__ = ["OFD", "RasterOptions", "ConversionCache", "DocumentCache", "AsyncExecutor", "ConversionStats"]
\ No newline at end of file
@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 16:40
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: python -m fastofd
+import sys
+
+from fastofd.cli import main
+
+sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 17:45
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: asyncio 支持，解析/绘制/栅格化放到执行器中，不阻塞事件循环
+import asyncio
+import concurrent.futures
+import functools
+import multiprocessing
+import threading
+import weakref
+
+import fitz
+
+
+class AsyncExecutor(object):
+    """
+    asyncio 执行器
+    executor: concurrent.futures 线程池或进程池，None 时创建内部线程池
+    max_concurrency: 同时执行的任务上限（按事件循环计），默认等于执行器的 worker 数
+    线程池下直接调用 OFD 对象的方法，缓存等状态照常生效；
+    进程池下只把 data / pdf 字节等参数 pickle 给子进程，OFD 上配置的缓存不参与
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor = None, max_concurrency=None):
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency or min(4, multiprocessing.cpu_count()),
+                                                             thread_name_prefix="fastofd-aio")
+        self.executor = executor
+        self.max_concurrency = max_concurrency or getattr(executor, "_max_workers", None) or 4
+        self.in_process = not isinstance(executor, concurrent.futures.ProcessPoolExecutor)
+        self._semaphores = weakref.WeakKeyDictionary()  # 每个事件循环一个信号量
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def run(self, func, *args, **kwargs):
+        """在执行器中运行 func，受 max_concurrency 限制"""
+        async with self._semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+_default_executor = None
+_default_lock = threading.Lock()
+
+
+def get_default_executor() -> AsyncExecutor:
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = AsyncExecutor()
+        return _default_executor
+
+
+def set_default_executor(executor: AsyncExecutor):
+    """替换默认执行器，例如 AsyncExecutor(ProcessPoolExecutor(4), max_concurrency=4)"""
+    global _default_executor
+    with _default_lock:
+        _default_executor = executor
+
+
+def parse_ofd(ofd_f, fmt, with_hash=False):
+    """子进程任务：解析并返回 data；with_hash 时返回 (data, 内容哈希)，供主进程的转换缓存寻址"""
+    from fastofd.cache import content_hash
+    from fastofd.ofd import OFD
+
+    if not with_hash:
+        ofd = OFD()
+        ofd.read(ofd_f, fmt=fmt)
+        return ofd.data
+    ofd_bytes = OFD._read_bytes(ofd_f, fmt)
+    ofd = OFD()
+    ofd.read(ofd_bytes, fmt="binary")
+    return ofd.data, content_hash(ofd_bytes)
+
+
+def draw_pdf(data, kwargs):
+    """子进程任务：data 绘制为 pdf 字节"""
+    from fastofd.draw.draw_pdf import DrawPDF
+
+    return DrawPDF(data, **kwargs).draw_pdf()
+
+
+# MuPDF 的上下文不支持多线程并发使用，线程池下的 fitz 调用经此锁串行
+FITZ_LOCK = threading.Lock()
+
+
+def page_count(pdfbytes):
+    with FITZ_LOCK, fitz.open(stream=pdfbytes, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def open_pdf(pdfbytes):
+    """线程池任务：打开 pdf，文档在整个迭代过程中复用"""
+    with FITZ_LOCK:
+        return fitz.open(stream=pdfbytes, filetype="pdf")
+
+
+def close_pdf(doc):
+    with FITZ_LOCK:
+        doc.close()
+
+
+def render_pages(draw_img, doc, page_idx_list):
+    """线程池任务：在已打开的文档上渲染一段页码，返回 [图片]"""
+    with FITZ_LOCK:
+        return [draw_img.render_page(doc[page_idx]) for page_idx in page_idx_list]
+
+
+def render_pdf_range(pdfbytes, page_idx_list, options):
+    """
+    进程池任务：打开一次 pdf，渲染一段页码，pdf 字节每个区间只 pickle 一次
+    返回 {页索引: 编码字节 | (mode, width, height, samples)}
+    """
+    from fastofd.draw.draw_img import _render_bytes
+
+    return _render_bytes(pdfbytes, page_idx_list, {"options": options})
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 16:05
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 批量转换
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+
+from loguru import logger
+
+from fastofd.cache import file_hash
+from fastofd.draw.draw_img import RasterOptions
+
+# 单个文件的默认墙钟超时秒数：进程池模式与受监管模式共用
+DEFAULT_TIMEOUT = 300
+
+
+def iter_sources(inputs, recursive=True, suffix=".ofd"):
+    """
+    展开输入，产出 (源文件路径, 相对输出路径不含后缀)
+    目录按 suffix 过滤并保留子目录结构，文件原样产出
+    """
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = [inputs]
+    for item in inputs:
+        item = os.fspath(item)
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                if not recursive:
+                    dirs.clear()
+                for name in sorted(files):
+                    if name.lower().endswith(suffix):
+                        src = os.path.join(root, name)
+                        yield src, os.path.splitext(os.path.relpath(src, item))[0]
+        else:
+            yield item, os.path.splitext(os.path.basename(item))[0]
+
+
+def convert_file(src, dst, task):
+    """
+    转换单个文件，异常不外抛，返回结果字典
+    dst: 输出路径不含后缀；pdf 流式写入临时文件后改名，jpg 逐页写出
+    """
+    # 子进程内导入，避免父进程为调度任务加载绘制依赖
+    from fastofd.ofd import OFD
+
+    start = time.time()
+    result = {"src": src, "hash": None, "status": "ok", "outputs": [], "pages": 0, "seconds": 0, "error": None}
+    try:
+        result["hash"] = file_hash(src)
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        ofd = OFD()
+        # 图片、签章值在绘制到对应页面时才从源文件读取，大文件峰值内存不随图片总量增长
+        ofd.read(src, fmt="path", lazy=True)
+        if task["to"] == "pdf":
+            out_path = f"{dst}.pdf"
+            tmp_path = f"{out_path}.part"
+            ofd.to_pdf(render_mode=task["render_mode"], with_signature=task["with_signature"], output=tmp_path)
+            os.replace(tmp_path, out_path)
+            result["outputs"].append(out_path)
+            result["pages"] = len(ofd.page_nos())
+        else:
+            options = task["raster_options"]
+            for pg_no, img in ofd.iter_images(render_mode=task["render_mode"], with_signature=task["with_signature"],
+                                               options=options):
+                out_path = f"{dst}_{pg_no}.{options.suffix}"
+                with open(out_path, "wb") as f:
+                    f.write(img)
+                result["outputs"].append(out_path)
+                result["pages"] += 1
+        ofd.del_data()
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc(limit=5)
+    result["seconds"] = round(time.time() - start, 3)
+    return result
+
+
+def _failed_result(job, error):
+    """子进程崩溃或超时被杀：清理残留的临时 pdf，生成失败结果"""
+    src, dst = job[0], job[1]
+    if os.path.exists(f"{dst}.pdf.part"):
+        os.remove(f"{dst}.pdf.part")
+    return {"src": src, "hash": None, "status": "error", "outputs": [], "pages": 0, "seconds": 0, "error": error}
+
+
+def _crash_result(job):
+    return _failed_result(job, "worker process crashed")
+
+
+def _kill_pool(executor):
+    """进程池中的任务无法单独中止：杀掉全部子进程后丢弃进程池"""
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.kill()
+    executor.shutdown(wait=False)
+
+
+def run_pool(func, jobs, record, on_crash, workers, max_pending, timeout=None, on_timeout=None):
+    """
+    进程池执行 func(*job)，结果交给 record(result)
+    在途任务数有界（max_pending），jobs 按需取用；进程池崩溃后重建，在途任务进入 suspects 逐个重试，
+    单独执行仍崩溃的任务由 on_crash(job) 生成失败结果
+    timeout: 单个任务墙钟超时秒数，超时的任务由 on_timeout(job)（默认 on_crash）生成失败结果，
+        杀掉进程池后重建，其余在途任务重新提交；指定时在途任务数不超过 workers，提交即开始执行，按提交时间计时
+    """
+    on_timeout = on_timeout or on_crash
+    suspects = deque()
+    requeued = deque()
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    pending = {}  # {future: (job, retried, 提交时间)}
+    try:
+        while True:
+            # 怀疑对象逐个执行，崩溃即可确定是该任务导致
+            isolating = suspects or any(retried for _, retried, _ in pending.values())
+            limit = 1 if isolating else (min(max_pending, workers) if timeout else max_pending)
+            while len(pending) < limit:
+                if suspects:
+                    job, retried = suspects.popleft(), True
+                elif requeued:
+                    job, retried = requeued.popleft(), False
+                else:
+                    job, retried = next(jobs, None), False
+                    if job is None:
+                        break
+                pending[executor.submit(func, *job)] = (job, retried, time.time())
+            if not pending:
+                break
+
+            wait_timeout = None
+            if timeout:
+                wait_timeout = max(0, min(started for _, _, started in pending.values()) + timeout - time.time())
+            finished, _ = concurrent.futures.wait(pending, timeout=wait_timeout,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                job, retried, _ = pending.pop(future)
+                try:
+                    record(future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    if retried:
+                        record(on_crash(job))
+                    else:
+                        suspects.append(job)
+            if broken:
+                for future, (job, retried, _) in pending.items():
+                    suspects.append(job)
+                pending.clear()
+                executor.shutdown(wait=False)
+                logger.warning(f"子进程异常退出，重建进程池，{len(suspects)} 个任务逐个重试")
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+                continue
+
+            now = time.time()
+            expired = [future for future, (_, _, started) in pending.items()
+                       if timeout and not future.done() and now - started >= timeout]
+            if expired:
+                for future in expired:
+                    job, _, _ = pending.pop(future)
+                    record(on_timeout(job))
+                for future, (job, retried, _) in pending.items():
+                    (suspects if retried else requeued).append(job)
+                pending.clear()
+                _kill_pool(executor)
+                logger.warning(f"{len(expired)} 个任务超过 {timeout}s，重建进程池，"
+                               f"{len(requeued) + len(suspects)} 个在途任务重新提交")
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class BatchConverter(object):
+    """
+    批量转换 ofd 为 pdf / 图片
+    进程池并行，在途任务数有界（max_pending），源文件列表按需展开，不会一次性提交全部任务；
+    每个文件的结果追加写入 manifest（jsonl），重跑时跳过 manifest 中已成功且哈希一致、输出仍存在的文件；
+    单个文件异常只记录失败，子进程崩溃时重建进程池，受影响的文件逐个重试以定位出错文件
+    to: pdf | jpg
+    workers: 0/None 表示 CPU 核数
+    timeout / memory_limit_mb / max_jobs_per_worker: 任一指定时改用受监管模式（见 supervisor.SupervisedWorker），
+        每个文件有墙钟超时与内存上限，超限时杀掉子进程并记录失败，子进程执行 max_jobs_per_worker 个文件后重启；
+        均未指定时进程池模式下每个文件同样有 DEFAULT_TIMEOUT 秒的超时，超时杀掉进程池后重建
+    """
+
+    def __init__(self, output_dir, to="pdf", workers=0, render_mode="line", with_signature=True,
+                 raster_options: RasterOptions = None, manifest=None, max_pending=None, recursive=True,
+                 timeout=None, memory_limit_mb=None, max_jobs_per_worker=None):
+        assert to in ("pdf", "jpg"), f"to Error: {to}"
+        self.output_dir = output_dir
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_pending = max_pending or self.workers * 2
+        self.manifest = manifest
+        self.recursive = recursive
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.task = {
+            "to": to,
+            "render_mode": render_mode,
+            "with_signature": with_signature,
+            "raster_options": raster_options or RasterOptions(fmt="jpeg"),
+        }
+        if to == "jpg":
+            assert self.task["raster_options"].fmt in ("png", "jpeg"), "批量输出图片需要 png/jpeg 编码"
+
+    def load_manifest(self):
+        """读取 manifest，返回 {源文件: 成功记录}，后写入的记录覆盖先前的"""
+        done = {}
+        if not self.manifest or not os.path.exists(self.manifest):
+            return done
+        with open(self.manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 上次中断时写了一半的行
+                if record.get("status") == "ok":
+                    done[record["src"]] = record
+                else:
+                    done.pop(record.get("src"), None)
+        return done
+
+    @staticmethod
+    def is_done(src, record):
+        if not record or not all(os.path.exists(p) for p in record.get("outputs", [])):
+            return False
+        try:
+            return file_hash(src) == record.get("hash")
+        except OSError:
+            return False
+
+    def run(self, inputs, callback=None):
+        """
+        执行批量转换，返回汇总
+        callback: 每完成一个文件调用一次 callback(result)
+        """
+        start = time.time()
+        done = self.load_manifest()
+        summary = {"total": 0, "ok": 0, "failed": 0, "skipped": 0, "pages": 0, "seconds": 0,
+                   "failures": [], "slowest": []}
+        timings = []
+
+        manifest_f = open(self.manifest, "a", encoding="utf-8") if self.manifest else None
+
+        def record(result):
+            summary["total"] += 1
+            if result["status"] == "ok":
+                summary["ok"] += 1
+                summary["pages"] += result["pages"]
+            else:
+                summary["failed"] += 1
+                summary["failures"].append({"src": result["src"], "error": result["error"],
+                                            "seconds": result["seconds"]})
+                logger.warning(f"转换失败 {result['src']}: {result['error']}")
+            timings.append((result["seconds"], result["src"]))
+            if manifest_f:
+                result = {k: v for k, v in result.items() if k != "traceback"}
+                manifest_f.write(json.dumps(result, ensure_ascii=False) + "\n")
+                manifest_f.flush()
+            if callback:
+                callback(result)
+
+        def jobs():
+            for src, rel in iter_sources(inputs, recursive=self.recursive):
+                if self.is_done(src, done.get(src)):
+                    summary["skipped"] += 1
+                    continue
+                yield src, os.path.join(self.output_dir, rel)
+
+        try:
+            if self.timeout or self.memory_limit_mb or self.max_jobs_per_worker:
+                self._run_supervised(jobs(), record)
+            else:
+                self._run_pool(jobs(), record)
+        finally:
+            if manifest_f:
+                manifest_f.close()
+
+        timings.sort(reverse=True)
+        summary["slowest"] = [{"src": src, "seconds": seconds} for seconds, src in timings[:5]]
+        summary["seconds"] = round(time.time() - start, 3)
+        logger.info(f"批量转换完成 成功 {summary['ok']} 失败 {summary['failed']} 跳过 {summary['skipped']} "
+                    f"耗时 {summary['seconds']}s")
+        return summary
+
+    def _run_pool(self, jobs, record):
+        """有界提交，崩溃隔离见 run_pool"""
+        run_pool(convert_file, ((src, dst, self.task) for src, dst in jobs), record, _crash_result,
+                 workers=self.workers, max_pending=self.max_pending, timeout=DEFAULT_TIMEOUT,
+                 on_timeout=lambda job: _failed_result(job, f"timeout: 超过 {DEFAULT_TIMEOUT}s 未完成"))
+
+    def _run_supervised(self, jobs, record):
+        """workers 个线程各自持有一个受监管子进程，从共享的任务迭代器取任务"""
+        from fastofd.supervisor import SupervisedWorker
+
+        lock = threading.Lock()
+
+        def next_job():
+            with lock:
+                return next(jobs, None)
+
+        def loop():
+            worker = SupervisedWorker(timeout=self.timeout or DEFAULT_TIMEOUT,
+                                      memory_limit_mb=self.memory_limit_mb, max_jobs=self.max_jobs_per_worker or 50)
+            try:
+                while True:
+                    job = next_job()
+                    if job is None:
+                        break
+                    src, dst = job
+                    reply = worker.run(convert_file, src, dst, self.task)
+                    if reply["status"] == "ok":
+                        result = reply["result"]
+                    else:
+                        result = _failed_result(job, f"{reply['error_type']}: {reply['error']}")
+                        result["seconds"] = reply["seconds"]
+                    with lock:
+                        record(result)
+            finally:
+                worker.stop()
+
+        threads = [threading.Thread(target=loop, name=f"fastofd-batch-{i}") for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+def convert(inputs, output_dir, to="pdf", workers=0, manifest=None, callback=None, **kwargs):
+    """批量转换快捷入口，参数见 BatchConverter"""
+    return BatchConverter(output_dir, to=to, workers=workers, manifest=manifest, **kwargs).run(inputs,
+                                                                                               callback=callback)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 19:00
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 性能基准：合成 ofd 样本 + 分阶段计时
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import zipfile
+
+import xmltodict
+from PIL import Image
+
+from fastofd.draw.ofdtemplate import CurId, OFDTemplate, DocumentTemplate, DocumentResTemplate, \
+    PublicResTemplate, ContentTemplate, OFDStructure
+
+STAGES = ("read", "parse", "render", "rasterize", "pdf2ofd")
+_HANZI = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
+
+
+def _image_bytes(size, fmt, seed):
+    rnd = random.Random(seed)
+    img = Image.new("RGB", size, (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    # 加少量噪点，避免纯色图片被压缩得过小而失真
+    pixels = img.load()
+    for _ in range(size[0] * size[1] // 50):
+        pixels[rnd.randrange(size[0]), rnd.randrange(size[1])] = (rnd.randrange(256),) * 3
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG" if fmt == "jpg" else fmt.upper())
+    return buf.getvalue()
+
+
+def _seal_value(seed):
+    """签章 SignedValue：DER SEQUENCE 中包含一张 png 印章图片"""
+    from pyasn1.codec.der.encoder import encode
+    from pyasn1.type import univ
+
+    seal = io.BytesIO()
+    Image.new("RGB", (120, 120), (220, 30, 30)).save(seal, format="PNG")
+    seq = univ.Sequence()
+    seq.setComponentByPosition(0, univ.Integer(seed))
+    seq.setComponentByPosition(1, univ.OctetString(b"fastofd bench seal"))
+    seq.setComponentByPosition(2, univ.OctetString(seal.getvalue()))
+    return encode(seq)
+
+
+def make_ofd(pages=10, texts_per_page=40, paths_per_page=20, images=1, images_per_page=1, image_size=(400, 300),
+             image_format="jpg", seals=1, template=True, page_size=(210, 297), seed=0, cross_page_seal=False):
+    """
+    用 ofdtemplate 生成合成 ofd，返回 bytes
+    texts_per_page: 每页文本行数；paths_per_page: 每页线段数（横竖交替，近似表格）
+    images: 不同图片资源数；images_per_page: 每页图片对象数，轮流引用图片资源
+    seals: 签章数，依次盖在前 seals 页；template: 是否带模板页
+    cross_page_seal: 骑缝章，每个签章盖在所有页上，签章值只有一份
+    """
+    assert image_format in ("jpg", "png", "bmp"), f"image_format Error: {image_format}"
+    rnd = random.Random(seed)
+    width, height = page_size
+    # 模板类在组装时 print 调试信息
+    with contextlib.redirect_stdout(io.StringIO()):
+        id_obj = CurId()
+        ofd_entrance = OFDTemplate(id_obj=id_obj, CreationDate=time.strftime("%Y-%m-%d"))
+        multi_media = [{"@ID": 0, "@Type": "Image", "ofd:MediaFile": f"Image_{i}.{image_format}",
+                        "res_uuid": f"img{i}"} for i in range(images)]
+        document_res = DocumentResTemplate(MultiMedia=multi_media, id_obj=id_obj)
+        public_res = PublicResTemplate(Font=[{"@ID": 0, "@FontName": "宋体", "@FamilyName": "宋体",
+                                              "res_uuid": "font0"}], id_obj=id_obj)
+        page_refs = [{"@ID": 0, "@BaseLoc": f"Pages/Page_{i}/Content.xml"} for i in range(pages)]
+        document = DocumentTemplate(Page=page_refs, PhysicalBox=f"0 0 {width} {height}", id_obj=id_obj)
+
+        content_res = []
+        line_height = max(4.0, (height - 40) / max(1, texts_per_page))
+        for pg in range(pages):
+            texts = []
+            for j in range(texts_per_page):
+                count = rnd.randint(8, 30)
+                size = min(4.0, line_height * 0.8)
+                texts.append({
+                    "@ID": 0,
+                    "res_uuid": "font0",
+                    "@Font": "",
+                    "@Boundary": f"15 {20 + j * line_height:.2f} {count * size:.2f} {line_height:.2f}",
+                    "@Size": f"{size:.2f}",
+                    "ofd:FillColor": {"@Value": "0 0 0"},
+                    "ofd:TextCode": {"@X": "0", "@Y": f"{size:.2f}", "@DeltaX": f"g {count - 1} {size:.2f}",
+                                     "#text": "".join(rnd.choice(_HANZI) for _ in range(count))},
+                })
+            image_objects = []
+            for k in range(images_per_page if images else 0):
+                w, h = 40, 40 * image_size[1] / image_size[0]
+                x, y = 20 + (k % 3) * 60, height - 20 - h - (k // 3) * (h + 5)
+                image_objects.append({"@ID": 0, "res_uuid": f"img{(pg + k) % images}", "@ResourceID": "",
+                                      "@CTM": f"{w} 0 0 {h:.2f} 0 0", "@Boundary": f"{x} {y:.2f} {w} {h:.2f}"})
+            content = ContentTemplate(PhysicalBox=f"0 0 {width} {height}", TextObject=texts,
+                                      ImageObject=image_objects, CGTransform=[], PathObject=[], id_obj=id_obj)
+            # 模板里没有 PathObject 节点，直接补到图层中
+            path_objects = []
+            for j in range(paths_per_page):
+                if j % 2:
+                    x = 15 + (j // 2) * (width - 30) / max(1, paths_per_page // 2)
+                    boundary, data = f"{x:.2f} 20 0.5 {height - 60}", f"M 0 0 L 0 {height - 60}"
+                else:
+                    y = 20 + (j // 2) * (height - 60) / max(1, paths_per_page // 2)
+                    boundary, data = f"15 {y:.2f} {width - 30} 0.5", f"M 0 0 L {width - 30} 0"
+                path_objects.append({"@ID": f"{id_obj.get_id()}", "@Boundary": boundary, "@LineWidth": "0.25",
+                                     "ofd:AbbreviatedData": data})
+            page_json = content.final_json["ofd:Page"]
+            page_json["ofd:Content"]["ofd:Layer"]["ofd:PathObject"] = path_objects
+            content_res.append(content)
+
+        extra_files = {}
+        if template:
+            tpl_id = f"{id_obj.get_id()}"
+            tpl_text = [{"@ID": 0, "res_uuid": "font0", "@Font": "", "@Boundary": f"15 8 {width - 30} 6",
+                         "@Size": "4", "ofd:TextCode": {"@X": "0", "@Y": "4", "@DeltaX": "g 7 4",
+                                                        "#text": "合成样本页眉模板"}}]
+            tpl = ContentTemplate(PhysicalBox=f"0 0 {width} {height}", TextObject=tpl_text, ImageObject=[],
+                                  CGTransform=[], PathObject=[], id_obj=id_obj)
+            document.final_json["ofd:Document"]["ofd:CommonData"]["ofd:TemplatePage"] = {
+                "@ID": tpl_id, "@BaseLoc": "Tpls/Tpl_0/Content.xml"}
+            for content in content_res:
+                content.final_json["ofd:Page"]["ofd:Template"] = {"@TemplateID": tpl_id}
+            extra_files["Doc_0/Tpls/Tpl_0/Content.xml"] = xmltodict.unparse(tpl.final_json, pretty=True)
+
+        seals = min(seals, pages)
+        if seals:
+            ns = "http://www.ofdspec.org/2016"
+            ofd_entrance.final_json["ofd:OFD"]["ofd:DocBody"][0]["ofd:Signatures"] = "Doc_0/Signs/Signatures.xml"
+            page_ids = [ref["@ID"] for ref in document.final_json["ofd:Document"]["ofd:Pages"]["ofd:Page"]]
+            extra_files["Doc_0/Signs/Signatures.xml"] = xmltodict.unparse({"ofd:Signatures": {
+                "@xmlns:ofd": ns, "ofd:MaxSignId": seals,
+                "ofd:Signature": [{"@ID": i + 1, "@Type": "Seal", "@BaseLoc": f"/Doc_0/Signs/Sign_{i}/Signature.xml"}
+                                  for i in range(seals)]}})
+            for i in range(seals):
+                stamp_pages = page_ids if cross_page_seal else [page_ids[i]]
+                stamp_annots = [{"@ID": i * pages + j + 1, "@PageRef": page_id,
+                                 "@Boundary": f"{width - 60 - i * 45} {height - 70} 40 40"}
+                                for j, page_id in enumerate(stamp_pages)]
+                extra_files[f"Doc_0/Signs/Sign_{i}/Signature.xml"] = xmltodict.unparse({"ofd:Signature": {
+                    "@xmlns:ofd": ns,
+                    "ofd:SignedInfo": {"ofd:StampAnnot": stamp_annots},
+                    "ofd:SignedValue": f"/Doc_0/Signs/Sign_{i}/SignedValue.dat"}})
+                extra_files[f"Doc_0/Signs/Sign_{i}/SignedValue.dat"] = _seal_value(seed + i)
+
+        res_static = {f"Image_{i}.{image_format}": _image_bytes(image_size, image_format, seed + i)
+                      for i in range(images)}
+        ofd_bytes = OFDStructure("bench", ofd=ofd_entrance, document=document, public_res=public_res,
+                                 document_res=document_res, content_res=content_res,
+                                 res_static=res_static)(test=False)
+
+    if extra_files:
+        buf = io.BytesIO(ofd_bytes)
+        with zipfile.ZipFile(buf, "a", zipfile.ZIP_DEFLATED) as zf:
+            for name, data in extra_files.items():
+                zf.writestr(name, data)
+        ofd_bytes = buf.getvalue()
+    return ofd_bytes
+
+
+def percentile(values, q):
+    """线性插值百分位"""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    pos = (len(values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux 为 KB，mac 为 bytes
+    return round(rss / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def _stage_funcs(ofd_bytes, render_mode="line"):
+    """各阶段函数；每个阶段的输入在计时之外预先准备"""
+    from fastofd.draw.draw_img import DrawImage
+    from fastofd.draw.draw_ofd import OFDWrite
+    from fastofd.draw.draw_pdf import DrawPDF
+    from fastofd.parser_ofd.file_deal import FileRead
+    from fastofd.parser_ofd.ofd_parser import OFDParser
+
+    ofdb64 = str(base64.b64encode(ofd_bytes), "utf-8")
+    data = OFDParser(ofdb64)()
+    pdfbytes = DrawPDF(data).draw_pdf()
+
+    def pdf2ofd():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return OFDWrite()(pdfbytes)
+
+    return {
+        "read": lambda: FileRead(ofdb64)(),
+        "parse": lambda: OFDParser(ofdb64)(),
+        "render": lambda: DrawPDF(data, render_mode=render_mode).draw_pdf(),
+        "rasterize": lambda: DrawImage(pdfbytes)(),
+        "pdf2ofd": pdf2ofd,
+    }, len(data[0]["page_info"]) if data else 0
+
+
+def run_benchmark(iterations=5, stages=STAGES, memory=True, warmup=1, render_mode="line", **spec):
+    """
+    生成样本并分阶段计时，返回报告 dict
+    read: 解压并读取 xml；parse: 完整解析（含 read）；render: data -> pdf；rasterize: pdf -> 图片；pdf2ofd: pdf -> ofd
+    render_mode: render 阶段的文本渲染模式 line / char
+    memory: 额外执行一轮 tracemalloc 统计各阶段 python 堆峰值（不计入耗时）
+    """
+    from fastofd import __version__
+    import fitz
+    import reportlab
+
+    unknown = [stage for stage in stages if stage not in STAGES]
+    assert not unknown, f"stages Error: {unknown}"
+    start = time.time()
+    ofd_bytes = make_ofd(**spec)
+    generate_seconds = time.time() - start
+    funcs, pages = _stage_funcs(ofd_bytes, render_mode)
+
+    report = {
+        "version": __version__,
+        "env": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+                "pymupdf": fitz.VersionBind, "reportlab": reportlab.Version},
+        "spec": dict(spec, render_mode=render_mode),
+        "ofd_bytes": len(ofd_bytes),
+        "pages": pages,
+        "iterations": iterations,
+        "generate_seconds": round(generate_seconds, 4),
+        "stages": {},
+    }
+    for stage in stages:
+        func = funcs[stage]
+        try:
+            for _ in range(warmup):
+                func()
+            timings = []
+            for _ in range(iterations):
+                t = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - t)
+        except Exception as e:
+            report["stages"][stage] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        mean = sum(timings) / len(timings)
+        result = {
+            "mean": round(mean, 5),
+            "p50": round(percentile(timings, 50), 5),
+            "p90": round(percentile(timings, 90), 5),
+            "p99": round(percentile(timings, 99), 5),
+            "min": round(min(timings), 5),
+            "max": round(max(timings), 5),
+            "pages_per_sec": round(pages / mean, 2) if mean else None,
+        }
+        if memory:
+            tracemalloc.start()
+            func()
+            result["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+            tracemalloc.stop()
+        report["stages"][stage] = result
+    report["peak_rss_mb"] = _peak_rss_mb()
+    return report
+
+
+def compare(report, baseline):
+    """与基线报告比较各阶段平均耗时，ratio > 1 表示变慢"""
+    result = {}
+    for stage, current in report.get("stages", {}).items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old or "mean" not in old or "mean" not in current:
+            continue
+        result[stage] = {"mean": current["mean"], "baseline": old["mean"],
+                         "ratio": round(current["mean"] / old["mean"], 3) if old["mean"] else None}
+    return result
+
+
+def load_report(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
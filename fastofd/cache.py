@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 15:20
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 转换结果缓存，按输入内容哈希 + 转换参数寻址
+import base64
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+CACHE_VERSION = 1  # 缓存格式或绘制逻辑变化时递增，旧缓存自动失效
+
+
+def content_hash(data: bytes) -> str:
+    """输入文件内容哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path, chunk_size=1024 * 1024) -> str:
+    """分块计算文件 sha256，不整体读入内存，与 content_hash(文件内容) 相同"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _atomic_write(path, data: bytes):
+    """先写同目录临时文件再 os.replace，读方只会看到完整文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def pack_blobs(blobs) -> bytes:
+    """多个字节串打包为一个缓存值：数量 + 各段长度 + 数据"""
+    blobs = list(blobs)
+    header = struct.pack(f">I{len(blobs)}Q", len(blobs), *[len(b) for b in blobs])
+    return header + b"".join(blobs)
+
+
+def unpack_blobs(data: bytes) -> list:
+    count, = struct.unpack_from(">I", data)
+    sizes = struct.unpack_from(f">{count}Q", data, 4)
+    offset = 4 + 8 * count
+    blobs = []
+    for size in sizes:
+        blobs.append(data[offset:offset + size])
+        offset += size
+    return blobs
+
+
+class ConversionCache(object):
+    """
+    转换结果缓存
+    内存层为 LRU（按条数与字节数淘汰）；指定 cache_dir 时增加磁盘层，
+    写入先落临时文件再 os.replace，同机多进程可共享同一目录，超过 max_disk_bytes 时按访问时间淘汰最旧文件
+    max_items: 内存层最多条数，0 表示不使用内存层
+    """
+
+    def __init__(self, max_items=32, max_memory_bytes=256 * 1024 * 1024, cache_dir=None,
+                 max_disk_bytes=1024 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None  # 首次写入时扫描目录得到
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "writes": 0,
+                       "memory_evictions": 0, "disk_evictions": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_digest, kind, **options):
+        """缓存键：内容哈希 + 结果类型 + 参数，参数按名称排序后序列化"""
+        payload = json.dumps({"v": CACHE_VERSION, "hash": content_digest, "kind": kind, "options": options},
+                             sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    def get(self, key):
+        """命中返回 bytes，未命中返回 None"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return value
+
+        value = self._disk_get(key) if self.cache_dir else None
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            self._memory_put(key, value)
+        return value
+
+    def set(self, key, value: bytes):
+        assert isinstance(value, (bytes, bytearray)), "cache value must be bytes"
+        value = bytes(value)
+        with self._lock:
+            self._stats["writes"] += 1
+            self._memory_put(key, value)
+        if self.cache_dir:
+            self._disk_set(key, value)
+
+    def _memory_put(self, key, value):
+        """调用方持有锁"""
+        if not self.max_items or len(value) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = value
+        self._memory_bytes += len(value)
+        while len(self._memory) > self.max_items or self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats["memory_evictions"] += 1
+
+    def _disk_get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)  # 刷新访问时间，供淘汰排序
+        except OSError:
+            # 不存在或已被其他进程淘汰
+            return None
+        return value
+
+    def _disk_set(self, key, value):
+        if len(value) > self.max_disk_bytes:
+            # 写入后会被立即淘汰，直接不写
+            logger.debug(f"缓存值 {len(value)} bytes 超过磁盘上限，不写入磁盘")
+            return
+        try:
+            _atomic_write(self._path(key), value)
+        except OSError as e:
+            logger.warning(f"缓存写入失败: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, _, size in self._scan_disk())
+            else:
+                self._disk_bytes += len(value)
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk(keep=self._path(key))
+
+    def _scan_disk(self):
+        """返回 [(mtime, path, size)]"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".bin"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict_disk(self, keep=None):
+        """
+        按访问时间从旧到新删除，直到低于上限的 90%，其他进程的写入也计入
+        keep: 刚写入的文件，不参与淘汰
+        """
+        entries = sorted(self._scan_disk())
+        total = sum(size for _, _, size in entries)
+        target = self.max_disk_bytes * 0.9
+        evicted = 0
+        for _, path, size in entries:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+            self._stats["disk_evictions"] += evicted
+        logger.debug(f"缓存目录淘汰 {evicted} 个文件，当前 {total} bytes")
+
+    def clear(self):
+        """清空内存层与磁盘层"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.cache_dir:
+            for _, path, _ in self._scan_disk():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._disk_bytes = 0
+
+    def stats(self):
+        """命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+            if self.cache_dir:
+                stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class DocumentCache(object):
+    """
+    解析结果缓存，OFD.read 命中时跳过 OFDParser
+    文档模型（页面、字体、图片引用、签章、注释）序列化为 json，按 内容哈希 + 解析器版本 寻址；
+    图片、字体、签章数据（imgb64 / font_b64 / SignedValue）解码后以内容哈希单独存放在 blobs 目录，
+    json 中只保存引用，相同资源在页面之间、文档之间只存一份
+    目录结构: cache_dir/docs/<key>.json, cache_dir/blobs/<sha[:2]>/<sha>
+    docs 与 blobs 合计超过 max_disk_bytes 时按访问时间淘汰最旧的文档（解析器版本升级后的旧条目随之淘汰），
+    再删除没有文档引用的 blob
+    """
+    BLOB_KEYS = ("imgb64", "font_b64", "SignedValue")
+    BLOB_REF = re.compile(r'"\$t":"b","v":"([0-9a-f]{64})"')
+    # 最近写入 / 复用的 blob 在该秒数内不回收：其他进程可能已写入 blob、尚未写入引用它的文档
+    BLOB_GRACE = 300
+
+    def __init__(self, cache_dir, max_disk_bytes=2 * 1024 * 1024 * 1024):
+        assert cache_dir, "cache_dir is None"
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._disk_bytes = None  # 首次写入时扫描目录得到
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "doc_evictions": 0, "blob_evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "docs"), exist_ok=True)
+
+    @staticmethod
+    def make_key(content_digest, parser_version):
+        return hashlib.sha256(f"{content_digest}:{parser_version}".encode("utf-8")).hexdigest()
+
+    def _doc_path(self, key):
+        return os.path.join(self.cache_dir, "docs", f"{key}.json")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, "blobs", digest[:2], digest)
+
+    def _put_blob(self, b64_str, written):
+        """written: 本次新写入的 blob 字节数累加到 written[0]"""
+        data = base64.b64decode(b64_str)
+        digest = content_hash(data)
+        path = self._blob_path(digest)
+        try:
+            os.utime(path)  # 已存在：刷新时间，避免被并发的回收删除
+        except OSError:
+            _atomic_write(path, data)
+            written[0] += len(data)
+        return digest
+
+    def _encode(self, obj, written, key=None):
+        """转换为可 json 序列化的结构：非字符串键的 dict、tuple、资源数据分别打标记"""
+        if isinstance(obj, dict):
+            if all(isinstance(k, str) for k in obj):
+                return {k: self._encode(v, written, k) for k, v in obj.items()}
+            return {"$t": "d", "v": [[k, self._encode(v, written, k)] for k, v in obj.items()]}
+        if isinstance(obj, tuple):
+            return {"$t": "t", "v": [self._encode(v, written) for v in obj]}
+        if isinstance(obj, list):
+            return [self._encode(v, written, key) for v in obj]
+        if key in self.BLOB_KEYS and isinstance(obj, str) and obj:
+            return {"$t": "b", "v": self._put_blob(obj, written)}
+        return obj
+
+    def _decode_hook(self, blobs):
+        """json object_hook，同一资源在一次读取中只读盘、编码一次"""
+
+        def hook(obj):
+            tag = obj.get("$t")
+            if tag == "d":
+                return {k: v for k, v in obj["v"]}
+            if tag == "t":
+                return tuple(obj["v"])
+            if tag == "b":
+                digest = obj["v"]
+                if digest not in blobs:
+                    with open(self._blob_path(digest), "rb") as f:
+                        blobs[digest] = str(base64.b64encode(f.read()), encoding="utf-8")
+                return blobs[digest]
+            return obj
+
+        return hook
+
+    def get(self, key):
+        """命中返回解析结果 data，未命中或缓存损坏返回 None"""
+        path = self._doc_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f, object_hook=self._decode_hook({}))
+            os.utime(path)  # 刷新访问时间，供淘汰排序
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"文档缓存读取失败: {e}")
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return data
+
+    def set(self, key, data):
+        written = [0]
+        try:
+            payload = json.dumps(self._encode(data, written), ensure_ascii=False,
+                                 separators=(",", ":")).encode("utf-8")
+            _atomic_write(self._doc_path(key), payload)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"文档缓存写入失败: {e}")
+            return
+        with self._lock:
+            self._stats["writes"] += 1
+            if self._disk_bytes is None:
+                docs, blobs = self._scan_disk()
+                self._disk_bytes = sum(size for _, _, size in docs + blobs)
+            else:
+                self._disk_bytes += len(payload) + written[0]
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk(keep=self._doc_path(key))
+
+    def _scan_disk(self):
+        """返回 (文档 [(mtime, path, size)], blob [(mtime, path, size)])"""
+        out = ([], [])
+        for idx, sub_dir in enumerate(("docs", "blobs")):
+            for root, _, files in os.walk(os.path.join(self.cache_dir, sub_dir)):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    out[idx].append((stat.st_mtime, path, stat.st_size))
+        return out
+
+    def _evict_disk(self, keep=None):
+        """
+        按访问时间从旧到新删除文档，直到 docs + blobs 低于上限的 90%，随后回收没有文档引用的 blob
+        keep: 刚写入的文档，不参与淘汰
+        """
+        docs, blobs = self._scan_disk()
+        docs.sort()
+        total = sum(size for _, _, size in docs + blobs)
+        target = self.max_disk_bytes * 0.9
+        doc_evicted = blob_evicted = 0
+        kept_docs = []
+        for mtime, path, size in docs:
+            if total > target and path != keep:
+                try:
+                    os.remove(path)
+                    total -= size
+                    doc_evicted += 1
+                    continue
+                except OSError:
+                    pass
+            kept_docs.append(path)
+        if doc_evicted:
+            referenced = set()
+            for path in kept_docs:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        referenced.update(self.BLOB_REF.findall(f.read()))
+                except OSError:
+                    continue
+            fresh = time.time() - self.BLOB_GRACE
+            for mtime, path, size in blobs:
+                if mtime >= fresh or os.path.basename(path) in referenced:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                blob_evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+            self._stats["doc_evictions"] += doc_evicted
+            self._stats["blob_evictions"] += blob_evicted
+        logger.debug(f"文档缓存淘汰 {doc_evicted} 个文档、{blob_evicted} 个 blob，当前 {total} bytes")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["disk_bytes"] = self._disk_bytes
+        return stats
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 16:40
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 命令行入口 fastofd
+import argparse
+import json
+import os
+import sys
+
+from loguru import logger
+
+
+def _setup_logger(verbose, trace=False):
+    logger.remove()
+    logger.add(sys.stderr, level="TRACE" if trace else "DEBUG" if verbose else "INFO")
+    if trace:
+        # DrawPDF 创建时读取，子进程继承环境变量
+        os.environ["FASTOFD_TRACE"] = "1"
+
+
+def _stages(value):
+    """--stages 逗号分隔的阶段名，取值范围 bench.STAGES，未知阶段在解析参数时报错"""
+    from fastofd.bench import STAGES
+
+    stages = [i.strip() for i in value.split(",") if i.strip()]
+    unknown = [i for i in stages if i not in STAGES]
+    if unknown or not stages:
+        raise argparse.ArgumentTypeError(f"invalid choice: {','.join(unknown) or value!r} "
+                                         f"(choose from {', '.join(STAGES)})")
+    return stages
+
+
+def cmd_convert(args):
+    from fastofd.batch import BatchConverter
+    from fastofd.draw.draw_img import RasterOptions
+
+    # 1-bit 图片只能输出 png
+    fmt = "png" if args.image_format == "png" or args.colorspace == "mono" else "jpeg"
+    raster_options = RasterOptions(dpi=args.dpi, colorspace=args.colorspace, fmt=fmt, quality=args.quality)
+    converter = BatchConverter(args.output, to=args.to, workers=args.workers, render_mode=args.render_mode,
+                               with_signature=not args.no_signature, raster_options=raster_options,
+                               manifest=args.manifest, max_pending=args.max_pending,
+                               recursive=not args.no_recursive, timeout=args.timeout,
+                               memory_limit_mb=args.memory_limit, max_jobs_per_worker=args.max_jobs_per_worker)
+    summary = converter.run(args.inputs)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+def cmd_serve(args):
+    from fastofd.server import serve
+
+    serve(host=args.host, port=args.port, workers=args.workers, queue_size=args.queue_size, timeout=args.timeout,
+          memory_limit_mb=args.memory_limit, max_jobs=args.max_jobs_per_worker, cache_mb=args.cache_mb)
+    return 0
+
+
+def cmd_bench(args):
+    import contextlib
+
+    from fastofd.bench import STAGES, compare, load_report, run_benchmark
+
+    width, height = (int(i) for i in args.image_size.lower().split("x"))
+    stages = args.stages or STAGES
+    # 模板与 pdf2ofd 过程中的 print 输出到 stderr，stdout 只保留报告
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmark(iterations=args.iterations, stages=stages, memory=not args.no_memory,
+                               pages=args.pages, texts_per_page=args.texts, paths_per_page=args.paths,
+                               images=args.images, images_per_page=args.images_per_page,
+                               image_size=(width, height), image_format=args.image_format, seals=args.seals,
+                               template=not args.no_template, seed=args.seed, render_mode=args.render_mode,
+                               cross_page_seal=args.cross_page_seal)
+    if args.compare:
+        report["compare"] = compare(report, load_report(args.compare))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+def cmd_index(args):
+    from fastofd.index import OFDIndex
+
+    with OFDIndex(args.db, workers=args.workers) as index:
+        summary = index.add(args.inputs, recursive=not args.no_recursive)
+        summary["index"] = index.stats()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+def cmd_search(args):
+    from fastofd.index import OFDIndex
+
+    with OFDIndex(args.db) as index:
+        hits = index.search(args.query, limit=args.limit, creator=args.creator, date_from=args.date_from,
+                            date_to=args.date_to)
+    print(json.dumps(hits, ensure_ascii=False, indent=2))
+    return 0
+
+
+def cmd_invoice(args):
+    from fastofd.extract.invoice import extract_invoices
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+
+    def record(result):
+        out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+
+    try:
+        summary = extract_invoices(args.inputs, record, fields=args.fields.split(",") if args.fields else None,
+                                   workers=args.workers, recursive=not args.no_recursive,
+                                   chunk_size=args.chunk_size, fallback=not args.no_layout)
+    finally:
+        if args.output:
+            out.close()
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="fastofd", description="OFD 转换工具")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出调试日志")
+    parser.add_argument("--trace", action="store_true", help="输出逐行/逐字符绘制明细日志，显著降低绘制速度")
+    subparsers = parser.add_subparsers(dest="command")
+
+    convert = subparsers.add_parser("convert", help="批量转换 ofd 为 pdf / 图片")
+    convert.add_argument("inputs", nargs="+", help="ofd 文件或目录")
+    convert.add_argument("-o", "--output", required=True, help="输出目录")
+    convert.add_argument("--to", choices=("pdf", "jpg"), default="pdf")
+    convert.add_argument("-j", "--workers", type=int, default=0, help="进程数，0 表示 CPU 核数")
+    convert.add_argument("--manifest", help="jsonl 进度文件，重跑时跳过已成功的文件")
+    convert.add_argument("--max-pending", type=int, default=None, help="在途任务上限，默认进程数的 2 倍")
+    convert.add_argument("--render-mode", choices=("line", "char"), default="line")
+    convert.add_argument("--no-signature", action="store_true", help="不绘制签章")
+    convert.add_argument("--no-recursive", action="store_true", help="不遍历子目录")
+    convert.add_argument("--dpi", type=int, default=144)
+    convert.add_argument("--colorspace", choices=("rgb", "gray", "mono"), default="rgb")
+    convert.add_argument("--image-format", choices=("jpeg", "png"), default="jpeg")
+    convert.add_argument("--quality", type=int, default=85)
+    convert.add_argument("--timeout", type=float, default=None, help="单个文件超时秒数，指定后启用受监管子进程")
+    convert.add_argument("--memory-limit", type=int, default=None, help="单个子进程内存上限 MB")
+    convert.add_argument("--max-jobs-per-worker", type=int, default=None, help="子进程处理多少个文件后重启")
+    convert.set_defaults(func=cmd_convert)
+
+    serve = subparsers.add_parser("serve", help="启动本地 http 转换服务")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("-j", "--workers", type=int, default=2, help="预热的转换子进程数")
+    serve.add_argument("--queue-size", type=int, default=16, help="排队任务上限，超过返回 429")
+    serve.add_argument("--timeout", type=float, default=120, help="单个文件超时秒数")
+    serve.add_argument("--memory-limit", type=int, default=None, help="单个子进程内存上限 MB")
+    serve.add_argument("--max-jobs-per-worker", type=int, default=200, help="子进程处理多少个文件后重启")
+    serve.add_argument("--cache-mb", type=int, default=256, help="结果缓存大小 MB，0 关闭")
+    serve.set_defaults(func=cmd_serve)
+
+    bench = subparsers.add_parser("bench", help="用合成 ofd 样本做性能基准")
+    bench.add_argument("--pages", type=int, default=10)
+    bench.add_argument("--texts", type=int, default=40, help="每页文本行数")
+    bench.add_argument("--paths", type=int, default=20, help="每页线段数")
+    bench.add_argument("--images", type=int, default=1, help="图片资源数")
+    bench.add_argument("--images-per-page", type=int, default=1, help="每页图片对象数")
+    bench.add_argument("--image-size", default="400x300", help="图片像素尺寸 WxH")
+    bench.add_argument("--image-format", choices=("jpg", "png", "bmp"), default="jpg")
+    bench.add_argument("--seals", type=int, default=1, help="签章数")
+    bench.add_argument("--no-template", action="store_true", help="不带模板页")
+    bench.add_argument("--cross-page-seal", action="store_true", help="签章为骑缝章，盖在所有页上")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--render-mode", choices=("line", "char"), default="line", help="render 阶段文本渲染模式")
+    bench.add_argument("-n", "--iterations", type=int, default=5)
+    bench.add_argument("--stages", type=_stages, help="逗号分隔，默认 read,parse,render,rasterize,pdf2ofd")
+    bench.add_argument("--no-memory", action="store_true", help="不统计各阶段 python 内存峰值")
+    bench.add_argument("-o", "--output", help="报告写入 json 文件")
+    bench.add_argument("--compare", help="基线报告 json，输出各阶段耗时比值")
+    bench.set_defaults(func=cmd_bench)
+
+    index = subparsers.add_parser("index", help="增量建立 ofd 全文与元数据索引")
+    index.add_argument("db", help="sqlite 索引文件")
+    index.add_argument("inputs", nargs="+", help="ofd 文件或目录")
+    index.add_argument("-j", "--workers", type=int, default=0, help="进程数，0 表示 CPU 核数")
+    index.add_argument("--no-recursive", action="store_true", help="不遍历子目录")
+    index.set_defaults(func=cmd_index)
+
+    search = subparsers.add_parser("search", help="检索 ofd 索引")
+    search.add_argument("db", help="sqlite 索引文件")
+    search.add_argument("query", help="检索词，空白分隔的多个词同时匹配")
+    search.add_argument("-n", "--limit", type=int, default=20)
+    search.add_argument("--creator", help="创建者")
+    search.add_argument("--date-from", help="创建日期下限，如 2024-01-01")
+    search.add_argument("--date-to", help="创建日期上限")
+    search.set_defaults(func=cmd_search)
+
+    invoice = subparsers.add_parser("invoice", help="批量抽取增值税电子发票字段，逐行输出 json")
+    invoice.add_argument("inputs", nargs="+", help="ofd 文件或目录")
+    invoice.add_argument("-o", "--output", help="结果写入 jsonl 文件，默认标准输出")
+    invoice.add_argument("-j", "--workers", type=int, default=1, help="进程数，1 表示在当前进程执行，0 表示 CPU 核数")
+    invoice.add_argument("--fields", help="逗号分隔的字段，默认全部")
+    invoice.add_argument("--chunk-size", type=int, default=64, help="多进程时每个任务的文件数")
+    invoice.add_argument("--no-layout", action="store_true", help="缺少标引、附件时不按版面查找")
+    invoice.add_argument("--no-recursive", action="store_true", help="不遍历子目录")
+    invoice.set_defaults(func=cmd_invoice)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, "func", None):
+        parser.print_help()
+        return 2
+    _setup_logger(args.verbose, args.trace)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd/draw
+# CREATE_TIME: 2026/10/19 14:10
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: pdf 栅格化为页面图片
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import threading
+from io import BytesIO
+from multiprocessing import shared_memory
+
+import fitz
+from PIL import Image
+from loguru import logger
+
+from fastofd.stats import resolve
+
+_END = object()  # 生产线程结束标记
+
+
+class RasterOptions(object):
+    """
+    栅格化参数
+    dpi: 输出分辨率，默认 144（即 zoom=2）
+    colorspace: rgb | gray | mono（1-bit，按 threshold 二值化）
+    fmt: pil | png | jpeg | numpy
+        png/jpeg 直接由 Pixmap.tobytes 编码，不经过 PIL；numpy 为零拷贝视图，依赖可选的 numpy
+    quality: jpeg 质量
+    """
+    COLORSPACES = ("rgb", "gray", "mono")
+    FORMATS = ("pil", "png", "jpeg", "numpy")
+
+    def __init__(self, dpi=144, colorspace="rgb", fmt="pil", quality=85, threshold=128, rotate=0):
+        assert colorspace in self.COLORSPACES, f"colorspace Error: {colorspace}"
+        assert fmt in self.FORMATS, f"fmt Error: {fmt}"
+        assert not (colorspace == "mono" and fmt == "jpeg"), "jpeg 不支持 1-bit 输出"
+        self.dpi = dpi
+        self.colorspace = colorspace
+        self.fmt = fmt
+        self.quality = quality
+        self.threshold = threshold
+        self.rotate = rotate
+
+    @classmethod
+    def ocr(cls, fmt="png"):
+        """OCR 推荐预设：200dpi 灰度"""
+        return cls(dpi=200, colorspace="gray", fmt=fmt)
+
+    @property
+    def zoom(self):
+        return self.dpi / 72
+
+    @property
+    def mode(self):
+        """pixmap 原始数据对应的 PIL mode"""
+        return "RGB" if self.colorspace == "rgb" else "L"
+
+    @property
+    def suffix(self):
+        return "jpg" if self.fmt == "jpeg" else "png"
+
+    def get_pixmap(self, page):
+        mat = fitz.Matrix(self.zoom, self.zoom).prerotate(self.rotate)
+        colorspace = fitz.csRGB if self.colorspace == "rgb" else fitz.csGRAY
+        return page.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+
+    def __repr__(self):
+        return (f"RasterOptions(dpi={self.dpi}, colorspace={self.colorspace}, fmt={self.fmt}, "
+                f"quality={self.quality})")
+
+
+class _PixmapArray(object):
+    """numpy 数组接口，持有 pixmap 引用，数组存活期间 pixmap 内存不会被释放"""
+
+    def __init__(self, pix):
+        self.pix = pix
+        if pix.n == 1:
+            shape, strides = (pix.height, pix.width), (pix.stride, 1)
+        else:
+            shape, strides = (pix.height, pix.width, pix.n), (pix.stride, pix.n, 1)
+        self.__array_interface__ = {
+            "version": 3,
+            "shape": shape,
+            "strides": strides,
+            "typestr": "|u1",
+            "data": (pix.samples_ptr, False),
+        }
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("fmt='numpy' 需要安装 numpy")
+    return numpy
+
+
+def _to_pil(mode, width, height, samples, options):
+    img = Image.frombytes(mode, (width, height), samples)
+    if options.colorspace == "mono":
+        threshold = options.threshold
+        img = img.point(lambda v: 255 if v >= threshold else 0, mode="1")
+    return img
+
+
+def encode_bytes(pix, options):
+    """编码为 png/jpeg 字节，gray/rgb 直接由 pixmap 编码"""
+    if options.fmt == "jpeg":
+        return pix.tobytes("jpg", jpg_quality=options.quality)
+    if options.colorspace != "mono":
+        return pix.tobytes("png")
+    img_io = BytesIO()
+    _to_pil(options.mode, pix.width, pix.height, pix.samples, options).save(img_io, format="PNG")
+    return img_io.getvalue()
+
+
+def encode_pixmap(pix, options):
+    """按 options.fmt 输出 PIL 图片、编码字节或 numpy 数组"""
+    if options.fmt in ("png", "jpeg"):
+        return encode_bytes(pix, options)
+    if options.fmt == "numpy":
+        numpy = _import_numpy()
+        array = numpy.asarray(_PixmapArray(pix))
+        return array >= options.threshold if options.colorspace == "mono" else array
+    return _to_pil(options.mode, pix.width, pix.height, pix.samples, options)
+
+
+def decode_samples(payload, options):
+    """子进程回传的原始像素 (mode, width, height, samples) 还原为 PIL 图片或 numpy 数组"""
+    mode, width, height, samples = payload
+    if options.fmt == "numpy":
+        numpy = _import_numpy()
+        shape = (height, width) if mode == "L" else (height, width, 3)
+        array = numpy.frombuffer(samples, dtype=numpy.uint8).reshape(shape)
+        return array >= options.threshold if options.colorspace == "mono" else array
+    return _to_pil(mode, width, height, samples, options)
+
+
+class DrawImage(object):
+    """
+    pdf 栅格化
+    逐页渲染 pixmap 并按 RasterOptions 输出，iter_images 按页产出，内存占用与页数无关
+    """
+
+    def __init__(self, pdfbytes, zoom=2, rotate=0, options=None, stats=None):
+        assert pdfbytes, "pdfbytes is None"
+        self.pdfbytes = pdfbytes
+        self.options = options if options else RasterOptions(dpi=zoom * 72, rotate=rotate)
+        self.stats = resolve(stats)
+
+    def render_page(self, page):
+        """渲染单页"""
+        with self.stats.stage("rasterize"):
+            image = encode_pixmap(self.options.get_pixmap(page), self.options)
+        self.stats.incr("pages_rasterized")
+        if isinstance(image, bytes):
+            self.stats.incr("bytes_out", len(image))
+        return image
+
+    def _iter_render(self, page_list=None):
+        """在当前线程逐页渲染，产出 (pdf页索引, 图片)"""
+        with fitz.open(stream=self.pdfbytes, filetype="pdf") as doc:
+            page_idx_list = range(doc.page_count) if page_list is None else page_list
+            for page_idx in page_idx_list:
+                yield page_idx, self.render_page(doc[page_idx])
+
+    def iter_images(self, page_list=None, prefetch=1):
+        """
+        按页产出 (pdf页索引, 图片)
+        prefetch > 0 时由后台线程预先渲染至多 prefetch 页，调用方处理当前页（如 OCR）时下一页已在渲染；
+        队列有界，任意时刻驻留内存的图片不超过 prefetch + 1 张
+        """
+        if prefetch <= 0:
+            yield from self._iter_render(page_list)
+            return
+
+        pages = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            """放入队列，调用方已停止迭代时放弃"""
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for item in self._iter_render(page_list):
+                    if not put(item):
+                        return
+            except Exception as e:
+                logger.error(f"pdf 栅格化失败: {e}")
+                put(e)
+                return
+            put(_END)
+
+        producer = threading.Thread(target=produce, name="fastofd-raster", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # 调用方提前结束迭代时通知生产线程退出并释放已渲染的页面
+            stop.set()
+            while not pages.empty():
+                pages.get_nowait()
+            producer.join()
+
+    def render_parallel(self, workers=0, page_list=None, output_dir=None, prefix="page"):
+        """
+        多进程并行栅格化
+        pdf 字节写入共享内存，页码按连续区间切分给 workers 个子进程，各子进程独立打开文档渲染；
+        指定 output_dir 时子进程直接把编码后的图片写入磁盘并只回传路径，像素数据不经过父进程。
+        按页序返回图片列表，或 output_dir 下的文件路径列表
+        workers: 0/None 表示 CPU 核数
+        """
+        with fitz.open(stream=self.pdfbytes, filetype="pdf") as doc:
+            page_count = doc.page_count
+        page_idx_list = list(range(page_count)) if page_list is None else list(page_list)
+        workers = min(workers or multiprocessing.cpu_count(), len(page_idx_list)) or 1
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        # 连续区间切分，保持每个子进程内的页面局部性
+        step = -(-len(page_idx_list) // workers)
+        ranges = [page_idx_list[i:i + step] for i in range(0, len(page_idx_list), step)]
+        task = {"options": self.options, "output_dir": output_dir, "prefix": prefix}
+
+        results = {}
+        with self.stats.stage("rasterize"):
+            shm = shared_memory.SharedMemory(create=True, size=max(1, len(self.pdfbytes)))
+            try:
+                shm.buf[:len(self.pdfbytes)] = self.pdfbytes
+                if workers == 1:
+                    results.update(_render_range(shm.name, len(self.pdfbytes), page_idx_list, task))
+                else:
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                        futures = [executor.submit(_render_range, shm.name, len(self.pdfbytes), page_range, task)
+                                   for page_range in ranges]
+                        for future in concurrent.futures.as_completed(futures):
+                            results.update(future.result())
+            finally:
+                shm.close()
+                shm.unlink()
+
+        self.stats.incr("pages_rasterized", len(page_idx_list))
+        logger.info(f"并行栅格化 {len(page_idx_list)} 页，进程数 {workers}")
+        ordered = []
+        for page_idx in page_idx_list:
+            payload = results[page_idx]
+            if isinstance(payload, tuple):
+                payload = decode_samples(payload, self.options)
+            elif isinstance(payload, bytes):
+                self.stats.incr("bytes_out", len(payload))
+            ordered.append(payload)
+        return ordered
+
+    def __call__(self, page_list=None):
+        """return image list"""
+        return [img for _, img in self._iter_render(page_list)]
+
+
+def _render_range(shm_name, size, page_idx_list, task):
+    """
+    子进程入口：从共享内存打开 pdf，渲染一段页码
+    返回 {页索引: 文件路径 | 编码字节 | (mode, width, height, samples)}
+    """
+    # 子进程与父进程共用 resource_tracker，共享内存由父进程负责 unlink
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pdfbytes = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+    return _render_bytes(pdfbytes, page_idx_list, task)
+
+
+def _render_bytes(pdfbytes, page_idx_list, task):
+    """打开一次文档，渲染一段页码，返回值同 _render_range"""
+    options = task["options"]
+    output_dir = task.get("output_dir")
+    results = {}
+    with fitz.open(stream=pdfbytes, filetype="pdf") as doc:
+        for page_idx in page_idx_list:
+            pix = options.get_pixmap(doc[page_idx])
+            if output_dir:
+                path = os.path.join(output_dir, f"{task['prefix']}_{page_idx}.{options.suffix}")
+                with open(path, "wb") as f:
+                    f.write(encode_bytes(pix, options))
+                results[page_idx] = path
+            elif options.fmt in ("png", "jpeg"):
+                results[page_idx] = encode_bytes(pix, options)
+            else:
+                results[page_idx] = (options.mode, pix.width, pix.height, pix.samples)
+    return results
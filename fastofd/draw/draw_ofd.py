@@ -265,7 +265,7 @@ class OFDWrite(object):
         # 生成 ofd 文件
         ofd_byte = OFDStructure("123", ofd=ofd_entrance, document=document, public_res=public_res,
                                 document_res=document_res, content_res=content_res_list, res_static=res_static)(
-            test=True)
+            test=False)
         return ofd_byte
 
 
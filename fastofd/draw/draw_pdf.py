@@ -6,14 +6,19 @@
 # AUTHOR: reno
 # NOTE:  绘制pdf
 import base64
+import os
 import re
+import shutil
+import tempfile
 import time
 import traceback
+import zipfile
+from collections import deque
 from io import BytesIO
 import concurrent.futures
-import io
+import multiprocessing
 
-from pypdf import PdfReader, PdfWriter
+import fitz
 from PIL import Image as PILImage
 from loguru import logger
 from reportlab.lib.pagesizes import A4
@@ -21,6 +26,10 @@ from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
 from fastofd.draw.font_tools import FontTool
+from fastofd.extract.glyphs import expand_delta, glyph_offsets, parse_ctm
+from fastofd.parser_ofd.file_deal import ZipResource
+from fastofd.parser_ofd.ofd_parser import load_image
+from fastofd.stats import resolve
 from .find_seal_img import SealExtract
 
 
@@ -42,19 +51,28 @@ class DrawPDF():
         self.SupportImgType = ("JPG", "JPEG", "PNG")
         # 使用已注册的基础中文字体作为默认字体，避免未注册的“宋体”导致异常
         self.init_font = "STSong-Light"
-        self.font_tool = FontTool()
+        # 转换统计，未传入时为空操作
+        self.stats = resolve(kwargs.get('stats'))
+        with self.stats.stage("font_init"):
+            self.font_tool = FontTool()
         # 文本渲染模式：'line'（整行写入优先，超出边界回退到字符写入）或'char'（始终使用字符写入）
         self.render_mode = kwargs.get('render_mode', 'line')
+        # 逐行/逐字符绘制明细日志（TRACE 级别），默认关闭，避免热循环中格式化日志字符串；
+        # 未指定时读取环境变量 FASTOFD_TRACE=1，子进程同样生效
+        self.trace = kwargs.get('trace', os.environ.get("FASTOFD_TRACE", "") not in ("", "0"))
         
         self.page_list = kwargs.get('page_list', None)  # None表示绘制所有页面
         self.with_signature = kwargs.get('with_signature', True) # 是否绘制签名
 
         # 并发处理相关配置参数
-        self.max_workers = kwargs.get('max_workers', None)  # None表示自动计算
+        self.max_workers = kwargs.get('max_workers', None)  # draw_pdf: None/1 单进程 0 自动计算 N 进程数; draw_pdf_multithread: None/0 自动计算
         self.single_thread_threshold = kwargs.get('single_thread_threshold', 10)  # 页面数量阈值，低于此值使用单线程
         self.min_pages_per_chunk = kwargs.get('min_pages_per_chunk', 1)  # 每个子PDF的最小页数
         self.optimized_pages_per_chunk = kwargs.get('optimized_pages_per_chunk', 5)  # 优化性能的每块页数
         self.force_single_thread = kwargs.get('force_single_thread', False)  # 强制使用单线程模式
+        self.stream_pages_per_chunk = kwargs.get('stream_pages_per_chunk', 5)  # 流式输出时每次追加写出的页数
+        self._seal_readers = {}  # {SealRef: ImageReader}，签章图片按签章值缓存
+        self._zip_files = {}  # {ofd 路径: ZipFile}，延迟读取资源时复用，_draw_pages 结束时关闭
 
     def draw_lines(my_canvas):
         """
@@ -80,62 +98,17 @@ class DrawPDF():
 
 
     def _expand_delta(self, DeltaRule: str) -> list[float]:
-        """
-        把 DeltaRule 展开成纯粹的浮点增量列表
-        支持 g <count> <value> 语法
-        """
-        if not DeltaRule.strip():
-            return []
-
-        tokens = DeltaRule.strip().split()
-        out, i = [], 0
-        while i < len(tokens):
-            tok = tokens[i]
-            if tok == "g" and i + 2 < len(tokens):
-                count = int(tokens[i + 1])
-                value = float(tokens[i + 2])
-                out.extend([value] * count)
-                i += 3
-            else:
-                out.append(float(tok))
-                i += 1
-        return out
-
+        """把 DeltaRule 展开成纯粹的浮点增量列表，见 extract.glyphs.expand_delta"""
+        return expand_delta(DeltaRule)
 
     def cmp_offsetV2(self, pos, offset, DeltaRule, text, CTM_info, dire="X") -> list[float]:
-        """
-        返回每个字符在 dire 方向上的绝对坐标（mm）
-        """
-        # ---- 1. 计算变换参数 ----
-        if CTM_info:
-            resize = CTM_info.get(f"resize{dire}", 1.0)
-            move   = CTM_info.get(f"move{dire}",   0.0)
-        else:
-            resize, move = 1.0, 0.0
-
-        # ---- 2. 展开增量 ----
-        deltas = self._expand_delta(DeltaRule)          # 仅增量
-        # 长度对齐：不足的间隙用“最后一个增量值”补齐，避免 0 造成重叠
-        needed = (len(text) - 1) - len(deltas)
-        if needed > 0:
-            pad_val = deltas[-1] if deltas else 0.0
-            deltas.extend([pad_val] * needed)
-
-        # ---- 3. 首字符起点 ----
-        start = float(pos or 0.0) + (float(offset or 0.0) + move) * resize
-        coords = [start]
-
-        # ---- 4. 累加 ----
-        for d in deltas:
-            start += d * resize
-            coords.append(start)
-
-        return coords[:len(text)]
-
+        """返回每个字符在 dire 方向上的绝对坐标（mm），见 extract.glyphs.glyph_offsets"""
+        return glyph_offsets(pos, offset, DeltaRule, text, CTM_info, dire=dire)
 
     def draw_chars(self, canvas, text_list, fonts, page_size):
         """写入字符"""
         c = canvas
+        trace = self.trace
         for line_dict in text_list:
             # if line_dict.get("ID") == "246":
             #     print('>>>>>>>')
@@ -173,19 +146,11 @@ class DrawPDF():
             resizeX = 1
             resizeY = 1
             # CTM =None # 有的数据不使用这个CTM
-            if CTM and (CTMS:=CTM.split(" ")) and len(CTMS) == 6:
-                CTM_info = {
-                    "resizeX": float(CTMS[0]),
-                    "rotateX": float(CTMS[1]),
-                    "rotateY": float(CTMS[2]),
-                    "resizeY": float(CTMS[3]),
-                    "moveX": float(CTMS[4]),
-                    "moveY": float(CTMS[5]),
-                }
+            CTM_info = parse_ctm(CTM)
+            if CTM_info:
                 resizeY = CTM_info.get("resizeY")
                 font_size = line_dict["size"] * self.OP * resizeY
             else:
-                CTM_info ={}
                 font_size = line_dict["size"] * self.OP
 
             if pos and len(pos) == 4:
@@ -231,7 +196,8 @@ class DrawPDF():
                 
                 # 尝试使用整行写入方式（当条件满足时）
                 if use_line_write:
-                    logger.debug(f"使用整行写入模式: {text}, ID={line_dict.get('ID')}")
+                    if trace:
+                        logger.trace(f"使用整行写入模式: {text}, ID={line_dict.get('ID')}")
                     
                     # 使用x_list和y_list中的精确坐标
                     if x_list and y_list:  # 确保坐标列表不为空
@@ -239,12 +205,14 @@ class DrawPDF():
                         x_p = float(x_list[0]) * self.OP
                         y_p = (float(page_size[3]) - float(y_list[0])) * self.OP
                         
-                        logger.debug(f"使用精确坐标绘制文本: x={x_p}, y={y_p}")
+                        if trace:
+                            logger.trace(f"使用精确坐标绘制文本: x={x_p}, y={y_p}")
                     else:
                         # 作为回退方案，使用原有的X和Y坐标
                         x_p = abs(float(X)) * self.OP
                         y_p = abs(float(page_size[3]) - (float(Y))) * self.OP
-                        logger.debug(f"使用回退坐标绘制文本: x={x_p}, y={y_p}")
+                        if trace:
+                            logger.trace(f"使用回退坐标绘制文本: x={x_p}, y={y_p}")
                     
                     # 设置字体并绘制文本
                     font = self._set_font_with_fallback(c, font, font_size)
@@ -252,24 +220,26 @@ class DrawPDF():
                     # text_write.append((x_p,  y_p, text))
                 else:
                     # 使用字符写入模式（当self.render_mode为'char'或line模式下超出边界时）
-                    fallback_reason = "超出页面边界" if self.render_mode == 'line' and is_outside_page else "选择了字符渲染模式"
-                    logger.debug(f"使用字符写入模式 ({fallback_reason}): {text}, ID={line_dict.get('ID')}")
-                    
+                    if trace:
+                        fallback_reason = "超出页面边界" if self.render_mode == 'line' and is_outside_page else "选择了字符渲染模式"
+                        logger.trace(f"使用字符写入模式 ({fallback_reason}): {text}, ID={line_dict.get('ID')}")
+
+                    # 同一文本行字体字号不变，只设置一次
+                    font = self._set_font_with_fallback(c, font, font_size)
+                    page_height = float(page_size[3])
                     # 按字符写入
                     for cahr_id, _cahr_ in enumerate(text):
                         if len(x_list) > cahr_id:
                             # 计算单个字符的精确位置
                             _cahr_x = float(x_list[cahr_id]) * self.OP
-                            _cahr_y = (float(page_size[3]) - (float(y_list[cahr_id]))) * self.OP
-                            
-                            # 使用封装的字体设置方法
-                            font = self._set_font_with_fallback(c, font, font_size)
-                                
+                            _cahr_y = (page_height - (float(y_list[cahr_id]))) * self.OP
+
                             # 记录字符绘制信息
-                            logger.debug(f"绘制字符: ID={line_dict.get('ID')}, 字符='{_cahr_}', 坐标=({_cahr_x}, {_cahr_y}), 字体={font}, 字号={font_size}")
+                            if trace:
+                                logger.trace(f"绘制字符: ID={line_dict.get('ID')}, 字符='{_cahr_}', 坐标=({_cahr_x}, {_cahr_y}), 字体={font}, 字号={font_size}")
                             c.drawString(_cahr_x, _cahr_y, _cahr_, mode=0) 
-                        else:
-                            logger.debug(f"字符 '{_cahr_}' 缺少位置信息，文本='{text}', 坐标列表={x_list}")
+                        elif trace:
+                            logger.trace(f"字符 '{_cahr_}' 缺少位置信息，文本='{text}', 坐标列表={x_list}")
                         # text_write.append((_cahr_x,  _cahr_y, _cahr_))
             except Exception as e:
                 logger.error(f"文本绘制错误: {e}")
@@ -310,13 +280,15 @@ class DrawPDF():
         
         for img_d in img_list:
             resource_id = img_d["ResourceID"]
-            image = images.get(resource_id)
 
-            if not image or image.get("suffix").upper() not in self.SupportImgType:
-                continue
-            
             # 使用缓存减少重复解码
             if resource_id not in decoded_images_cache:
+                image = images.get(resource_id)
+                # 延迟读取的图片此时才从 ofd 读取、转码，本页绘制完即释放
+                if image and isinstance(image.get('imgb64'), ZipResource):
+                    image = load_image(image, self._zip_file(image['imgb64']), stats=self.stats)
+                if not image or image.get("suffix").upper() not in self.SupportImgType:
+                    continue
                 imgbyte = base64.b64decode(image.get('imgb64'))
                 if not imgbyte:
                     logger.error(f"{image['fileName']} is null")
@@ -390,14 +362,41 @@ class DrawPDF():
         # 清理缓存，帮助垃圾回收
         decoded_images_cache.clear()
 
-    def draw_signature(self, canvas, signatures_page_list, page_size):
+    def _seal_reader(self, signature_info, seals):
+        """
+        按签章值取 ImageReader，同一签章值只提取、转换一次
+        SealRef 引用文档级 seals；兼容直接携带 SignedValue 的旧结构
+        提取不到图片时缓存 None，不重复尝试
+        """
+        key = signature_info.get("SealRef")
+        if key is not None:
+            signed_value = (seals or {}).get(key, {}).get("SignedValue")
+        else:
+            key = signed_value = signature_info.get("SignedValue")
+        if key in self._seal_readers:
+            return self._seal_readers[key]
+        reader = None
+        if signed_value:
+            with self.stats.stage("seal_extract"):
+                if isinstance(signed_value, ZipResource):
+                    image = SealExtract()(data=signed_value.read(self._zip_file(signed_value)))
+                else:
+                    image = SealExtract()(b64=signed_value)
+            self.stats.incr("seals_decoded")
+            if image:
+                # 同一个 ImageReader 重复绘制时 reportlab 复用已转换的像素数据，pdf 中只嵌入一份图片
+                reader = ImageReader(image[0])
+        self._seal_readers[key] = reader
+        return reader
+
+    def draw_signature(self, canvas, signatures_page_list, page_size, seals=None):
         """
         写入签章
             {
             "sing_page_no": sing_page_no,
             "PageRef": PageRef,
             "Boundary": Boundary,
-            "SignedValue": self.file_tree(SignedValue),
+            "SealRef": SignedValue 路径，对应 seals 中的签章值,
                             }
         """
         c = canvas
@@ -405,23 +404,20 @@ class DrawPDF():
             if signatures_page_list:
                 # print("signatures_page_list",signatures_page_list)
                 for signature_info in signatures_page_list:
-                    image = SealExtract()(b64=signature_info.get("SignedValue"))
-                    if not image:
+                    imgReade = self._seal_reader(signature_info, seals)
+                    if imgReade is None:
                         logger.info(f"提取不到签章图片")
                         continue
-                    else:
-                        image_pil = image[0]
 
                     pos = [float(i) for i in signature_info.get("Boundary").split(" ")]
 
-                    imgReade = ImageReader(image_pil)
-
                     x = pos[0] * self.OP
                     y = (page_size[3] - pos[1]) * self.OP
 
                     w = pos[2] * self.OP
                     h = -pos[3] * self.OP
-                    c.drawImage(imgReade, x, y, w, h, 'auto')
+                    with self.stats.stage("draw_seals"):
+                        c.drawImage(imgReade, x, y, w, h, 'auto')
                     logger.debug(f"签章写入成功")
             else:
                 # 无签章
@@ -726,7 +722,7 @@ class DrawPDF():
                 try:
                     canvas_obj.setFont(fallback_font, font_size)
                     fallback_attempted = True
-                    logger.debug(f"字体回退到: {fallback_font}")
+                    logger.debug("字体回退到: {}", fallback_font)
                     return fallback_font
                 except KeyError:
                     continue
@@ -736,7 +732,7 @@ class DrawPDF():
                 try:
                     default_font = "Helvetica"
                     canvas_obj.setFont(default_font, font_size)
-                    logger.debug(f"所有字体回退失败，使用默认字体: {default_font}")
+                    logger.debug("所有字体回退失败，使用默认字体: {}", default_font)
                     return default_font
                 except Exception as e:
                     logger.error(f"默认字体设置失败: {e}")
@@ -772,23 +768,18 @@ class DrawPDF():
                 })
         self.draw_img( canvas, img_list, images, page_size)
         
-    def draw_pdf_multithread(self):
+    def _collect_pages(self):
         """
-        生成PDF文件，使用并发处理优化性能
-        由于ReportLab不是线程安全的，采用并发生成子PDF然后合并的策略
-        
-        可配置参数（通过__init__方法的kwargs传入）：
-        - max_workers: 最大线程数，None表示自动计算（默认为CPU核心数和8的较小值）
-        - single_thread_threshold: 页面数量阈值，低于此值使用单线程（默认10）
-        - min_pages_per_chunk: 每个子PDF的最小页数（默认1）
-        - optimized_pages_per_chunk: 优化性能的每块页数（默认5）
-        - force_single_thread: 强制使用单线程模式（默认False）
+        收集所有需要绘制的页面任务，按 page_list 过滤
         """
+        # 处理页码列表参数
+        if self.page_list is None:
+            target_pages = None
+        else:
+            # 如果是单个页码，则转换为列表
+            target_pages = [self.page_list] if isinstance(self.page_list, int) else self.page_list
+            logger.info(f"仅处理指定页码: {target_pages}")
 
-        can_merge_pdfs = True
-        start_draw_time = time.time()
-        
-        # 收集所有页面任务
         all_pages = []
         for doc_id, doc in enumerate(self.data):
             fonts = doc.get("fonts")
@@ -796,20 +787,23 @@ class DrawPDF():
             default_page_size = doc.get("default_page_size")
             page_size_details = doc.get("page_size")
             signatures_page_id = doc.get("signatures_page_id")
+            seals = doc.get("seals")
             annotation_info = doc.get("annotation_info")
-            
+
             for pg_no, page in doc.get("page_info").items():
+                # 如果指定了页码列表，且当前页码不在列表中，则跳过
+                if target_pages is not None and pg_no not in target_pages:
+                    continue
                 # 确定页面尺寸
-                page_size_found = False
                 if len(page_size_details) > pg_no and page_size_details[pg_no]:
                     page_size = page_size_details[pg_no]
-                    page_size_found = True
                 else:
                     page_size = default_page_size
                     logger.warning(f"页码 {pg_no} 未找到详细页面尺寸信息，使用默认尺寸")
-                
-                # 收集页面数据，用于后续处理
-                page_data = {
+
+                if self.stats.enabled:
+                    self._count_page(page, (signatures_page_id or {}).get(pg_no))
+                all_pages.append({
                     'doc_id': doc_id,
                     'pg_no': pg_no,
                     'page': page,
@@ -817,299 +811,340 @@ class DrawPDF():
                     'images': images,
                     'page_size': page_size,
                     'signatures_page_id': signatures_page_id,
+                    'seals': seals,
                     'annotation_info': annotation_info,
-                    'is_last_page': pg_no == len(doc.get("page_info")) - 1 and doc_id == len(self.data) - 1
-                }
-                all_pages.append(page_data)
-        
+                })
+        return all_pages
+
+    def _count_page(self, page, signatures_page_list=None):
+        """统计页面对象数量，在父进程中按解析结果计数，多进程绘制时同样准确"""
+        text_list = page.get("text_list") or []
+        self.stats.incr("pages")
+        self.stats.incr("text_runs", len(text_list))
+        self.stats.incr("glyphs", sum(len(text_d.get("text") or "") for text_d in text_list))
+        self.stats.incr("paths", len(page.get("line_list") or []))
+        self.stats.incr("images", len(page.get("img_list") or []))
+        if self.with_signature:
+            self.stats.incr("seals", len(signatures_page_list or []))
+
+    def _draw_page(self, c, page_data):
+        """绘制单页内容 图层顺序 图片>文本>线条>签章>注释"""
+        page = page_data['page']
+        fonts = page_data['fonts']
+        images = page_data['images']
+        page_size = page_data['page_size']
+        pg_no = page_data['pg_no']
+
+        # 设置页面尺寸
+        c.setPageSize((page_size[2] * self.OP, page_size[3] * self.OP))
+
+        # 写入图片
+        if page.get("img_list"):
+            with self.stats.stage("draw_images"):
+                self.draw_img(c, page.get("img_list"), images, page_size)
+
+        # 写入文本
+        if page.get("text_list"):
+            with self.stats.stage("draw_text"):
+                self.draw_chars(c, page.get("text_list"), fonts, page_size)
+
+        # 绘制线条
+        if page.get("line_list"):
+            with self.stats.stage("draw_paths"):
+                self.draw_line(c, page.get("line_list"), page_size)
+
+        # 绘制签章
+        if self.with_signature and page_data['signatures_page_id']:
+            self.draw_signature(c, page_data['signatures_page_id'].get(pg_no), page_size, page_data.get('seals'))
+
+        # 绘制注释
+        if page_data['annotation_info'] and pg_no in page_data['annotation_info']:
+            with self.stats.stage("draw_annotations"):
+                self.draw_annotation(c, page_data['annotation_info'].get(pg_no), images, page_size)
+
+        # 结束当前页 c.save() 不会再追加空白页
+        c.showPage()
+
+    def _zip_file(self, resource: ZipResource):
+        """延迟读取资源所在的 ofd，同一文件只打开一次"""
+        if resource.zip_path not in self._zip_files:
+            self._zip_files[resource.zip_path] = zipfile.ZipFile(resource.zip_path, 'r')
+        return self._zip_files[resource.zip_path]
+
+    def _draw_pages(self, pages, pdf_io):
+        """单线程将页面依次绘制到 pdf_io"""
+        c = canvas.Canvas(pdf_io)
+        c.setAuthor(self.author)
+        try:
+            for page_data in pages:
+                self._draw_page(c, page_data)
+            with self.stats.stage("pdf_save"):
+                c.save()
+        finally:
+            for zip_file in self._zip_files.values():
+                zip_file.close()
+            self._zip_files.clear()
+
+    def _slim_chunk(self, chunk_pages):
+        """
+        精简子进程任务数据：每个页面块只携带本块页面以及其引用到的图片、字体、签章值、注释
+        同一块内的页面共享同一份资源字典，pickle 时只序列化一次
+        """
+        images, fonts, seals = {}, {}, {}
+        slim_pages = []
+        for page_data in chunk_pages:
+            page = page_data['page']
+            pg_no = page_data['pg_no']
+            doc_images = page_data['images'] or {}
+            doc_fonts = page_data['fonts'] or {}
+            signatures_page_id = page_data['signatures_page_id'] or {}
+            annotation_info = page_data['annotation_info'] or {}
+
+            res_ids = [img_d.get("ResourceID") for img_d in page.get("img_list") or []]
+            for annotation in (annotation_info.get(pg_no) or {}).values():
+                res_ids.append((annotation.get("ImgageObject") or {}).get("ResourceID"))
+            for res_id in res_ids:
+                if res_id in doc_images:
+                    images[res_id] = doc_images[res_id]
+            for text_d in page.get("text_list") or []:
+                if text_d.get("font") in doc_fonts:
+                    fonts[text_d["font"]] = doc_fonts[text_d["font"]]
+            doc_seals = page_data.get('seals') or {}
+            for signature_info in signatures_page_id.get(pg_no) or []:
+                if signature_info.get("SealRef") in doc_seals:
+                    seals[signature_info["SealRef"]] = doc_seals[signature_info["SealRef"]]
+
+            slim_pages.append({
+                'doc_id': page_data['doc_id'],
+                'pg_no': pg_no,
+                'page': page,
+                'fonts': fonts,
+                'images': images,
+                'page_size': page_data['page_size'],
+                'signatures_page_id': {pg_no: signatures_page_id[pg_no]} if pg_no in signatures_page_id else {},
+                'seals': seals,
+                'annotation_info': {pg_no: annotation_info[pg_no]} if pg_no in annotation_info else {},
+            })
+        return slim_pages
+
+    def _sub_pdf_options(self):
+        """子进程内重建 DrawPDF 所需的参数"""
+        return {
+            "pdf_name": self.pdf_uuid_name,
+            "render_mode": self.render_mode,
+            "with_signature": self.with_signature,
+            "trace": self.trace,
+        }
+
+    def _resolve_workers(self):
+        """max_workers 为 None/0 时按 CPU 核数自动计算，最多8个进程"""
+        if not self.max_workers:
+            return min(multiprocessing.cpu_count(), 8)
+        return max(1, self.max_workers)
+
+    def _draw_chunk(self, chunk_pages):
+        """在当前进程绘制一个页面块，返回子PDF字节"""
+        sub_pdf_io = BytesIO()
+        self._draw_pages(chunk_pages, sub_pdf_io)
+        return sub_pdf_io.getvalue()
+
+    def _iter_sub_pdfs(self, chunks, max_workers=1):
+        """
+        按页序逐块产出子PDF字节
+        max_workers > 1 时在进程池中绘制，最多 2 * max_workers 个页面块在途，避免全部子PDF同时驻留内存；
+        子进程失败或进程池不可用的页面块在当前进程补绘，保证页数与页序
+        """
+        if max_workers <= 1:
+            for chunk in chunks:
+                yield self._draw_chunk(chunk)
+            return
+
+        options = self._sub_pdf_options()
+        try:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        except Exception as e:
+            logger.error(f"进程池创建失败，回退单线程: {e}")
+            for chunk in chunks:
+                yield self._draw_chunk(chunk)
+            return
+
+        with executor:
+            pending = deque()
+            next_idx = 0
+            while pending or next_idx < len(chunks):
+                while next_idx < len(chunks) and len(pending) < max_workers * 2:
+                    try:
+                        future = executor.submit(_draw_sub_pdf, self._slim_chunk(chunks[next_idx]), options)
+                    except Exception as e:
+                        logger.error(f"提交子PDF {next_idx + 1} 失败: {e}")
+                        future = None
+                    pending.append((next_idx, future))
+                    next_idx += 1
+
+                chunk_idx, future = pending.popleft()
+                chunk = chunks[chunk_idx]
+                sub_pdf = None
+                if future is not None:
+                    try:
+                        sub_pdf = future.result()
+                        logger.info(f"子PDF {chunk_idx + 1}/{len(chunks)} 生成成功（页码: "
+                                    f"{chunk[0]['pg_no']}-{chunk[-1]['pg_no']}）")
+                    except Exception as e:
+                        logger.error(f"处理子PDF {chunk_idx + 1} 时发生异常: {e}")
+                if sub_pdf is None:
+                    sub_pdf = self._draw_chunk(chunk)
+                yield sub_pdf
+
+    def draw_pdf_multithread(self, all_pages=None):
+        """
+        生成PDF文件，使用多进程并发处理优化性能
+        ReportLab 为纯 Python 绘制，线程会被 GIL 串行化，因此按页面块在子进程内生成子PDF，再按页序合并
+
+        可配置参数（通过__init__方法的kwargs传入）：
+        - max_workers: 最大进程数，None/0 表示自动计算（默认为CPU核心数和8的较小值）
+        - single_thread_threshold: 页面数量阈值，低于此值使用单线程（默认10）
+        - min_pages_per_chunk: 每个子PDF的最小页数（默认1）
+        - optimized_pages_per_chunk: 优化性能的每块页数（默认5）
+        - force_single_thread: 强制使用单线程模式（默认False）
+        """
+        start_draw_time = time.time()
+        if all_pages is None:
+            all_pages = self._collect_pages()
+
         total_pages = len(all_pages)
         logger.info(f"开始处理 {total_pages} 页")
-        
-        # 如果页面数量很少、不能合并PDF或强制使用单线程，直接使用单线程模式
-        if total_pages <= self.single_thread_threshold or not can_merge_pdfs or self.force_single_thread:
-            logger.info("页面数量较少或无法合并PDF，使用单线程模式处理")
-            # 使用原始的单线程方式处理
-            c = canvas.Canvas(self.pdf_io)
-            c.setAuthor(self.author)
-            
-            for page_data in all_pages:
-                page = page_data['page']
-                fonts = page_data['fonts']
-                images = page_data['images']
-                page_size = page_data['page_size']
-                pg_no = page_data['pg_no']
-                
-                # 设置页面尺寸
-                c.setPageSize((page_size[2] * self.OP, page_size[3] * self.OP))
-                
-                # 写入图片
-                if page.get("img_list"):
-                    self.draw_img(c, page.get("img_list"), images, page_size)
-                
-                # 写入文本
-                if page.get("text_list"):
-                    self.draw_chars(c, page.get("text_list"), fonts, page_size)
-                
-                # 绘制线条
-                if page.get("line_list"):
-                    self.draw_line(c, page.get("line_list"), page_size)
-                
-                # 绘制签章
-                if page_data['signatures_page_id']:
-                    self.draw_signature(c, page_data['signatures_page_id'].get(pg_no), page_size)
-                
-                # 绘制注释
-                if page_data['annotation_info'] and pg_no in page_data['annotation_info']:
-                    self.draw_annotation(c, page_data['annotation_info'].get(pg_no), images, page_size)
-                
-                # 显示下一页（除了最后一页）
-                if not page_data['is_last_page']:
-                    c.showPage()
-            
-            # 保存PDF
-            c.save()
+
+        # 如果页面数量很少或强制使用单线程，直接使用单线程模式
+        if total_pages <= self.single_thread_threshold or self.force_single_thread:
+            logger.info("页面数量较少，使用单线程模式处理")
+            self._draw_pages(all_pages, self.pdf_io)
             logger.info(f"PDF内容已保存，绘制总耗时: {time.time() - start_draw_time:.2f}秒")
             return
-        
-        # 使用并发生成子PDF然后合并的方式
-        logger.info("使用并发生成子PDF然后合并的策略优化性能")
-        
-        # 动态确定线程池大小
-        import multiprocessing
-        if self.max_workers is None:
-            max_workers = min(multiprocessing.cpu_count(), 8)  # 默认最多使用8个线程
-        else:
-            max_workers = max(1, self.max_workers)  # 确保至少有1个线程
-        logger.info(f"使用线程池大小: {max_workers}")
-        
+
+        # 动态确定进程池大小
+        max_workers = self._resolve_workers()
+
         # 计算每个子PDF处理的页面数
         pages_per_chunk = max(self.min_pages_per_chunk, total_pages // (max_workers * 2))
         # 确保每个子PDF至少处理指定的优化页数（除非总页数少于max_workers*optimized_pages_per_chunk）
         if total_pages >= max_workers * self.optimized_pages_per_chunk:
             pages_per_chunk = max(pages_per_chunk, self.optimized_pages_per_chunk)
-        
+
         # 将页面分成多个块
-        chunks = []
-        for i in range(0, total_pages, pages_per_chunk):
-            chunk = all_pages[i:i + pages_per_chunk]
-            # 确保最后一页标记正确
-            if chunk:
-                chunk[-1]['is_last_page'] = i + len(chunk) == total_pages
-            chunks.append(chunk)
-        
-        logger.info(f"将 {total_pages} 页分成 {len(chunks)} 个子PDF进行并发处理，每块 {pages_per_chunk} 页")
-        
-        # 子PDF生成函数
-        def generate_sub_pdf(chunk_pages):
-            """生成子PDF文件"""
-            try:
-                # 创建内存中的PDF
-                sub_pdf_io = io.BytesIO()
-                c = canvas.Canvas(sub_pdf_io)
-                c.setAuthor(self.author)
-                
-                for page_data in chunk_pages:
-                    page = page_data['page']
-                    fonts = page_data['fonts']
-                    images = page_data['images']
-                    page_size = page_data['page_size']
-                    pg_no = page_data['pg_no']
-                    
-                    # 设置页面尺寸
-                    c.setPageSize((page_size[2] * self.OP, page_size[3] * self.OP))
-                    
-                    # 写入图片
-                    if page.get("img_list"):
-                        self.draw_img(c, page.get("img_list"), images, page_size)
-                    
-                    # 写入文本
-                    if page.get("text_list"):
-                        self.draw_chars(c, page.get("text_list"), fonts, page_size)
-                    
-                    # 绘制线条
-                    if page.get("line_list"):
-                        self.draw_line(c, page.get("line_list"), page_size)
-                    
-                    # 绘制签章
-                    if page_data['signatures_page_id']:
-                        self.draw_signature(c, page_data['signatures_page_id'].get(pg_no), page_size)
-                    
-                    # 绘制注释
-                    if page_data['annotation_info'] and pg_no in page_data['annotation_info']:
-                        self.draw_annotation(c, page_data['annotation_info'].get(pg_no), images, page_size)
-                    
-                    # 显示下一页（除了块内最后一页）
-                    if page_data != chunk_pages[-1]:
-                        c.showPage()
-                
-                # 保存子PDF
-                c.save()
-                sub_pdf_io.seek(0)
-                
-                # 返回子PDF内容和页码范围
-                first_page = chunk_pages[0]['pg_no'] if chunk_pages else -1
-                last_page = chunk_pages[-1]['pg_no'] if chunk_pages else -1
-                return {
-                    'pdf_content': sub_pdf_io.getvalue(),
-                    'first_page': first_page,
-                    'last_page': last_page
-                }
-            except Exception as e:
-                logger.error(f"生成子PDF失败（页码范围 {chunk_pages[0]['pg_no'] if chunk_pages else 'unknown'}-{chunk_pages[-1]['pg_no'] if chunk_pages else 'unknown'}）: {e}")
-                import traceback
-                traceback.print_exc()
-                return None
-        
+        chunks = [all_pages[i:i + pages_per_chunk] for i in range(0, total_pages, pages_per_chunk)]
+        max_workers = min(max_workers, len(chunks))
+        logger.info(f"将 {total_pages} 页分成 {len(chunks)} 个子PDF, 使用进程池大小 {max_workers}，每块 {pages_per_chunk} 页")
+
         # 并发生成子PDF
-        sub_pdfs = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_chunk = {executor.submit(generate_sub_pdf, chunk): i for i, chunk in enumerate(chunks)}
-            
-            for future in concurrent.futures.as_completed(future_to_chunk):
-                chunk_idx = future_to_chunk[future]
-                try:
-                    sub_pdf_result = future.result()
-                    if sub_pdf_result:
-                        sub_pdfs.append((chunk_idx, sub_pdf_result))
-                        logger.info(f"子PDF {chunk_idx + 1}/{len(chunks)} 生成成功（页码: {sub_pdf_result['first_page']}-{sub_pdf_result['last_page']}）")
-                except Exception as e:
-                    logger.error(f"处理子PDF {chunk_idx + 1} 时发生异常: {e}")
-        
-        # 按顺序排序子PDF
-        sub_pdfs.sort(key=lambda x: x[0])
-        
+        with self.stats.stage("draw_chunks"):
+            sub_pdfs = list(self._iter_sub_pdfs(chunks, max_workers))
+
         # 合并子PDF
-        logger.info(f"开始合并 {len(sub_pdfs)} 个子PDF")
-        merger = PdfWriter()
-        
-        for idx, sub_pdf_info in sub_pdfs:
-            try:
-                pdf_reader = PdfReader(io.BytesIO(sub_pdf_info['pdf_content']))
-                for page in pdf_reader.pages:
-                    merger.add_page(page)
-                logger.info(f"已合并子PDF {idx + 1}/{len(sub_pdfs)}")
-            except Exception as e:
-                logger.error(f"合并子PDF {idx + 1} 时发生异常: {e}")
-        
-        # 保存合并后的PDF到self.pdf_io
-        merger.write(self.pdf_io)
-        merger.close()
-        
+        with self.stats.stage("merge"):
+            self.pdf_io.write(self.merge_pdfs(sub_pdfs))
+
         # 将self.pdf_io指针移到开始位置
         self.pdf_io.seek(0)
-        
+
         logger.info(f"PDF合并完成，总耗时: {time.time() - start_draw_time:.2f}秒")
-    
+
+    def merge_pdfs(self, sub_pdfs):
+        """
+        按顺序合并子PDF
+        使用 fitz insert_pdf (C 实现) 拼接页面，再以 garbage=4 对比流内容去重并回收无用对象，
+        各子PDF中重复的字体、签章、背景图片在结果中只保留一份
+        """
+        start_time = time.time()
+        logger.info(f"开始合并 {len(sub_pdfs)} 个子PDF")
+        merged = fitz.open()
+        try:
+            for idx, sub_pdf in enumerate(sub_pdfs):
+                try:
+                    with fitz.open(stream=sub_pdf, filetype="pdf") as sub_doc:
+                        merged.insert_pdf(sub_doc)
+                except Exception as e:
+                    logger.error(f"合并子PDF {idx + 1} 时发生异常: {e}")
+            merged.set_metadata({"author": self.author, "producer": "ReportLab PDF Library - www.reportlab.com"})
+            pdfbytes = merged.tobytes(garbage=4, deflate=True)
+        finally:
+            merged.close()
+        logger.info(f"子PDF合并去重完成，耗时: {time.time() - start_time:.2f}秒")
+        return pdfbytes
+
     def draw_pdf(self):
         """
-        生成PDF文件，使用单线程处理
-        适用于页面数量较少的场景，避免多线程的开销
+        生成PDF文件
+        默认单线程处理；max_workers 不为 None/1 时使用多进程渲染，页数不超过 single_thread_threshold 自动回退单线程
         """
         start_draw_time = time.time()
-        
-         # 处理页码列表参数
-        if self.page_list is None:
-            # 如果未指定页码列表，则处理所有页面
-            process_all_pages = True
-            target_pages = None
-        else:
-            process_all_pages = False
-            # 如果是单个页码，则转换为列表
-            if isinstance(self.page_list, int):
-                target_pages = [self.page_list]
-            else:
-                target_pages = self.page_list
-            logger.info(f"仅处理指定页码: {target_pages}")
-        
 
-        # 收集所有页面任务
-        all_pages = []
-        for doc_id, doc in enumerate(self.data):
-            fonts = doc.get("fonts")
-            images = doc.get("images")
-            default_page_size = doc.get("default_page_size")
-            page_size_details = doc.get("page_size")
-            signatures_page_id = doc.get("signatures_page_id")
-            annotation_info = doc.get("annotation_info")
-            
-            for pg_no, page in doc.get("page_info").items():
-                # 如果指定了页码列表，且当前页码不在列表中，则跳过
-                if not process_all_pages and pg_no not in target_pages:
-                    continue
-                # 确定页面尺寸
-                page_size_found = False
-                if len(page_size_details) > pg_no and page_size_details[pg_no]:
-                    page_size = page_size_details[pg_no]
-                    page_size_found = True
-                else:
-                    page_size = default_page_size
-                    logger.warning(f"页码 {pg_no} 未找到详细页面尺寸信息，使用默认尺寸")
-                
-                # 收集页面数据，用于后续处理
-                page_data = {
-                    'doc_id': doc_id,
-                    'pg_no': pg_no,
-                    'page': page,
-                    'fonts': fonts,
-                    'images': images,
-                    'page_size': page_size,
-                    'signatures_page_id': signatures_page_id,
-                    'annotation_info': annotation_info,
-                    'is_last_page': pg_no == len(doc.get("page_info")) - 1 and doc_id == len(self.data) - 1
-                }
-                all_pages.append(page_data)
-        
+        all_pages = self._collect_pages()
         total_pages = len(all_pages)
         if total_pages == 0:
             logger.warning("没有找到匹配的页码进行处理")
-            # 返回空PDF或适当的错误处理
+
+        if self.max_workers != 1 and self.max_workers is not None and not self.force_single_thread:
+            self.draw_pdf_multithread(all_pages)
+            return self.pdf_io.getvalue()
+
         logger.info(f"开始单线程处理 {total_pages} 页")
-        
-        # 使用单线程方式处理
-        c = canvas.Canvas(self.pdf_io)
-        c.setAuthor(self.author)
-        
-        for page_data in all_pages:
-            page = page_data['page']
-            fonts = page_data['fonts']
-            images = page_data['images']
-            page_size = page_data['page_size']
-            pg_no = page_data['pg_no']
-            
-            # 设置页面尺寸
-            c.setPageSize((page_size[2] * self.OP, page_size[3] * self.OP))
-            
-            # 写入图片
-            if page.get("img_list"):
-                self.draw_img(c, page.get("img_list"), images, page_size)
-            
-            # 写入文本
-            if page.get("text_list"):
-                self.draw_chars(c, page.get("text_list"), fonts, page_size)
-            
-            # 绘制线条
-            if page.get("line_list"):
-                self.draw_line(c, page.get("line_list"), page_size)
-            
-            # 绘制签章
-            if self.with_signature and page_data['signatures_page_id']:
-                self.draw_signature(c, page_data['signatures_page_id'].get(pg_no), page_size)
-            
-            # 绘制注释
-            if page_data['annotation_info'] and pg_no in page_data['annotation_info']:
-                self.draw_annotation(c, page_data['annotation_info'].get(pg_no), images, page_size)
-            
-            # 显示下一页（除了最后一页）
-            if not page_data['is_last_page']:
-                c.showPage()
-        
-        # 保存PDF
-        c.save()
+        self._draw_pages(all_pages, self.pdf_io)
         # 将self.pdf_io指针移到开始位置并返回PDF字节数据
         self.pdf_io.seek(0)
         logger.info(f"PDF内容已保存，单线程绘制总耗时: {time.time() - start_draw_time:.2f}秒")
         return self.pdf_io.getvalue()
 
+    def draw_pdf_to(self, output):
+        """
+        流式写出PDF到文件路径或可写二进制流
+        每 stream_pages_per_chunk 页绘制为一个子PDF，写完即以增量保存追加到目标文件，
+        随后释放该块的画布与解码后的图片、签章，绘制部分的内存由单个页面块决定；
+        解析结果来自 OFDParser(path=...)（OFD.read(..., lazy=True)）时图片、签章值只在绘制引用它的页面时从 ofd 读取，
+        峰值内存为页面结构加单个页面块；否则所有图片资源的 base64 在整个过程中常驻，峰值仍随图片总量增长。
+        输出为流时先写入临时文件，最后分块拷贝到流；输出为路径时写临时文件再原子替换。
+        增量追加不做跨块去重，多块重复引用的签章等资源会各保留一份。
+        """
+        start_draw_time = time.time()
+        all_pages = self._collect_pages()
+        total_pages = len(all_pages)
+
+        if self.max_workers in (None, 1) or self.force_single_thread or total_pages <= self.single_thread_threshold:
+            max_workers = 1
+        else:
+            max_workers = self._resolve_workers()
+
+        pages_per_chunk = max(1, self.stream_pages_per_chunk)
+        chunks = [all_pages[i:i + pages_per_chunk] for i in range(0, total_pages, pages_per_chunk)] or [[]]
+        logger.info(f"流式输出 {total_pages} 页，分 {len(chunks)} 块，每块 {pages_per_chunk} 页")
+
+        if isinstance(output, (str, os.PathLike)):
+            out_dir = os.path.dirname(os.path.abspath(output))
+            fd, temp_path = tempfile.mkstemp(suffix=".pdf", dir=out_dir)
+        else:
+            fd, temp_path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        try:
+            for chunk_idx, sub_pdf in enumerate(self._iter_sub_pdfs(chunks, max_workers)):
+                if chunk_idx == 0:
+                    with open(temp_path, "wb") as f:
+                        f.write(sub_pdf)
+                else:
+                    with self.stats.stage("merge"), fitz.open(temp_path) as doc, \
+                            fitz.open(stream=sub_pdf, filetype="pdf") as sub_doc:
+                        doc.insert_pdf(sub_doc)
+                        doc.saveIncr()
+                del sub_pdf
+
+            if isinstance(output, (str, os.PathLike)):
+                os.replace(temp_path, output)
+            else:
+                with open(temp_path, "rb") as f:
+                    shutil.copyfileobj(f, output)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        logger.info(f"PDF流式写出完成，总耗时: {time.time() - start_draw_time:.2f}秒")
+
     def __call__(self):
         start_time = time.time()
         try:
@@ -1125,3 +1160,15 @@ class DrawPDF():
             self.gen_empty_pdf()
             pdfbytes = self.pdf_io.getvalue()
         return pdfbytes
+
+
+def _draw_sub_pdf(chunk_pages, options):
+    """
+    子进程入口：绘制一个页面块并返回子PDF字节
+    chunk_pages 由 DrawPDF._slim_chunk 生成，只包含本块页面及其引用资源
+    """
+    options = dict(options)
+    pdf_name = options.pop("pdf_name")
+    drawer = DrawPDF([{"pdf_name": pdf_name}], **options)
+    drawer._draw_pages(chunk_pages, drawer.pdf_io)
+    return drawer.pdf_io.getvalue()
@@ -8,103 +8,163 @@
 import io
 import base64
 
-from PIL import Image, UnidentifiedImageError
+from PIL import Image
 from loguru import logger
-from pyasn1.codec.der.decoder import decode
-from pyasn1.type import univ
-from pyasn1.error import PyAsn1Error
 
 
+# 签章图片候选的文件头，OctetString 内容按此过滤后才交给 PIL 解码
+IMAGE_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"PK\x03\x04", "ofd"),  # 印章图片本身为 ofd
+)
+MAX_DEPTH = 32  # DER 嵌套层数上限
+MAX_NODES = 100000  # 单个签章值最多遍历的元素数
+MAX_SIZE = 64 * 1024 * 1024  # 单个签章值大小上限
+
+
+def image_format(data):
+    """按文件头判断图片格式，不是候选格式返回 None"""
+    for magic, fmt in IMAGE_MAGIC:
+        if data[:len(magic)] == magic:
+            return fmt
+    return None
+
+
+def _read_header(buf, pos, end):
+    """
+    读取 DER 元素头，返回 (tag, 是否构造类型, 内容起点, 内容终点)，非法时返回 None
+    只支持定长编码；高位标签号按 base128 跳过
+    """
+    if pos + 2 > end:
+        return None
+    tag = buf[pos]
+    pos += 1
+    if tag & 0x1f == 0x1f:
+        while pos < end and buf[pos] & 0x80:
+            pos += 1
+        pos += 1
+    if pos >= end:
+        return None
+    length = buf[pos]
+    pos += 1
+    if length & 0x80:
+        num = length & 0x7f
+        # 0x80 为 BER 不定长，超过 4 字节的长度不可能合法
+        if num == 0 or num > 4 or pos + num > end:
+            return None
+        length = int.from_bytes(buf[pos:pos + num], "big")
+        pos += num
+    if pos + length > end:
+        return None
+    return tag, bool(tag & 0x20), pos, pos + length
+
+
+def iter_octet_strings(data, max_depth=MAX_DEPTH, max_nodes=MAX_NODES):
+    """
+    迭代遍历 DER 结构，按出现顺序产出所有 OctetString 内容的 memoryview，不复制数据
+    构造类型（SEQUENCE / SET / 构造的上下文标签）入栈下钻；内容本身是 SEQUENCE 的 OctetString 同样下钻（封装的签章结构）
+    超过 max_depth 的层级与 max_nodes 之后的元素直接跳过，遇到非法长度停止解析当前层
+    """
+    buf = memoryview(data)
+    stack = [(0, len(buf), 0)]
+    nodes = 0
+    while stack:
+        pos, end, depth = stack.pop()
+        if pos >= end:
+            continue
+        nodes += 1
+        if nodes > max_nodes:
+            logger.warning(f"签章 DER 元素超过 {max_nodes} 个，停止解析")
+            return
+        header = _read_header(buf, pos, end)
+        if header is None:
+            continue
+        tag, constructed, start, stop = header
+        # 同层剩余元素先入栈，子元素后入栈，保证按出现顺序产出
+        stack.append((stop, end, depth))
+        if constructed:
+            if depth < max_depth:
+                stack.append((start, stop, depth + 1))
+        elif tag == 0x04:
+            content = buf[start:stop]
+            yield content
+            if depth < max_depth and stop - start > 2 and content[0] == 0x30 and image_format(content) is None:
+                stack.append((start, stop, depth + 1))
+
+
+def iter_seal_images(data, max_depth=MAX_DEPTH, max_nodes=MAX_NODES):
+    """产出 (格式, memoryview) 形式的签章图片候选，只按文件头过滤，不解码"""
+    fmt = image_format(data)
+    if fmt:
+        # 签章值本身就是图片
+        yield fmt, memoryview(data)
+        return
+    for content in iter_octet_strings(data, max_depth=max_depth, max_nodes=max_nodes):
+        fmt = image_format(content)
+        if fmt:
+            yield fmt, content
+
+
+def _ofd_seal_image(data):
+    """印章图片为 ofd 时绘制首页为图片，不绘制其中的签章，避免递归"""
+    from fastofd.draw.draw_img import DrawImage
+    from fastofd.draw.draw_pdf import DrawPDF
+    from fastofd.parser_ofd.ofd_parser import OFDParser
+
+    ofd_data = OFDParser(str(base64.b64encode(data), "utf-8"))()
+    pdfbytes = DrawPDF(ofd_data, page_list=[0], with_signature=False).draw_pdf()
+    images = DrawImage(pdfbytes)([0])
+    return images[0] if images else None
+
 
 class SealExtract(object):
     def __init__(self,):
         pass
-    def read_signed_value(self, path="", b64=""):
-        # 读取二进制文件
+
+    @staticmethod
+    def _read_bytes(path="", b64="", data=None):
+        if data is not None:
+            return data
         if b64:
-            binary_data = base64.b64decode(b64)
-        elif path:
-            # print("seal_path",path)
+            return base64.b64decode(b64)
+        if path:
             with open(path, 'rb') as file:
-                binary_data = file.read()
-        else:
-            return
-        # 尝试解码为通用的 ASN.1 结构
-        try:
-            decoded_data, _ = decode(binary_data)
-        except (PyAsn1Error,) as e:
-            logger.warning(f"Decoding failed: {e}")
-            decoded_data = None
-        except (AttributeError,) as e:
-            logger.warning(f"AttributeError failed: {e}")
-            decoded_data = None
-        finally:
-           return  decoded_data
-
-
-    def find_octet_strings(self, asn1_data,octet_strings:list):
-
-        # 递归查找所有的 OctetString 实例
-
-        if isinstance(asn1_data, univ.OctetString):
-
-            octet_strings.append(asn1_data)
-        elif isinstance(asn1_data, univ.Sequence) or isinstance(asn1_data, univ.Set):
-            for component in asn1_data:
-                self.find_octet_strings(asn1_data[f"{component}"], octet_strings)
-        elif isinstance(asn1_data, univ.Choice):
-            self.find_octet_strings(asn1_data.getComponent(), octet_strings)
-        elif isinstance(asn1_data, univ.Any):
-            try:
-                sub_data, _ = decode(asn1_data.asOctets())
-                self.find_octet_strings(sub_data, octet_strings)
-            except PyAsn1Error:
-                pass
-
+                return file.read()
+        return b""
 
-    def hex_to_image(self, hex_data, image_format='PNG',inx=0):
+    def __call__(self, path="", b64="", data=None):
         """
-        将16进制数据转换为图片并保存。
-
-        :param hex_data: 图片的16进制数据字符串
-        :param image_format: 图片的格式，默认为'PNG'
+        提取签章图片，返回 PIL 图片列表
+        path / b64 / data: 签章值文件路径、base64 或原始字节，三选一
+        直接遍历 DER 字节查找 OctetString，按文件头过滤候选后再解码，不做完整 ASN.1 解码
         """
-        # 将16进制数据转换为二进制数据
-
-        binary_data = bytes.fromhex(hex_data)
-
-        # 创建BytesIO对象以读取二进制数据
-        image_stream = io.BytesIO(binary_data)
-
-        # 使用Pillow打开图像数据并保存
-        try:
-            image = Image.open(image_stream)
-            # image.save(f'{inx}_image.{image_format}', format=image_format)
-            # print(f"图片已保存为'image.{image_format}'")
-            return image
-        except UnidentifiedImageError:
-            logger.debug("not img ")
-
-    def __call__(self, path="", b64=""):
-
-        decoded_data = self.read_signed_value(path=path, b64=b64)
-        octet_strings = []
+        data = self._read_bytes(path=path, b64=b64, data=data)
+        if len(data) > MAX_SIZE:
+            logger.warning(f"签章数据过大 {len(data)} bytes，跳过")
+            return []
         img_list = []  # 目前是只有一个的，若存在多个的话关联后面考虑
-        if decoded_data:
-            self.find_octet_strings(decoded_data, octet_strings)
-
-            for i, octet_string in enumerate(octet_strings):
-                # logger.info(f"octet_string{octet_string}")
-                if str(octet_string.prettyPrint()).startswith("0x"):
-
-                    img = self.hex_to_image(str(octet_string.prettyPrint())[2:],inx= i)
-                    if img:
-                        logger.debug("ASN.1 data found.")
-                        img_list.append(img)
-        else:
+        for fmt, content in iter_seal_images(data):
+            try:
+                if fmt == "ofd":
+                    img = _ofd_seal_image(bytes(content))
+                else:
+                    img = Image.open(io.BytesIO(content))
+                    img.load()
+            except Exception as e:
+                logger.debug("签章图片候选解码失败 {}: {}", fmt, e)
+                continue
+            if img:
+                img_list.append(img)
+        if not img_list:
             logger.debug("No valid ASN.1 data found.")
+        return img_list
 
-        return  img_list
 
 if __name__=="__main__":
     print(SealExtract()(r"F:\code\easyofd\test\1111_xml\Doc_0\Signs\Sign_0\SignedValue.dat" ))
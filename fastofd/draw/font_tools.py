@@ -101,7 +101,7 @@ class FontTool(object):
                 final.append(n)
                 seen.add(n)
 
-        logger.debug(f"Font fallback order: {final[:10]} ... total {len(final)}")
+        logger.debug("Font fallback order: {} ... total {}", final[:10], len(final))
         return final
 
     def normalize_font_name(self, font_name):
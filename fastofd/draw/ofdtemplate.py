@@ -6,6 +6,7 @@
 #AUTHOR: reno 
 #note:  ofd 基础结构模板
 import tempfile
+import io
 import os
 import abc
 import copy
@@ -549,8 +550,9 @@ class OFDStructure(object):
                   with open(os.path.join(temp_dir_res, k), "wb") as f:
                       f.write(v)
 
-            # 打包成ofd
-            zip = zipfile.ZipFile("test.ofd", "w", zipfile.ZIP_DEFLATED)
+            # 打包成ofd，在内存中完成，避免并发时共用当前目录下的 test.ofd
+            zip_io = io.BytesIO()
+            zip = zipfile.ZipFile(zip_io, "w", zipfile.ZIP_DEFLATED)
             for path, dirnames, filenames in os.walk(temp_dir):
                 # 去掉目标跟路径，只对目标文件夹下边的文件及文件夹进行压缩
                 fpath = path.replace(temp_dir, '')
@@ -558,11 +560,7 @@ class OFDStructure(object):
                 for filename in filenames:
                     zip.write(os.path.join(path, filename), os.path.join(fpath, filename))
             zip.close()
-            with open("test.ofd", "rb") as f:
-                content = f.read()
-            if os.path.exists("test.ofd"):
-               os.remove("test.ofd")
-            return content
+            return zip_io.getvalue()
 
 if  __name__ == "__main__":
     print("---------")
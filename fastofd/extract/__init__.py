@@ -0,0 +1,6 @@
+from .glyphs import glyph_boxes
+from .text import iter_text, page_text, to_text, to_json, to_hocr
+from .layout import page_layout
+from .spatial import GridIndex, PageIndex
+from .table import page_tables
+from .invoice import extract_invoice, extract_invoices
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 21:00
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 文本对象的字形坐标计算，绘制 pdf 与文本抽取共用
+from typing import List
+
+# 字形框相对基线的上下比例（按字号），OFD 不携带字体度量，取常见字体的近似值
+ASCENT = 0.88
+DESCENT = 0.12
+
+
+def expand_delta(delta_rule: str) -> List[float]:
+    """
+    把 DeltaX / DeltaY 展开成纯粹的浮点增量列表
+    支持 g <count> <value> 语法
+    """
+    if not delta_rule or not delta_rule.strip():
+        return []
+
+    tokens = delta_rule.strip().split()
+    out, i = [], 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok == "g" and i + 2 < len(tokens):
+            count = int(tokens[i + 1])
+            value = float(tokens[i + 2])
+            out.extend([value] * count)
+            i += 3
+        else:
+            out.append(float(tok))
+            i += 1
+    return out
+
+
+def parse_ctm(ctm: str) -> dict:
+    """文本 CTM 'a b c d e f' 转为 resize/rotate/move 字典，格式不对返回空字典"""
+    if not ctm:
+        return {}
+    parts = ctm.split(" ")
+    if len(parts) != 6:
+        return {}
+    return {
+        "resizeX": float(parts[0]),
+        "rotateX": float(parts[1]),
+        "rotateY": float(parts[2]),
+        "resizeY": float(parts[3]),
+        "moveX": float(parts[4]),
+        "moveY": float(parts[5]),
+    }
+
+
+def glyph_offsets(pos, offset, delta_rule, text, ctm_info, dire="X") -> List[float]:
+    """
+    返回每个字符在 dire 方向上的绝对坐标（mm）
+    pos: 文本框起点；offset: TextCode 的 X / Y；delta_rule: DeltaX / DeltaY
+    """
+    # ---- 1. 计算变换参数 ----
+    if ctm_info:
+        resize = ctm_info.get(f"resize{dire}", 1.0)
+        move = ctm_info.get(f"move{dire}", 0.0)
+    else:
+        resize, move = 1.0, 0.0
+
+    # ---- 2. 展开增量 ----
+    deltas = expand_delta(delta_rule)
+    # 长度对齐：不足的间隙用“最后一个增量值”补齐，避免 0 造成重叠
+    needed = (len(text) - 1) - len(deltas)
+    if needed > 0:
+        pad_val = deltas[-1] if deltas else 0.0
+        deltas.extend([pad_val] * needed)
+
+    # ---- 3. 首字符起点 ----
+    start = float(pos or 0.0) + (float(offset or 0.0) + move) * resize
+    coords = [start]
+
+    # ---- 4. 累加 ----
+    for d in deltas:
+        start += d * resize
+        coords.append(start)
+
+    return coords[:len(text)]
+
+
+def run_glyphs(text_d) -> tuple:
+    """
+    文本对象（ContentFileParser 的 text_list 元素）逐字坐标
+    返回 (x 列表, 基线 y 列表, 字号 mm)，坐标为页面绝对坐标，单位 mm，原点左上
+    """
+    text = text_d.get("text") or ""
+    ctm_info = parse_ctm(text_d.get("CTM", ""))
+    size = float(text_d.get("size") or 0) * (ctm_info.get("resizeY", 1.0) if ctm_info else 1.0)
+    pos = text_d.get("pos") or [0, 0, 0, 0]
+    xs = glyph_offsets(pos[0], text_d.get("X", ""), text_d.get("DeltaX", ""), text, ctm_info, dire="X")
+    ys = glyph_offsets(pos[1], text_d.get("Y", ""), text_d.get("DeltaY", ""), text, ctm_info, dire="Y")
+    return xs, ys, size
+
+
+def glyph_boxes(text_d) -> list:
+    """
+    逐字字形框 [(字符, [x0, y0, x1, y1])]，单位 mm，原点左上
+    字宽取到下一字起点的距离，最后一个字按字号估算（全角 1 个字号，半角 0.5 个）
+    """
+    text = text_d.get("text") or ""
+    xs, ys, size = run_glyphs(text_d)
+    boxes = []
+    for i, char in enumerate(text[:min(len(xs), len(ys))]):
+        x0, baseline = xs[i], ys[i]
+        if i + 1 < len(xs) and ys[i + 1] == baseline and xs[i + 1] > x0:
+            x1 = xs[i + 1]
+        else:
+            x1 = x0 + size * (1.0 if ord(char) > 0xff else 0.5)
+        boxes.append((char, [x0, baseline - size * ASCENT, x1, baseline + size * DESCENT]))
+    return boxes
@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 23:50
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 增值税电子发票字段快速抽取：自定义标引 / 附件优先，缺失字段按模板标签位置在文本中查找，不绘制、不 OCR
+import datetime
+import os
+import posixpath
+import re
+import time
+import traceback
+from decimal import Decimal, InvalidOperation
+
+from loguru import logger
+
+from fastofd.batch import iter_sources, run_pool
+from fastofd.extract.spatial import GridIndex, pos2bbox
+from fastofd.parser_ofd.attachment_parser import AttachmentParser
+from fastofd.parser_ofd.file_customtag_parser import CustomTagFileParser
+
+# 字段及类型：str 原样（去首尾空白）；code 去掉全部空白；date 转 datetime.date；decimal 去掉货币符号与千分位
+FIELDS = {
+    "invoice_type": "str",
+    "invoice_code": "code",
+    "invoice_no": "code",
+    "issue_date": "date",
+    "check_code": "code",
+    "machine_no": "code",
+    "buyer_name": "str",
+    "buyer_tax_id": "code",
+    "seller_name": "str",
+    "seller_tax_id": "code",
+    "amount": "decimal",
+    "tax": "decimal",
+    "total": "decimal",
+    "drawer": "str",
+    "note": "str",
+}
+# 缺少其中任一字段时才按版面查找
+CORE_FIELDS = ("invoice_no", "issue_date", "buyer_name", "seller_name", "seller_tax_id", "total")
+
+# 标引、附件 xml 的标签名（去掉命名空间前缀）及 OFD.xml CustomData 名称 -> 字段，同一字段先出现的优先
+TAG_FIELDS = {
+    # 税务局版式文件自定义标引 / 附件
+    "InvoiceCode": "invoice_code",
+    "InvoiceNo": "invoice_no",
+    "IssueDate": "issue_date",
+    "InvoiceCheckCode": "check_code",
+    "MachineNo": "machine_no",
+    "BuyerName": "buyer_name",
+    "BuyerTaxID": "buyer_tax_id",
+    "SellerName": "seller_name",
+    "SellerTaxID": "seller_tax_id",
+    "TaxExclusiveTotalAmount": "amount",
+    "TaxTotalAmount": "tax",
+    "TaxInclusiveTotalAmount": "total",
+    "InvoiceClerk": "drawer",
+    "Note": "note",
+    # 数电发票 original_invoice.xml
+    "LabelName": "invoice_type",
+    "InvoiceNumber": "invoice_no",
+    "EIid": "invoice_no",
+    "IssueTime": "issue_date",
+    "RequestTime": "issue_date",
+    "BuyerIdNum": "buyer_tax_id",
+    "SellerIdNum": "seller_tax_id",
+    "TotalAmWithoutTax": "amount",
+    "TotalTaxAm": "tax",
+    "TotalTax-includedAmount": "total",
+    "Drawer": "drawer",
+    "Remark": "note",
+    # OFD.xml CustomData
+    "发票代码": "invoice_code",
+    "发票号码": "invoice_no",
+    "开具日期": "issue_date",
+    "校验码": "check_code",
+    "合计金额": "amount",
+    "合计税额": "tax",
+    "购买方纳税人识别号": "buyer_tax_id",
+    "销售方纳税人识别号": "seller_tax_id",
+}
+
+# 字段值格式，用于从候选文本中截取
+AMOUNT = r"-?\d[\d,]*\.\d{2}"
+PATTERNS = {
+    "invoice_code": re.compile(r"\d{12}|\d{10}"),
+    "invoice_no": re.compile(r"\d{20}|\d{8}"),
+    "issue_date": re.compile(r"\d{4}\s*[年\-/.]\s*\d{1,2}\s*[月\-/.]\s*\d{1,2}(?:\s*日)?|\d{8}"),
+    "check_code": re.compile(r"\d{5}(?:\s*\d{5}){3}"),
+    "machine_no": re.compile(r"\d{12}"),
+    "buyer_tax_id": re.compile(r"[0-9A-Z]{15,20}"),
+    "seller_tax_id": re.compile(r"[0-9A-Z]{15,20}"),
+    "amount": re.compile(AMOUNT),
+    "tax": re.compile(AMOUNT),
+    "total": re.compile(AMOUNT),
+}
+ANY = re.compile(r"\S(?:.*\S)?")
+
+# 模板标签：(字段, 标签正则)，值在标签右侧同一行；标签按行首匹配，避免命中表头中的“项目名称”等
+LABELS = (
+    ("invoice_code", re.compile(r"^发票代码[:：]?")),
+    ("invoice_no", re.compile(r"^发票号码[:：]?")),
+    ("issue_date", re.compile(r"^开票日期[:：]?")),
+    ("check_code", re.compile(r"^校验码[:：]?")),
+    ("machine_no", re.compile(r"^机器编号[:：]?")),
+    ("drawer", re.compile(r"^开票人[:：]?")),
+)
+# 购买方、销售方成对出现的标签：按自上而下、自左而右，第一处为购买方，第二处为销售方
+PARTY_LABELS = (
+    (("buyer_name", "seller_name"), re.compile(r"^名称[:：]?")),
+    (("buyer_tax_id", "seller_tax_id"), re.compile(r"^(?:统一社会信用代码/)?纳税人识别号[:：]?")),
+)
+SUM_LABEL = re.compile(r"^合计")
+TOTAL_LABEL = re.compile(r"^价税合计")
+
+# 同一行判定：两段文本竖直中心之差不超过较小高度的该比例
+ROW_RATIO = 0.5
+# 相邻文本对象水平间距不超过高度的该比例时拼成一段（逐字排版的发票）
+JOIN_RATIO = 0.6
+# 没有任何模板标签时，表头字段按页面相对位置 [x0, y0, x1, y1]（占页宽 / 页高的比例）查找
+REGIONS = {
+    "invoice_code": (0.65, 0.0, 1.0, 0.25),
+    "invoice_no": (0.65, 0.0, 1.0, 0.25),
+    "issue_date": (0.65, 0.0, 1.0, 0.25),
+    "check_code": (0.55, 0.0, 1.0, 0.3),
+}
+
+
+def convert(field, value):
+    """字段值转为对应类型，无法转换返回 None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    kind = FIELDS[field]
+    if kind == "code":
+        return re.sub(r"\s+", "", value)
+    if kind == "decimal":
+        match = re.search(AMOUNT + r"|-?\d+", value.replace(" ", ""))
+        if not match:
+            return None
+        try:
+            return Decimal(match.group().replace(",", ""))
+        except InvalidOperation:
+            return None
+    if kind == "date":
+        match = re.search(r"(\d{4})\s*[年\-/.]?\s*(\d{1,2})\s*[月\-/.]?\s*(\d{1,2})", value)
+        if not match:
+            return None
+        try:
+            return datetime.date(*(int(v) for v in match.groups()))
+        except ValueError:
+            return None
+    return value
+
+
+def join_runs(objects) -> list:
+    """
+    页面文本对象拼成文本段 [{"text", "bbox": [x0, y0, x1, y1]}]
+    按竖直中心分行，同行内间距小的相邻对象拼接（兼容逐字排版），大间距处断开
+    """
+    boxes = []
+    for obj in objects:
+        if obj.get("text") and len(obj.get("boundary") or []) == 4:
+            boxes.append((pos2bbox(obj["boundary"]), obj["text"]))
+    boxes.sort(key=lambda item: ((item[0][1] + item[0][3]) / 2, item[0][0]))
+    rows, row = [], []
+    for bbox, text in boxes:
+        cy, h = (bbox[1] + bbox[3]) / 2, bbox[3] - bbox[1]
+        if row:
+            rb = row[0][0]
+            if abs(cy - (rb[1] + rb[3]) / 2) > ROW_RATIO * min(h, rb[3] - rb[1]):
+                rows.append(row)
+                row = []
+        row.append((bbox, text))
+    if row:
+        rows.append(row)
+    runs = []
+    for row in rows:
+        row.sort(key=lambda item: item[0][0])
+        current = None
+        for bbox, text in row:
+            h = bbox[3] - bbox[1]
+            if current and bbox[0] - current["bbox"][2] <= JOIN_RATIO * h:
+                b = current["bbox"]
+                current["bbox"] = [b[0], min(b[1], bbox[1]), max(b[2], bbox[2]), max(b[3], bbox[3])]
+                current["text"] += text
+            else:
+                current = {"text": text, "bbox": list(bbox)}
+                runs.append(current)
+    return runs
+
+
+def _match(field, text):
+    """
+    从 text 中截取 field 格式的值，用于没有标签的区域查找：
+    前后不能紧邻数字（避免从 12 位发票代码中截出 8 位号码），且须能转换为字段类型（避免把号码当作日期）
+    """
+    for match in PATTERNS.get(field, ANY).finditer(text):
+        start, end = match.span()
+        if text[start - 1:start].isdigit() or text[end:end + 1].isdigit():
+            continue
+        if convert(field, match.group()) is not None:
+            return match.group()
+    return None
+
+
+def _right_of(index, run, rest, field, page_width, skip=0):
+    """
+    标签右侧同一行的取值：标签段中标签之后的部分（rest）优先，其次向右逐段查找格式匹配的文本
+    skip: 跳过前几个匹配（合计行的金额、税额依次排列）
+    """
+    x0, y0, x1, y1 = run["bbox"]
+    cy, h = (y0 + y1) / 2, y1 - y0
+    candidates = [cell for cell in index.query([x1, cy - ROW_RATIO * h, page_width, cy + ROW_RATIO * h])
+                  if cell is not run and cell["bbox"][0] >= x0]
+    candidates.sort(key=lambda cell: cell["bbox"][0])
+    pattern = PATTERNS.get(field, ANY)
+    values = []
+    for text in [rest] + [cell["text"] for cell in candidates]:
+        values.extend(m.group() for m in pattern.finditer(text))
+        if len(values) > skip:
+            return values[skip]
+    return None
+
+
+def layout_fields(runs, page_size, want) -> dict:
+    """
+    按模板标签在文本段中查找字段
+    runs: join_runs 结果；page_size: [宽, 高]（mm）；want: 需要查找的字段
+    """
+    page_width, page_height = page_size
+    index = GridIndex(cell=20.0)
+    for run in runs:
+        index.insert(run["bbox"], run)
+    found = {}
+    labelled = set()
+    for run in runs:
+        compact = re.sub(r"\s+", "", run["text"])
+        for field, label in LABELS:
+            match = label.match(compact)
+            if match:
+                labelled.add(field)
+                if field in want and field not in found:
+                    value = _right_of(index, run, compact[match.end():], field, page_width)
+                    if value:
+                        found[field] = value
+    # 购买方 / 销售方
+    for fields, label in PARTY_LABELS:
+        hits = []
+        for run in runs:
+            compact = re.sub(r"\s+", "", run["text"])
+            match = label.match(compact)
+            if match:
+                hits.append((run, compact[match.end():]))
+        hits.sort(key=lambda hit: (round(hit[0]["bbox"][1]), hit[0]["bbox"][0]))
+        for field, (run, rest) in zip(fields, hits):
+            if field in want and field not in found:
+                value = _right_of(index, run, rest, field, page_width)
+                if value:
+                    found[field] = value
+    # 合计行：金额、税额；价税合计：小写金额
+    for run in runs:
+        compact = re.sub(r"\s+", "", run["text"])
+        if TOTAL_LABEL.match(compact):
+            if "total" in want and "total" not in found:
+                value = _right_of(index, run, compact[4:], "total", page_width)
+                if value:
+                    found["total"] = value
+        elif SUM_LABEL.match(compact):
+            for skip, field in enumerate(("amount", "tax")):
+                if field in want and field not in found:
+                    value = _right_of(index, run, compact[2:], field, page_width, skip=skip)
+                    if value:
+                        found[field] = value
+    # 没有标签的表头字段按页面相对位置查找
+    for field, (fx0, fy0, fx1, fy1) in REGIONS.items():
+        if field not in want or field in found or field in labelled:
+            continue
+        rect = [fx0 * page_width, fy0 * page_height, fx1 * page_width, fy1 * page_height]
+        for run in sorted(index.query(rect), key=lambda run: (run["bbox"][1], run["bbox"][0])):
+            value = _match(field, run["text"])
+            if value and value not in found.values():
+                found[field] = value
+                break
+    return found
+
+
+class InvoiceParser(AttachmentParser):
+    """
+    增值税电子发票字段抽取，依次：
+    1. 自定义标引（标引引用的页面对象文本）；2. xml 附件（如 original_invoice.xml）；3. OFD.xml CustomData；
+    4. 仍缺少 CORE_FIELDS 时，读取首页及其模板的文本对象，按模板标签相对位置查找
+    每一步只补充前面缺失的字段；只读取用到的 zip 成员，不解析字体、图片，不绘制
+    """
+
+    def _from_items(self, items, fields, source, sources):
+        for item in items:
+            field = TAG_FIELDS.get(item["name"])
+            if not field or field in fields:
+                continue
+            texts = [ref.get("text") for ref in item.get("refs") or [] if ref.get("text")]
+            value = convert(field, "".join(texts) if texts else item.get("value"))
+            if value is not None:
+                fields[field] = value
+                sources[field] = source
+
+    def _first_page(self):
+        """首页文本对象（含模板）与页面尺寸"""
+        if not self.documents():
+            return [], None
+        doc_no, doc_name, doc_xml_obj = self.documents()[0]
+        doc_base = posixpath.dirname(doc_name)
+        doc_info = self.document_info(doc_no)
+        page_locs = list(self.page_locs(doc_xml_obj).values())
+        if not page_locs:
+            return [], None
+        content_name = self._resolve(page_locs[0][1], doc_base)
+        if not content_name:
+            return [], None
+        content = self.page_content(content_name)
+        tpl_id_map = doc_info.get("tpl_id_map") or {}
+        tpl_locs = [tpl_id_map[i] for i in content["templates"] if i in tpl_id_map]
+        if not content["templates"] and doc_info.get("tpls"):
+            tpl_locs = doc_info["tpls"]
+        objects = list(content["objects"].values())
+        for tpl_loc in tpl_locs:
+            tpl_name = self._resolve(tpl_loc, doc_base)
+            if tpl_name:
+                objects.extend(self.page_content(tpl_name)["objects"].values())
+        size = doc_info.get("size")
+        size = [float(v) for v in size.split()] if isinstance(size, str) and size.strip() else [0, 0, 210, 140]
+        return objects, size[2:4]
+
+    def __call__(self, fields=None, fallback=True):
+        """
+        {"fields": {字段: 值}, "source": {字段: custom_tag / attachment / custom_data / layout}, "missing": [字段]}
+        值类型见 FIELDS：金额为 Decimal，日期为 datetime.date，其余为 str
+        fields: 需要的字段，默认 FIELDS 全部；所需字段齐全后不再读取后续来源
+        fallback: 仍缺少所需字段中的 CORE_FIELDS 时是否按版面查找
+        """
+        want = list(fields or FIELDS)
+        for field in want:
+            assert field in FIELDS, f"field Error: {field}"
+        found, sources = {}, {}
+
+        def missing(names=want):
+            return [field for field in names if field in want and field not in found]
+
+        for tag in self.custom_tags():
+            self._from_items(tag["items"], found, "custom_tag", sources)
+        if missing():
+            for attachment in self.attachments():
+                if (attachment.get("Format") or "").lower() != "xml" and \
+                        not (attachment.get("loc") or "").lower().endswith(".xml"):
+                    continue
+                xml_obj = self.read_xml(attachment)
+                if xml_obj:
+                    self._from_items(CustomTagFileParser(xml_obj)(), found, "attachment", sources)
+        if missing():
+            custom_datas = self.ofd_info().get("custom_datas") or {}
+            items = [{"name": name, "value": value} for name, value in custom_datas.items()]
+            self._from_items(items, found, "custom_data", sources)
+        if fallback and missing(CORE_FIELDS):
+            objects, page_size = self._first_page()
+            if objects:
+                for field, value in layout_fields(join_runs(objects), page_size, missing()).items():
+                    value = convert(field, value)
+                    if value is not None:
+                        found[field] = value
+                        sources[field] = "layout"
+        return {
+            "fields": {field: found.get(field) for field in want},
+            "source": {field: sources[field] for field in want if field in sources},
+            "missing": missing(),
+        }
+
+
+def extract_invoice(ofd_bytes: bytes, fields=None, fallback=True) -> dict:
+    """单张发票字段，结构见 InvoiceParser.__call__"""
+    with InvoiceParser(ofd_bytes) as parser:
+        return parser(fields=fields, fallback=fallback)
+
+
+def invoice_files(srcs, fields=None, fallback=True) -> list:
+    """
+    子进程任务：一批文件逐个抽取，异常不外抛
+    返回 [{"src", "status", "fields", "source", "missing", "seconds", "error"}]
+    """
+    results = []
+    for src in srcs:
+        start = time.time()
+        result = {"src": src, "status": "ok", "fields": {}, "source": {}, "missing": list(fields or FIELDS),
+                  "seconds": 0, "error": None}
+        try:
+            with open(src, "rb") as f:
+                result.update(extract_invoice(f.read(), fields=fields, fallback=fallback))
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+            result["traceback"] = traceback.format_exc(limit=5)
+        result["seconds"] = round(time.time() - start, 4)
+        results.append(result)
+    return results
+
+
+def _crash_results(job):
+    return [{"src": src, "status": "error", "fields": {}, "source": {}, "missing": list(job[1] or FIELDS),
+             "seconds": 0, "error": "worker process crashed"} for src in job[0]]
+
+
+def _chunks(inputs, recursive, chunk_size):
+    chunk = []
+    for src, _ in iter_sources(inputs, recursive=recursive):
+        chunk.append(src)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def extract_invoices(inputs, record, fields=None, workers=1, recursive=True, chunk_size=64, fallback=True,
+                     max_pending=None):
+    """
+    批量抽取发票字段，每个文件的结果交给 record(result)，结构见 invoice_files
+    workers: 1 在当前进程内执行（单张发票只需毫秒级，进程间传递的开销不划算）；0/None 表示 CPU 核数
+    chunk_size: 多进程时每个任务包含的文件数，摊薄调度开销
+    返回 {"total", "ok", "failed", "seconds"}
+    """
+    start = time.time()
+    summary = {"total": 0, "ok": 0, "failed": 0, "seconds": 0}
+
+    def _record(results):
+        for result in results:
+            summary["total"] += 1
+            summary["ok" if result["status"] == "ok" else "failed"] += 1
+            record(result)
+
+    workers = workers or os.cpu_count() or 1
+    jobs = ((chunk, fields, fallback) for chunk in _chunks(inputs, recursive, chunk_size))
+    if workers == 1:
+        for job in jobs:
+            _record(invoice_files(*job))
+    else:
+        run_pool(invoice_files, jobs, _record, _crash_results, workers, max_pending or workers * 2)
+    summary["seconds"] = round(time.time() - start, 3)
+    logger.info(f"发票抽取完成 {summary}")
+    return summary
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 21:40
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 版面分析：文本行切分为行片段、聚合为块、递归 XY-cut 分栏并给出稳定的阅读顺序
+from fastofd.extract.text import group_lines, line_dict, page_glyphs
+
+# 同一基线上相邻字间距超过该值（按字号）时拆成两个行片段（分栏、表格不同列）
+FRAGMENT_GAP = 2.0
+# 上下相邻行片段的垂直间距不超过该值（按字号）时归入同一块
+BLOCK_GAP = 1.0
+# 同一块内字号允许的相对差异
+SIZE_RATIO = 0.2
+
+
+def split_fragments(line) -> list:
+    """按 x 排好序的一行字形，在大间距处拆成行片段"""
+    fragments, fragment, last_x1 = [], [], None
+    for glyph in line:
+        box, size = glyph[3], glyph[4]
+        if fragment and box[0] - last_x1 > FRAGMENT_GAP * size:
+            fragments.append(fragment)
+            fragment = []
+        last_x1 = max(last_x1, box[2]) if fragment else box[2]
+        fragment.append(glyph)
+    if fragment:
+        fragments.append(fragment)
+    return fragments
+
+
+def _fragment_size(fragment):
+    return max(g[4] for g in fragment)
+
+
+def group_blocks(lines) -> list:
+    """
+    行片段聚合为块：按上边排序后单次扫描，只与仍可能接续的活动块比较
+    lines: [(行 dict, 字号)]；返回 [{"bbox", "size", "lines"}]
+    """
+    blocks, active = [], []
+    for line_d, size in sorted(lines, key=lambda item: (item[0]["bbox"][1], item[0]["bbox"][0])):
+        x0, y0, x1, y1 = line_d["bbox"]
+        best, best_overlap = None, 0.0
+        still_active = []
+        for block in active:
+            gap = y0 - block["last_bottom"]
+            if gap > BLOCK_GAP * block["size"]:
+                continue  # 之后的行片段上边只会更靠下，该块不会再接续
+            still_active.append(block)
+            if gap < -0.5 * block["size"]:
+                continue  # 与块末行同一行，属于并排的另一列
+            if abs(size - block["size"]) > SIZE_RATIO * max(size, block["size"]):
+                continue
+            overlap = min(x1, block["bbox"][2]) - max(x0, block["bbox"][0])
+            if overlap > best_overlap:
+                best, best_overlap = block, overlap
+        active = still_active
+        if best is None:
+            best = {"bbox": [x0, y0, x1, y1], "size": size, "last_bottom": y1, "lines": []}
+            blocks.append(best)
+            active.append(best)
+        else:
+            bbox = best["bbox"]
+            best["bbox"] = [min(bbox[0], x0), min(bbox[1], y0), max(bbox[2], x1), max(bbox[3], y1)]
+            best["last_bottom"] = y1
+        best["lines"].append(line_d)
+    return blocks
+
+
+def _cuts(blocks, axis):
+    """
+    沿 axis（0: x 方向投影，1: y 方向投影）寻找空白间隔，返回 (分组列表, 最大间隔)
+    排序后扫描区间并集，O(n log n)
+    """
+    lo, hi = axis, axis + 2
+    ordered = sorted(blocks, key=lambda b: b["bbox"][lo])
+    groups, group = [], [ordered[0]]
+    reach, widest = ordered[0]["bbox"][hi], 0.0
+    for block in ordered[1:]:
+        gap = block["bbox"][lo] - reach
+        if gap > 0:
+            groups.append(group)
+            group = []
+            widest = max(widest, gap)
+        group.append(block)
+        reach = max(reach, block["bbox"][hi])
+    groups.append(group)
+    return groups, widest
+
+
+def xy_cut(blocks, columns, column=None) -> list:
+    """
+    递归 XY-cut：每层在横向、纵向空白中选更宽的一侧切分，横切自上而下，纵切自左而右
+    纵切得到的分组记为栏，块的 column 为所在最内层栏的序号，通栏块为 None
+    """
+    if len(blocks) <= 1:
+        for block in blocks:
+            block["column"] = column
+        return list(blocks)
+    rows, row_gap = _cuts(blocks, 1)
+    cols, col_gap = _cuts(blocks, 0)
+    if len(rows) == 1 and len(cols) == 1:
+        ordered = sorted(blocks, key=lambda b: (b["bbox"][1], b["bbox"][0]))
+        for block in ordered:
+            block["column"] = column
+        return ordered
+    out = []
+    if len(cols) > 1 and col_gap >= row_gap:
+        for group in cols:
+            columns.append(_group_bbox(group))
+            out.extend(xy_cut(group, columns, len(columns) - 1))
+    else:
+        for group in rows:
+            out.extend(xy_cut(group, columns, column))
+    return out
+
+
+def _group_bbox(blocks):
+    return [min(b["bbox"][0] for b in blocks), min(b["bbox"][1] for b in blocks),
+            max(b["bbox"][2] for b in blocks), max(b["bbox"][3] for b in blocks)]
+
+
+def page_layout(text_list, glyphs=False) -> dict:
+    """
+    单页版面
+    {"lines": [行，按阅读顺序], "blocks": [{"bbox", "column", "lines"}], "columns": [栏 bbox]}
+    行、词结构同 extract.text.page_text；单位 mm，原点左上
+    """
+    lines = []
+    for line in group_lines(page_glyphs(text_list)):
+        for fragment in split_fragments(line):
+            line_d = line_dict(fragment, glyphs=glyphs)
+            if line_d:
+                lines.append((line_d, _fragment_size(fragment)))
+    columns = []
+    blocks = xy_cut(group_blocks(lines), columns) if lines else []
+    blocks = [{"bbox": [round(v, 3) for v in b["bbox"]], "column": b["column"], "lines": b["lines"]}
+              for b in blocks]
+    return {
+        "lines": [line_d for block in blocks for line_d in block["lines"]],
+        "blocks": blocks,
+        "columns": [[round(v, 3) for v in bbox] for bbox in columns],
+    }
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 22:10
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 页面空间索引：均匀网格，支持矩形、点、最近邻查询
+import math
+
+
+def pos2bbox(pos) -> list:
+    """OFD Boundary [x, y, w, h]（列表或空格分隔字符串）转 [x0, y0, x1, y1]"""
+    if isinstance(pos, str):
+        pos = pos.split(" ")
+    x, y, w, h = [float(v) for v in pos[:4]]
+    return [x, y, x + w, y + h]
+
+
+def box_distance(bbox, x, y) -> float:
+    """点到矩形的距离，点在矩形内为 0"""
+    dx = max(bbox[0] - x, 0.0, x - bbox[2])
+    dy = max(bbox[1] - y, 0.0, y - bbox[3])
+    return math.hypot(dx, dy)
+
+
+class GridIndex(object):
+    """
+    均匀网格索引，单位 mm
+    每个对象登记到其 bbox 覆盖的所有格子，查询只访问与查询范围相交（并截断到已占用范围）的格子
+    覆盖格子数超过 LARGE_CELLS 的对象（整页背景、坐标异常的对象）不登记到格子，放入 large 列表，每次查询逐个检查
+    cell: 格子边长，取常见对象尺寸的数倍为宜；页面级文本取 10mm 左右
+    """
+    LARGE_CELLS = 256
+
+    def __init__(self, cell=10.0):
+        assert cell > 0, f"cell Error: {cell}"
+        self.cell = float(cell)
+        self.boxes = []
+        self.items = []
+        self._cells = {}
+        self._large = []  # 不登记到格子的大对象序号
+        self._bounds = None  # (i0, j0, i1, j1) 已占用格子的范围
+
+    def __len__(self):
+        return len(self.items)
+
+    def _cell_range(self, bbox):
+        cell = self.cell
+        return (math.floor(bbox[0] / cell), math.floor(bbox[1] / cell),
+                math.floor(bbox[2] / cell), math.floor(bbox[3] / cell))
+
+    def _clamped_range(self, bbox):
+        """查询范围对应的格子范围，截断到已占用范围；没有已登记的格子或不相交时返回 None"""
+        b = self._bounds
+        if b is None:
+            return None
+        cell = self.cell
+        # 先在坐标上截断，无穷大 / nan 坐标不参与 floor
+        lo_x, hi_x = b[0] * cell, (b[2] + 1) * cell
+        lo_y, hi_y = b[1] * cell, (b[3] + 1) * cell
+        i0, j0, i1, j1 = self._cell_range([max(lo_x, min(hi_x, bbox[0])), max(lo_y, min(hi_y, bbox[1])),
+                                          max(lo_x, min(hi_x, bbox[2])), max(lo_y, min(hi_y, bbox[3]))])
+        i0, j0, i1, j1 = max(i0, b[0]), max(j0, b[1]), min(i1, b[2]), min(j1, b[3])
+        if i0 > i1 or j0 > j1:
+            return None
+        return i0, j0, i1, j1
+
+    def _is_large(self, bbox):
+        if not all(math.isfinite(v) for v in bbox):
+            return True
+        i0, j0, i1, j1 = self._cell_range(bbox)
+        return (i1 - i0 + 1) * (j1 - j0 + 1) > self.LARGE_CELLS
+
+    def insert(self, bbox, item=None) -> int:
+        """登记对象，返回序号；item 为 None 时查询结果返回序号本身"""
+        bbox = [float(v) for v in bbox]
+        idx = len(self.items)
+        self.boxes.append(bbox)
+        self.items.append(idx if item is None else item)
+        if self._is_large(bbox):
+            self._large.append(idx)
+            return idx
+        i0, j0, i1, j1 = self._cell_range(bbox)
+        cells = self._cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                cells.setdefault((i, j), []).append(idx)
+        if self._bounds is None:
+            self._bounds = (i0, j0, i1, j1)
+        else:
+            b = self._bounds
+            self._bounds = (min(b[0], i0), min(b[1], j0), max(b[2], i1), max(b[3], j1))
+        return idx
+
+    def _candidates(self, bbox):
+        seen = set(self._large)
+        cell_range = self._clamped_range(bbox)
+        if cell_range is None:
+            return seen
+        i0, j0, i1, j1 = cell_range
+        cells = self._cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                seen.update(cells.get((i, j), ()))
+        return seen
+
+    def query_ids(self, rect, contain=False) -> list:
+        """与 rect 相交（contain=True 时完全落在 rect 内）的对象序号，按登记顺序"""
+        x0, y0, x1, y1 = rect
+        boxes = self.boxes
+        out = []
+        for idx in sorted(self._candidates(rect)):
+            b = boxes[idx]
+            if contain:
+                if b[0] >= x0 and b[1] >= y0 and b[2] <= x1 and b[3] <= y1:
+                    out.append(idx)
+            elif b[0] <= x1 and b[2] >= x0 and b[1] <= y1 and b[3] >= y0:
+                out.append(idx)
+        return out
+
+    def query(self, rect, contain=False) -> list:
+        """与 rect [x0, y0, x1, y1] 相交的对象；contain=True 时只返回完全落在 rect 内的"""
+        return [self.items[idx] for idx in self.query_ids(rect, contain=contain)]
+
+    def at(self, x, y) -> list:
+        """包含点 (x, y) 的对象"""
+        return self.query([x, y, x, y])
+
+    def nearest(self, x, y, k=1, max_dist=None) -> list:
+        """
+        距点 (x, y) 最近的 k 个对象 [(距离, 对象)]，由近到远
+        从点所在格子起逐圈向外扩展，第 r 圈之外的对象距离不小于 r * cell，够 k 个且不可能更近时停止
+        每圈只访问落在已占用范围内的格子，大对象直接计算距离
+        """
+        if not self.items or not (math.isfinite(x) and math.isfinite(y)):
+            return []
+        seen = set(self._large)
+        found = sorted((box_distance(self.boxes[idx], x, y), idx) for idx in self._large)
+        b = self._bounds
+        if b is not None:
+            ci, cj = math.floor(x / self.cell), math.floor(y / self.cell)
+            # 点在已占用范围之外时，前面几圈必然为空，从与范围相交的第一圈开始
+            min_ring = max(b[0] - ci, ci - b[2], b[1] - cj, cj - b[3], 0)
+            max_ring = max(abs(ci - b[0]), abs(ci - b[2]), abs(cj - b[1]), abs(cj - b[3]))
+            cells = self._cells
+            for ring in range(min_ring, max_ring + 1):
+                for i in range(max(ci - ring, b[0]), min(ci + ring, b[2]) + 1):
+                    if i in (ci - ring, ci + ring):
+                        js = range(max(cj - ring, b[1]), min(cj + ring, b[3]) + 1)
+                    else:
+                        js = [j for j in {cj - ring, cj + ring} if b[1] <= j <= b[3]]  # 只访问第 ring 圈
+                    for j in js:
+                        for idx in cells.get((i, j), ()):
+                            if idx not in seen:
+                                seen.add(idx)
+                                found.append((box_distance(self.boxes[idx], x, y), idx))
+                found.sort()
+                reach = ring * self.cell
+                if len(found) >= k and found[k - 1][0] <= reach:
+                    break
+                if max_dist is not None and reach > max_dist:
+                    break
+        if max_dist is not None:
+            found = [f for f in found if f[0] <= max_dist]
+        return [(dist, self.items[idx]) for dist, idx in found[:k]]
+
+
+class PageIndex(object):
+    """
+    单页空间索引，对解析结果建一次、多次查询
+    page: OFDParser 结果 page_info[页码]，含 text_list / img_list / line_list
+    signatures: signatures_page_id[页码]（签章位置）；annotations: annotation_info[页码]
+    各类对象分别建网格：text / image / path / seal / annotation，查询时按 kind 选择
+    """
+    KINDS = ("text", "image", "path", "seal", "annotation")
+
+    def __init__(self, page: dict, signatures=None, annotations=None, cell=10.0):
+        self.cell = cell
+        self.grids = {kind: GridIndex(cell) for kind in self.KINDS}
+        for kind, key in (("text", "text_list"), ("image", "img_list"), ("path", "line_list")):
+            grid = self.grids[kind]
+            for item in page.get(key) or []:
+                if item.get("pos"):
+                    grid.insert(pos2bbox(item["pos"]), item)
+        for item in signatures or []:
+            if item.get("Boundary"):
+                self.grids["seal"].insert(pos2bbox(item["Boundary"]), item)
+        for item in (annotations or {}).values():
+            boundary = (item.get("Appearance") or {}).get("Boundary") if isinstance(item, dict) else None
+            if boundary:
+                self.grids["annotation"].insert(pos2bbox(boundary), item)
+
+    def __getattr__(self, kind):
+        # index.text / index.image ... 直接取对应网格
+        grids = self.__dict__.get("grids") or {}
+        if kind in grids:
+            return grids[kind]
+        raise AttributeError(kind)
+
+    def query(self, rect, kind="text", contain=False) -> list:
+        """与矩形 [x0, y0, x1, y1]（mm）相交的对象"""
+        return self.grids[kind].query(rect, contain=contain)
+
+    def at(self, x, y, kind="text") -> list:
+        return self.grids[kind].at(x, y)
+
+    def nearest(self, x, y, kind="text", k=1, max_dist=None) -> list:
+        return self.grids[kind].nearest(x, y, k=k, max_dist=max_dist)
+
+    def overlapping(self, boundary, kind="image") -> list:
+        """与 OFD Boundary（如签章位置 "x y w h"）重叠的对象"""
+        return self.grids[kind].query(pos2bbox(boundary))
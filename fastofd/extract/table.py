@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 22:40
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 基于 PathObject 线段与文本位置的表格识别，不经 pdf
+import bisect
+
+from fastofd.extract.spatial import GridIndex, PageIndex, pos2bbox
+from fastofd.extract.text import group_lines, line_dict, page_glyphs
+
+# 坐标吸附容差（mm）：相距不超过该值的平行线视为同一条，线段端点距离不超过该值视为相交
+SNAP = 1.0
+# 少于该长度（mm）的线段不参与表格识别（下划线、字符内笔画等）
+MIN_LENGTH = 2.0
+# 行线与列线交点中实际相交的最低比例，低于该值的线段组（零散装饰线、图形）不视为表格
+MIN_INTERSECTIONS = 0.5
+
+
+def path_segments(line_list):
+    """
+    PathObject 拆成水平、竖直线段（页面绝对坐标，mm）
+    返回 (水平 [(y, x0, x1)], 竖直 [(x, y0, y1)])；曲线只移动当前点，斜线忽略
+    """
+    horizontal, vertical = [], []
+
+    def add(p0, p1):
+        (x0, y0), (x1, y1) = p0, p1
+        if abs(y0 - y1) <= SNAP / 2 and abs(x1 - x0) >= MIN_LENGTH:
+            horizontal.append(((y0 + y1) / 2, min(x0, x1), max(x0, x1)))
+        elif abs(x0 - x1) <= SNAP / 2 and abs(y1 - y0) >= MIN_LENGTH:
+            vertical.append(((x0 + x1) / 2, min(y0, y1), max(y0, y1)))
+
+    for line in line_list:
+        pos = line.get("pos") or [0, 0, 0, 0]
+        abbr = line.get("AbbreviatedData")
+        if not isinstance(abbr, str) or not abbr.strip():
+            # 没有路径指令时按外框判断细长的横线 / 竖线
+            x0, y0, x1, y1 = pos2bbox(pos)
+            if y1 - y0 <= SNAP:
+                add((x0, (y0 + y1) / 2), (x1, (y0 + y1) / 2))
+            elif x1 - x0 <= SNAP:
+                add(((x0 + x1) / 2, y0), ((x0 + x1) / 2, y1))
+            continue
+        ox, oy = float(pos[0]), float(pos[1])
+        tokens = abbr.split()
+        current = start = None
+        i = 0
+        while i < len(tokens):
+            op = tokens[i]
+            try:
+                if op in ("S", "M"):
+                    current = start = (ox + float(tokens[i + 1]), oy + float(tokens[i + 2]))
+                    i += 3
+                elif op == "L":
+                    point = (ox + float(tokens[i + 1]), oy + float(tokens[i + 2]))
+                    if current is not None:
+                        add(current, point)
+                    current = point
+                    i += 3
+                elif op == "Q":
+                    current = (ox + float(tokens[i + 3]), oy + float(tokens[i + 4]))
+                    i += 5
+                elif op == "B":
+                    current = (ox + float(tokens[i + 5]), oy + float(tokens[i + 6]))
+                    i += 7
+                elif op == "A":
+                    current = (ox + float(tokens[i + 6]), oy + float(tokens[i + 7]))
+                    i += 8
+                elif op == "C":
+                    if current is not None and start is not None:
+                        add(current, start)
+                    current = start
+                    i += 1
+                else:
+                    i += 1
+            except (IndexError, ValueError):
+                break
+    return horizontal, vertical
+
+
+def merge_segments(segments):
+    """
+    同一坐标（容差 SNAP 内）上的线段合并：按坐标排序扫描聚类，再合并重叠 / 相接的区间
+    segments: [(坐标, 起点, 终点)]；返回 [(坐标, [[起点, 终点], ...])]，按坐标升序，坐标取聚类均值
+    """
+    out = []
+    cluster = []
+    for seg in sorted(segments):
+        if cluster and seg[0] - cluster[-1][0] > SNAP:
+            out.append(_merge_cluster(cluster))
+            cluster = []
+        cluster.append(seg)
+    if cluster:
+        out.append(_merge_cluster(cluster))
+    return out
+
+
+def _merge_cluster(cluster):
+    coord = sum(seg[0] for seg in cluster) / len(cluster)
+    spans = []
+    for _, lo, hi in sorted(cluster, key=lambda seg: seg[1]):
+        if spans and lo <= spans[-1][1] + SNAP:
+            spans[-1][1] = max(spans[-1][1], hi)
+        else:
+            spans.append([lo, hi])
+    return coord, spans
+
+
+def _covers(spans, value):
+    """spans 中是否有区间包含 value"""
+    for lo, hi in spans:
+        if lo - SNAP <= value <= hi + SNAP:
+            return True
+    return False
+
+
+class _UnionFind(object):
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+def grid_components(h_lines, v_lines):
+    """
+    水平、竖直线段按相交关系分组，每组是一张候选表格
+    h_lines / v_lines: [(坐标, 起点, 终点)]，已按 merge_segments 合并
+    竖线登记到网格索引，每条横线只查询与自身外框相交的竖线
+    返回 [(横线列表, 竖线列表)]
+    """
+    uf = _UnionFind(len(h_lines) + len(v_lines))
+    v_index = GridIndex(cell=20.0)
+    for v_idx, (x, lo, hi) in enumerate(v_lines):
+        v_index.insert([x - SNAP, lo - SNAP, x + SNAP, hi + SNAP], v_idx)
+    for h_idx, (y, lo, hi) in enumerate(h_lines):
+        for v_idx in v_index.query([lo - SNAP, y, hi + SNAP, y]):
+            uf.union(h_idx, len(h_lines) + v_idx)
+    groups = {}
+    for h_idx, line in enumerate(h_lines):
+        groups.setdefault(uf.find(h_idx), ([], []))[0].append(line)
+    for v_idx, line in enumerate(v_lines):
+        root = uf.find(len(h_lines) + v_idx)
+        if root in groups:
+            groups[root][1].append(line)
+    return [g for g in groups.values() if len(g[0]) >= 2 and len(g[1]) >= 2]
+
+
+def _overhang(spans, value, outward):
+    """spans 中包含 value 的区间是否越过 value 向 outward（-1 向小、1 向大）方向延伸"""
+    for lo, hi in spans:
+        if lo - SNAP <= value <= hi + SNAP:
+            return lo < value - SNAP if outward < 0 else hi > value + SNAP
+    return False
+
+
+def grid_regularity(rows, cols) -> float:
+    """
+    rows / cols 围成的网格中实际相交的交点比例（十字、T 形、L 形都算）
+    外框四角须闭合且为 L 形或 T 形，否则返回 0：随机线段偶然相交时角上是十字，或者根本不闭合
+    """
+    def crossed(row, col):
+        return _covers(row[1], col[0]) and _covers(col[1], row[0])
+
+    for r, c in ((0, 0), (0, -1), (-1, 0), (-1, -1)):
+        row, col = rows[r], cols[c]
+        if not crossed(row, col):
+            return 0.0
+        if _overhang(row[1], col[0], 1 if c else -1) and _overhang(col[1], row[0], 1 if r else -1):
+            return 0.0
+    hits = sum(1 for row in rows for col in cols if crossed(row, col))
+    return hits / (len(rows) * len(cols))
+
+
+def build_cells(rows, cols):
+    """
+    rows: [(y, spans)] 自上而下；cols: [(x, spans)] 自左而右
+    在行列线围成的网格上合并缺少分隔线的相邻格子，得到带 rowspan / colspan 的单元格
+    """
+    ys = [y for y, _ in rows]
+    xs = [x for x, _ in cols]
+    n_rows, n_cols = len(ys) - 1, len(xs) - 1
+    owner = [[None] * n_cols for _ in range(n_rows)]
+    cells = []
+    for r in range(n_rows):
+        for c in range(n_cols):
+            if owner[r][c] is not None:
+                continue
+            mid_y = (ys[r] + ys[r + 1]) / 2
+            colspan = 1
+            while c + colspan < n_cols and owner[r][c + colspan] is None \
+                    and not _covers(cols[c + colspan][1], mid_y):
+                colspan += 1
+            rowspan = 1
+            while r + rowspan < n_rows and all(
+                    owner[r + rowspan][cc] is None
+                    and not _covers(rows[r + rowspan][1], (xs[cc] + xs[cc + 1]) / 2)
+                    for cc in range(c, c + colspan)):
+                rowspan += 1
+            cell_idx = len(cells)
+            for rr in range(r, r + rowspan):
+                for cc in range(c, c + colspan):
+                    owner[rr][cc] = cell_idx
+            cells.append({
+                "row": r, "col": c, "rowspan": rowspan, "colspan": colspan,
+                "bbox": [round(xs[c], 3), round(ys[r], 3), round(xs[c + colspan], 3), round(ys[r + rowspan], 3)],
+                "text": "",
+            })
+    return cells, owner
+
+
+def page_tables(page: dict, index: PageIndex = None) -> list:
+    """
+    单页表格
+    [{"bbox", "rows", "cols", "cells": [{"row", "col", "rowspan", "colspan", "bbox", "text"}], "data": 行列文本}]
+    data 中被合并的格子为 None；单位 mm，原点左上
+    外框不闭合、交点比例低于 MIN_INTERSECTIONS、或没有任何格子有文本的线段组（装饰线框、空白网格）不返回
+    index: 页面空间索引，用于只取表格范围内的文本，不传时临时建立
+    """
+    horizontal, vertical = path_segments(page.get("line_list") or [])
+    h_lines = [(coord, lo, hi) for coord, spans in merge_segments(horizontal) for lo, hi in spans]
+    v_lines = [(coord, lo, hi) for coord, spans in merge_segments(vertical) for lo, hi in spans]
+    if not h_lines or not v_lines:
+        return []
+    if index is None:
+        index = PageIndex(page)
+    tables = []
+    for h_group, v_group in grid_components(h_lines, v_lines):
+        # 同一组内同一坐标的线段（被合并单元格打断的分隔线）再合并成一条行线 / 列线
+        rows = merge_segments(h_group)
+        cols = merge_segments(v_group)
+        if len(rows) < 2 or len(cols) < 2 or grid_regularity(rows, cols) < MIN_INTERSECTIONS:
+            continue
+        cells, owner = build_cells(rows, cols)
+        if len(cells) < 2:
+            continue
+        ys = [y for y, _ in rows]
+        xs = [x for x, _ in cols]
+        bbox = [xs[0], ys[0], xs[-1], ys[-1]]
+        # 表格范围内的文本按字形中心落入的格子分配
+        cell_glyphs = [[] for _ in cells]
+        for glyph in page_glyphs(index.query(bbox, kind="text")):
+            box = glyph[3]
+            cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+            c = bisect.bisect_right(xs, cx) - 1
+            r = bisect.bisect_right(ys, cy) - 1
+            if 0 <= r < len(owner) and 0 <= c < len(owner[0]):
+                cell_glyphs[owner[r][c]].append(glyph)
+        for cell, glyphs in zip(cells, cell_glyphs):
+            if glyphs:
+                texts = [line_dict(line) for line in group_lines(glyphs)]
+                cell["text"] = "\n".join(t["text"] for t in texts if t)
+        if not any(cell["text"] for cell in cells):
+            continue
+        data = [[None] * (len(xs) - 1) for _ in range(len(ys) - 1)]
+        for cell in cells:
+            data[cell["row"]][cell["col"]] = cell["text"]
+        tables.append({
+            "bbox": [round(v, 3) for v in bbox],
+            "rows": len(ys) - 1,
+            "cols": len(xs) - 1,
+            "cells": cells,
+            "data": data,
+        })
+    tables.sort(key=lambda t: (t["bbox"][1], t["bbox"][0]))
+    return tables
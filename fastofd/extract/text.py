@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 21:10
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 不经绘制直接从解析结果抽取带坐标的文本：字 / 词 / 行 三级，输出纯文本、json、hOCR
+import html
+import json
+
+from fastofd.extract.glyphs import ASCENT, DESCENT, glyph_boxes
+
+# 同一行的基线容差（按字号）
+LINE_TOLERANCE = 0.5
+# 同一行内相邻字间距超过该值（按字号）视为分词
+WORD_GAP = 0.6
+
+
+def _round_box(box, ndigits=3):
+    return [round(v, ndigits) for v in box]
+
+
+def _union(boxes):
+    return [min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes)]
+
+
+def page_glyphs(text_list) -> list:
+    """页面全部字形 [(基线, x0, 字符, [x0, y0, x1, y1], 字号)]，单位 mm"""
+    out = []
+    for text_d in text_list:
+        for char, box in glyph_boxes(text_d):
+            size = (box[3] - box[1]) / (ASCENT + DESCENT)
+            out.append((box[3] - size * DESCENT, box[0], char, box, size))
+    return out
+
+
+def group_lines(glyphs) -> list:
+    """按基线排序后单次扫描分行，行内按 x 排序"""
+    lines = []
+    line, line_base, line_size = [], None, 0.0
+    for glyph in sorted(glyphs, key=lambda g: (g[0], g[1])):
+        base, size = glyph[0], glyph[4]
+        if line and abs(base - line_base) <= LINE_TOLERANCE * max(size, line_size):
+            line.append(glyph)
+            continue
+        if line:
+            lines.append(sorted(line, key=lambda g: g[1]))
+        line, line_base, line_size = [glyph], base, size
+    if line:
+        lines.append(sorted(line, key=lambda g: g[1]))
+    return lines
+
+
+def split_words(line) -> list:
+    """行内按空白字符或字间距分词"""
+    words, word, last_x1 = [], [], None
+    for glyph in line:
+        char, box, size = glyph[2], glyph[3], glyph[4]
+        if char.isspace():
+            if word:
+                words.append(word)
+            word, last_x1 = [], None
+            continue
+        if word and box[0] - last_x1 > WORD_GAP * size:
+            words.append(word)
+            word = []
+        word.append(glyph)
+        last_x1 = box[2]
+    if word:
+        words.append(word)
+    return words
+
+
+def line_dict(line, glyphs=False):
+    """一行字形转为 {"text", "bbox", "words"}，没有可见字符时返回 None"""
+    words = []
+    for word in split_words(line):
+        word_d = {
+            "text": "".join(g[2] for g in word),
+            "bbox": _round_box(_union([g[3] for g in word])),
+        }
+        if glyphs:
+            word_d["glyphs"] = [{"text": g[2], "bbox": _round_box(g[3])} for g in word]
+        words.append(word_d)
+    if not words:
+        return None
+    return {
+        "text": " ".join(w["text"] for w in words),
+        "bbox": _round_box(_union([w["bbox"] for w in words])),
+        "words": words,
+    }
+
+
+def page_text(text_list, glyphs=False) -> list:
+    """
+    单页文本行
+    [{"text", "bbox", "words": [{"text", "bbox", "glyphs"?: [{"text", "bbox"}]}]}]
+    bbox 为 [x0, y0, x1, y1]，单位 mm，原点左上
+    """
+    lines = []
+    for line in group_lines(page_glyphs(text_list)):
+        line_d = line_dict(line, glyphs=glyphs)
+        if line_d:
+            lines.append(line_d)
+    return lines
+
+
+def iter_text(data, page_list=None, glyphs=False, layout=False):
+    """
+    逐页产出 {"doc_no", "page", "size": [宽, 高], "lines": [...]}，单位 mm
+    data: OFDParser 结果；page_list: 页码或页码列表，None 为全部；glyphs: 是否输出逐字框
+    layout: 为 True 时按版面分块、分栏，页面另含 "blocks"、"columns"，"lines" 按阅读顺序排列，见 extract.layout
+    模板内容已在解析时合并到页面
+    """
+    if isinstance(page_list, int):
+        page_list = [page_list]
+    for doc in data:
+        page_size = doc.get("page_size") or []
+        default_size = doc.get("default_page_size") or []
+        for pg_no, page in doc.get("page_info", {}).items():
+            if page_list is not None and pg_no not in page_list:
+                continue
+            size = page_size[pg_no] if pg_no < len(page_size) and page_size[pg_no] else default_size
+            page_d = {
+                "doc_no": doc.get("doc_no"),
+                "page": pg_no,
+                "size": [float(v) for v in size[-2:]] if size else [],
+            }
+            if layout:
+                from fastofd.extract.layout import page_layout
+                page_d.update(page_layout(page.get("text_list", []), glyphs=glyphs))
+            else:
+                page_d["lines"] = page_text(page.get("text_list", []), glyphs=glyphs)
+            yield page_d
+
+
+def _page_plain_text(page):
+    if "blocks" in page:
+        return "\n\n".join("\n".join(line["text"] for line in block["lines"]) for block in page["blocks"])
+    return "\n".join(line["text"] for line in page["lines"])
+
+
+def to_text(pages) -> str:
+    """行以换行分隔，版面分块时块之间空一行，页以换页符分隔"""
+    return "\f".join(_page_plain_text(page) for page in pages)
+
+
+def to_json(pages) -> str:
+    return json.dumps(list(pages), ensure_ascii=False)
+
+
+def to_hocr(pages, dpi=72) -> str:
+    """hOCR，坐标按 dpi 从 mm 换算为像素"""
+    scale = dpi / 25.4
+
+    def bbox(box):
+        return "bbox " + " ".join(str(int(round(v * scale))) for v in box)
+
+    body = []
+    for page_idx, page in enumerate(pages):
+        width, height = (page["size"] or [0, 0])[:2]
+        body.append(f"<div class='ocr_page' id='page_{page_idx + 1}' "
+                    f"title='{bbox([0, 0, width, height])}; ppageno {page_idx}'>")
+        blocks = page.get("blocks") or [{"bbox": None, "lines": page["lines"]}]
+        line_idx = 0
+        for block_idx, block in enumerate(blocks):
+            if block["bbox"]:
+                body.append(f"<p class='ocr_par' id='par_{page_idx + 1}_{block_idx + 1}' "
+                            f"title='{bbox(block['bbox'])}'>")
+            for line in block["lines"]:
+                line_idx += 1
+                body.append(f"<span class='ocr_line' id='line_{page_idx + 1}_{line_idx}' "
+                            f"title='{bbox(line['bbox'])}'>")
+                for word_idx, word in enumerate(line["words"]):
+                    body.append(f"<span class='ocrx_word' id='word_{page_idx + 1}_{line_idx}_{word_idx + 1}' "
+                                f"title='{bbox(word['bbox'])}'>{html.escape(word['text'])}</span>")
+                body.append("</span>")
+            if block["bbox"]:
+                body.append("</p>")
+        body.append("</div>")
+    return (
+        "<!DOCTYPE html>\n<html xmlns='http://www.w3.org/1999/xhtml'>\n<head>\n"
+        "<meta http-equiv='Content-Type' content='text/html; charset=utf-8'/>\n"
+        "<meta name='ocr-system' content='fastofd'/>\n"
+        "<meta name='ocr-capabilities' content='ocr_page ocr_par ocr_line ocrx_word'/>\n"
+        "</head>\n<body>\n" + "\n".join(body) + "\n</body>\n</html>\n"
+    )
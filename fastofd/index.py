@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 23:10
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 跨文档全文与元数据索引（SQLite FTS5），按内容哈希增量更新
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import traceback
+
+from loguru import logger
+
+from fastofd.batch import file_hash, iter_sources, run_pool
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+CREATE TABLE IF NOT EXISTS documents (
+    hash TEXT PRIMARY KEY,
+    page_count INTEGER,
+    creator TEXT,
+    creation_date TEXT,
+    fonts TEXT,
+    seals TEXT,
+    indexed_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_creator ON documents (creator);
+CREATE INDEX IF NOT EXISTS documents_creation_date ON documents (creation_date);
+"""
+
+
+def index_file(src, file_sha):
+    """
+    子进程任务：解析单个文件，抽取逐页文本与元数据，异常不外抛
+    返回 {"src", "hash", "status", "pages": [(页码, 文本)], "page_count", "creator", "creation_date",
+          "fonts", "seals", "seconds", "error"}
+    """
+    # 子进程内导入，父进程只负责调度与写库
+    from fastofd.ofd import OFD
+
+    start = time.time()
+    result = {"src": src, "hash": file_sha, "status": "ok", "pages": [], "page_count": 0, "creator": "",
+              "creation_date": "", "fonts": [], "seals": [], "seconds": 0, "error": None}
+    try:
+        ofd = OFD()
+        with open(src, "rb") as f:
+            ofd_bytes = f.read()
+        ofd.read(ofd_bytes, fmt="binary")
+        data = ofd.data
+        for page in ofd.iter_text(layout=False):
+            result["pages"].append((page["page"], "\n".join(line["text"] for line in page["lines"])))
+        result["page_count"] = len(result["pages"])
+        if data:
+            result["creator"] = data[0].get("creator") or ""
+            result["creation_date"] = data[0].get("creation_date") or ""
+            result["fonts"] = sorted({font.get("FontName") for doc in data
+                                      for font in (doc.get("fonts") or {}).values() if font.get("FontName")})
+        for seal in ofd.extract_seals(ofd_bytes, fmt="binary", image_format=None):
+            provider = seal.get("provider") if isinstance(seal.get("provider"), dict) else {}
+            result["seals"].append({
+                "page": seal.get("page"),
+                "boundary": seal.get("boundary"),
+                "provider": provider.get("ProviderName"),
+                "company": provider.get("Company"),
+                "signature_datetime": seal.get("signature_datetime"),
+            })
+        ofd.del_data()
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc(limit=5)
+    result["seconds"] = round(time.time() - start, 3)
+    return result
+
+
+def _crash_result(job):
+    return {"src": job[0], "hash": job[1], "status": "error", "pages": [], "page_count": 0, "creator": "",
+            "creation_date": "", "fonts": [], "seals": [], "seconds": 0, "error": "worker process crashed"}
+
+
+def _fts_query(query):
+    """用户输入转为 FTS5 查询：空白分隔的每个词按短语匹配，词之间为 AND"""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " AND ".join(f'"{term}"' for term in terms)
+
+
+class OFDIndex(object):
+    """
+    ofd 文档库索引
+    files: 路径 -> 内容哈希（大小、修改时间未变的文件不重新计算哈希）
+    documents: 内容哈希 -> 页数、创建者、创建日期、字体、签章；同一内容只解析一次，改名、复制不重复解析
+    pages: FTS5 全文表（SQLite 支持 trigram 分词时使用 trigram，中文按任意 3 字以上子串检索）
+    path: sqlite 文件路径；workers: 解析进程数，0/None 表示 CPU 核数
+    """
+
+    def __init__(self, path, workers=0, max_pending=None):
+        self.path = path
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_pending = max_pending or self.workers * 2
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.tokenizer = self._init_fts()
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        self.conn.commit()
+
+    def _init_fts(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'tokenizer'").fetchone()
+        if row:
+            return row[0]
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                self.conn.execute(f"CREATE VIRTUAL TABLE pages USING fts5(text, hash UNINDEXED, page UNINDEXED, "
+                                  f"tokenize='{tokenizer}')")
+            except sqlite3.OperationalError:
+                continue
+            self.conn.execute("INSERT INTO meta VALUES ('tokenizer', ?)", (tokenizer,))
+            logger.info(f"全文索引分词器 {tokenizer}")
+            return tokenizer
+        raise RuntimeError("当前 sqlite 不支持 FTS5")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write(self, result):
+        conn = self.conn
+        file_sha = result["hash"]
+        conn.execute("DELETE FROM pages WHERE hash = ?", (file_sha,))
+        conn.executemany("INSERT INTO pages (text, hash, page) VALUES (?, ?, ?)",
+                         [(text, file_sha, pg_no) for pg_no, text in result["pages"]])
+        conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     (file_sha, result["page_count"], result["creator"], result["creation_date"],
+                      json.dumps(result["fonts"], ensure_ascii=False),
+                      json.dumps(result["seals"], ensure_ascii=False), time.time(), result["error"]))
+
+    def add(self, inputs, recursive=True, callback=None, commit_every=200):
+        """
+        增量建立索引，返回汇总
+        inputs: 文件或目录（列表）；已索引且大小、修改时间未变的文件直接跳过，内容已索引的文件只登记路径
+        callback: 每解析完一个文件调用 callback(result)
+        """
+        start = time.time()
+        conn = self.conn
+        summary = {"total": 0, "indexed": 0, "failed": 0, "unchanged": 0, "linked": 0, "removed": 0,
+                   "seconds": 0, "failures": []}
+        known = {path: (size, mtime) for path, size, mtime in conn.execute("SELECT path, size, mtime FROM files")}
+        indexed = {row[0] for row in conn.execute("SELECT hash FROM documents WHERE error IS NULL")}
+        stat_of = {}
+        waiting = {}  # 解析中的内容哈希 -> 内容相同、等待登记的其他路径
+        uncommitted = [0]
+
+        def commit_maybe():
+            uncommitted[0] += 1
+            if uncommitted[0] >= commit_every:
+                conn.commit()
+                uncommitted[0] = 0
+
+        def jobs():
+            for src, _ in iter_sources(inputs, recursive=recursive):
+                src = os.path.abspath(src)
+                summary["total"] += 1
+                try:
+                    st = os.stat(src)
+                except OSError as e:
+                    summary["failed"] += 1
+                    summary["failures"].append({"src": src, "error": str(e)})
+                    continue
+                if known.get(src) == (st.st_size, st.st_mtime):
+                    summary["unchanged"] += 1
+                    continue
+                file_sha = file_hash(src)
+                stat_of[src] = (file_sha, st.st_size, st.st_mtime)
+                if file_sha in indexed:
+                    conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (src, *stat_of.pop(src)))
+                    summary["linked"] += 1
+                    commit_maybe()
+                    continue
+                if file_sha in waiting:
+                    waiting[file_sha].append((src, *stat_of.pop(src)))
+                    summary["linked"] += 1
+                    continue
+                waiting[file_sha] = []
+                yield src, file_sha
+
+        def record(result):
+            src = result["src"]
+            file_sha, size, mtime = stat_of.pop(src, (result["hash"], None, None))
+            if result["status"] == "ok":
+                summary["indexed"] += 1
+                indexed.add(file_sha)
+            else:
+                summary["failed"] += 1
+                summary["failures"].append({"src": src, "error": result["error"]})
+                logger.warning(f"索引失败 {src}: {result['error']}")
+            self._write(result)
+            # 失败的文件不登记大小，下次仍会重试
+            ok = result["status"] == "ok"
+            files = [(src, file_sha, size, mtime)] + waiting.pop(file_sha, [])
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                             [(path, sha, size if ok else None, mtime) for path, sha, size, mtime in files])
+            commit_maybe()
+            if callback:
+                callback(result)
+
+        try:
+            run_pool(index_file, jobs(), record, _crash_result, workers=self.workers, max_pending=self.max_pending)
+        finally:
+            conn.commit()
+        summary["removed"] = self.prune()
+        summary["seconds"] = round(time.time() - start, 3)
+        logger.info(f"索引完成 新增 {summary['indexed']} 未变 {summary['unchanged']} 关联 {summary['linked']} "
+                    f"失败 {summary['failed']} 耗时 {summary['seconds']}s")
+        return summary
+
+    def prune(self):
+        """删除已不存在的文件记录，以及不再被任何文件引用的文档与全文，返回删除的文件数"""
+        conn = self.conn
+        missing = [path for (path,) in conn.execute("SELECT path FROM files") if not os.path.exists(path)]
+        conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in missing])
+        orphans = [row[0] for row in conn.execute(
+            "SELECT hash FROM documents WHERE hash NOT IN (SELECT hash FROM files)")]
+        conn.executemany("DELETE FROM pages WHERE hash = ?", [(h,) for h in orphans])
+        conn.executemany("DELETE FROM documents WHERE hash = ?", [(h,) for h in orphans])
+        conn.commit()
+        return len(missing)
+
+    def search(self, query, limit=20, creator=None, date_from=None, date_to=None, snippet=True):
+        """
+        全文检索，返回 [{"hash", "paths", "page", "snippet", "page_count", "creator", "creation_date"}]，按相关度排序
+        creator: 创建者精确匹配；date_from / date_to: 创建日期范围（按字符串比较，如 2024-01-01）
+        少于 3 个字符或分词器不是 trigram 时退化为逐行子串扫描；query 为空或只有空白时返回 []
+        """
+        if not query or not query.split():
+            return []
+        where, params = [], []
+        if creator is not None:
+            where.append("d.creator = ?")
+            params.append(creator)
+        if date_from is not None:
+            where.append("d.creation_date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            where.append("d.creation_date <= ?")
+            params.append(date_to)
+        snippet_sql = "snippet(pages, 0, '[', ']', '…', 16)" if snippet else "''"
+        if self.tokenizer == "trigram" and all(len(term) >= 3 for term in query.split()):
+            match_sql, rank_sql = "pages MATCH ?", "pages.rank"
+            match_params = [_fts_query(query)]
+        else:
+            # trigram 表上少于 3 字的 LIKE 不返回结果，用 instr 逐行扫描
+            match_sql, rank_sql = " AND ".join(["instr(pages.text, ?) > 0"] * len(query.split())), "pages.rowid"
+            match_params = query.split()
+            snippet_sql = "substr(pages.text, 1, 64)" if snippet else "''"
+        sql = (f"SELECT pages.hash, pages.page, {snippet_sql}, d.page_count, d.creator, d.creation_date "
+               f"FROM pages JOIN documents d ON d.hash = pages.hash WHERE {match_sql} "
+               + "".join(f"AND {w} " for w in where) + f"ORDER BY {rank_sql} LIMIT ?")
+        rows = self.conn.execute(sql, match_params + params + [limit]).fetchall()
+        out = []
+        for file_sha, pg_no, snip, page_count, doc_creator, creation_date in rows:
+            paths = [p for (p,) in self.conn.execute("SELECT path FROM files WHERE hash = ?", (file_sha,))]
+            out.append({"hash": file_sha, "paths": paths, "page": pg_no, "snippet": snip, "page_count": page_count,
+                        "creator": doc_creator, "creation_date": creation_date})
+        return out
+
+    def document(self, file_sha):
+        """按内容哈希取文档元数据"""
+        row = self.conn.execute("SELECT hash, page_count, creator, creation_date, fonts, seals, indexed_at, error "
+                                "FROM documents WHERE hash = ?", (file_sha,)).fetchone()
+        if not row:
+            return None
+        return {
+            "hash": row[0], "page_count": row[1], "creator": row[2], "creation_date": row[3],
+            "fonts": json.loads(row[4] or "[]"), "seals": json.loads(row[5] or "[]"),
+            "indexed_at": row[6], "error": row[7],
+            "paths": [p for (p,) in self.conn.execute("SELECT path FROM files WHERE hash = ?", (row[0],))],
+        }
+
+    def stats(self):
+        conn = self.conn
+        return {
+            "files": conn.execute("SELECT count(*) FROM files").fetchone()[0],
+            "documents": conn.execute("SELECT count(*) FROM documents").fetchone()[0],
+            "pages": conn.execute("SELECT coalesce(sum(page_count), 0) FROM documents").fetchone()[0],
+            "tokenizer": self.tokenizer,
+        }
@@ -5,34 +5,85 @@
 # E_MAIL: renoyuan@foxmail.com
 # AUTHOR: reno
 # note:  ofd 基础类
+import asyncio
 import base64
 import os
+from collections import deque
 from io import BytesIO
 from typing import Union
 
 import fitz
-
-from PIL import Image
 from loguru import logger
 
-from fastofd.parser_ofd.ofd_parser import OFDParser
+from fastofd.parser_ofd.ofd_parser import OFDParser, PARSER_VERSION
+from fastofd.parser_ofd.seal_parser import SealParser
+from fastofd.parser_ofd.attachment_parser import AttachmentParser
 from fastofd.draw.draw_pdf import DrawPDF
+from fastofd.draw.draw_img import DrawImage, RasterOptions, decode_samples
 from fastofd.draw.draw_ofd import OFDWrite
+from fastofd.cache import ConversionCache, DocumentCache, content_hash, file_hash, pack_blobs, unpack_blobs
+from fastofd.stats import ConversionStats, resolve
+from fastofd.extract import text as text_extract
+from fastofd.extract.spatial import PageIndex
+from fastofd.extract.table import page_tables
+from fastofd.extract.invoice import extract_invoice
+from fastofd.aio import (AsyncExecutor, get_default_executor, parse_ofd, draw_pdf, page_count, open_pdf, close_pdf,
+                         render_pages, render_pdf_range)
 
 
 class OFD(object):
     """ofd对象"""
 
-    def __init__(self, ):
+    def __init__(self, cache: ConversionCache = None, doc_cache: DocumentCache = None):
+        """
+        cache: ConversionCache，指定后 to_pdf / to_jpg 结果按 输入内容哈希 + 参数 缓存，
+        且 read 延迟到首次需要 data 时才解析，缓存命中时整个解析与绘制过程都被跳过
+        doc_cache: DocumentCache，解析结果按 输入内容哈希 + 解析器版本 缓存，命中时不再调用 OFDParser
+        """
+        self.cache = cache
+        self.doc_cache = doc_cache
+        self.content_hash = None
+        self._source = None
         self.data = None
 
-    def read(self, ofd_f: Union[str, bytes, BytesIO], fmt="b64", save_xml=False, xml_name="testxml"):
+    @property
+    def data(self):
+        return self._load()
+
+    def _load(self, stats=None):
+        """触发延迟解析；stats 为本次转换的统计，read 时已指定统计对象的以 read 为准"""
+        if self._data is None and self._source is not None:
+            ofd_f, save_xml, xml_name, read_stats = self._source
+            self._source = None
+            self._data = self._parse(ofd_f, save_xml, xml_name, read_stats if read_stats.enabled else resolve(stats))
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        """直接替换 data 时原内容哈希失效，转换缓存不再命中，由 read 重新计算"""
+        self._data = value
+        self._source = None
+        self._page_indexes = {}
+        self.content_hash = None
+
+    def read(self, ofd_f: Union[str, bytes, BytesIO], fmt="b64", save_xml=False, xml_name="testxml",
+             stats: ConversionStats = None, lazy=False):
         """_summary_
         Args:
             file (_type_): _description_
             fomat (str, optional): _description_. Defaults to "path".
             fomat in ("path","b64","binary")
+            stats: ConversionStats，记录 unzip / xml_parse / parse 等阶段耗时
+            lazy: 仅用于 fmt="path"，文件不整体读入内存，图片、签章值、字体只记录位置，绘制到引用它的页面时才读取；
+                配合 to_pdf(output=...) 峰值内存为页面结构加单个页面块。转换完成前源文件不能移动或修改，不走 doc_cache
         """
+        if lazy:
+            assert fmt == "path", f"lazy fmt Error: {fmt}"
+            self.data = OFDParser(None, stats=resolve(stats), path=ofd_f)(save_xml=save_xml, xml_name=xml_name)
+            if self.cache is not None:
+                self.content_hash = file_hash(ofd_f)
+            return
+
         if fmt == "path":
             with open(ofd_f, "rb") as f:
                 ofd_f = str(base64.b64encode(f.read()), encoding="utf-8")
@@ -45,7 +96,165 @@ class OFD(object):
         else:
             raise "fomat Error: %s" % fmt
 
-        self.data = OFDParser(ofd_f)(save_xml=save_xml, xml_name=xml_name)
+        stats = resolve(stats)
+        if self.cache is None and self.doc_cache is None:
+            self.data = OFDParser(ofd_f, stats=stats)(save_xml=save_xml, xml_name=xml_name)
+            return
+        self.data = None
+        self.content_hash = content_hash(base64.b64decode(ofd_f))
+        self._source = (ofd_f, save_xml, xml_name, stats)
+        if self.cache is None or save_xml:
+            self.data  # 未启用转换缓存时无需延迟；保存 xml 是显式副作用，也不延迟
+
+    def _parse(self, ofd_f, save_xml, xml_name, stats):
+        """解析，启用 doc_cache 时先查缓存；save_xml 需要真实解压，不走缓存"""
+        if self.doc_cache is None or save_xml:
+            return OFDParser(ofd_f, stats=stats)(save_xml=save_xml, xml_name=xml_name)
+        key = self.doc_cache.make_key(self.content_hash, PARSER_VERSION)
+        with stats.stage("doc_cache"):
+            data = self.doc_cache.get(key)
+        if data is not None:
+            logger.info(f"doc cache hit")
+            stats.incr("doc_cache_hits")
+            return data
+        stats.incr("doc_cache_misses")
+        data = OFDParser(ofd_f, stats=stats)(save_xml=save_xml, xml_name=xml_name)
+        self.doc_cache.set(key, data)
+        return data
+
+    def _cache_key(self, kind, **options):
+        """未启用缓存或数据不是由 read 读入时返回 None"""
+        if self.cache is None or self.content_hash is None:
+            return None
+        page_list = options.get("page_list")
+        if isinstance(page_list, int):
+            options["page_list"] = [page_list]
+        return self.cache.make_key(self.content_hash, kind, **options)
+
+    @staticmethod
+    def _write_output(output, pdfbytes):
+        if isinstance(output, (str, os.PathLike)):
+            with open(output, "wb") as f:
+                f.write(pdfbytes)
+        else:
+            output.write(pdfbytes)
+
+    @staticmethod
+    def _read_bytes(ofd_f, fmt):
+        """extract_* 共用：按 fmt（同 read）取 ofd 字节"""
+        if fmt == "path":
+            with open(ofd_f, "rb") as f:
+                return f.read()
+        if fmt == "b64":
+            return base64.b64decode(ofd_f)
+        if fmt == "binary":
+            return ofd_f
+        if fmt == "io":
+            return ofd_f.getvalue()
+        raise ValueError(f"fmt Error: {fmt}")
+
+    def extract_seals(self, ofd_f: Union[str, bytes, BytesIO], fmt="b64", image_format="pil"):
+        """
+        只读取签章：返回各签章所在页码、位置（毫米）、签章人信息与签章图片，不解析页面内容、不绘制
+        fmt: 同 read；image_format: "pil" / "png"（png 字节）/ None（只要元数据，不提取图片）
+        返回结构见 parser_ofd.seal_parser.SealParser
+        """
+        with SealParser(self._read_bytes(ofd_f, fmt)) as parser:
+            return parser(image_format=image_format)
+
+    def extract_attachments(self, ofd_f: Union[str, bytes, BytesIO], fmt="b64", load=False):
+        """
+        只读取附件列表（如电子发票 original_invoice.xml），不解析页面内容、不绘制
+        load: False 只返回元数据，True 每项附带 "data" 附件字节
+        按需读取单个附件用 parser_ofd.attachment_parser.AttachmentParser.read / read_xml
+        """
+        with AttachmentParser(self._read_bytes(ofd_f, fmt)) as parser:
+            attachments = parser.attachments()
+            if load:
+                for attachment in attachments:
+                    attachment["data"] = parser.read(attachment)
+            return attachments
+
+    def extract_custom_tags(self, ofd_f: Union[str, bytes, BytesIO], fmt="b64"):
+        """
+        只读取自定义标引及其引用的页面对象（文本、位置），只解析被引用的页面
+        返回结构见 parser_ofd.attachment_parser.AttachmentParser.custom_tags
+        """
+        with AttachmentParser(self._read_bytes(ofd_f, fmt)) as parser:
+            return parser.custom_tags()
+
+    def extract_invoice(self, ofd_f: Union[str, bytes, BytesIO], fmt="b64", fields=None, fallback=True):
+        """
+        增值税电子发票字段（发票代码 / 号码、开票日期、购销方、金额、税额等），不解析字体图片、不绘制、不 OCR
+        优先取自定义标引与 xml 附件，缺失时按模板标签位置在首页文本中查找；批量见 extract.invoice.extract_invoices
+        返回结构见 extract.invoice.InvoiceParser
+        """
+        return extract_invoice(self._read_bytes(ofd_f, fmt), fields=fields, fallback=fallback)
+
+    def iter_text(self, page_list=None, glyphs=False, layout=True):
+        """
+        不绘制，逐页产出带坐标的文本（模板内容已合并）
+        {"doc_no", "page", "size": [宽, 高], "lines": [{"text", "bbox", "words": [{"text", "bbox", "glyphs"?}]}]}
+        bbox 为 [x0, y0, x1, y1]，单位 mm，原点左上；glyphs=True 时每个词附带逐字框
+        layout: 按版面分块、分栏，lines 按阅读顺序排列，页面另含 blocks、columns；False 时按基线自上而下逐行
+        """
+        data = self._load()
+        assert data, f"data is None"
+        yield from text_extract.iter_text(data, page_list=page_list, glyphs=glyphs, layout=layout)
+
+    def extract_text(self, page_list=None, fmt="text", glyphs=False, layout=True, dpi=72):
+        """
+        抽取文本
+        fmt: text（行以换行、块之间空行、页以换页符分隔）/ json / hocr（坐标按 dpi 换算为像素）/ dict（iter_text 结果列表）
+        """
+        assert fmt in ("text", "json", "hocr", "dict"), f"fmt Error: {fmt}"
+        pages = list(self.iter_text(page_list=page_list, glyphs=glyphs, layout=layout))
+        if fmt == "text":
+            return text_extract.to_text(pages)
+        if fmt == "json":
+            return text_extract.to_json(pages)
+        if fmt == "hocr":
+            return text_extract.to_hocr(pages, dpi=dpi)
+        return pages
+
+    def page_index(self, pg_no, doc_no=0, cell=10.0) -> PageIndex:
+        """
+        页面空间索引（文本、图片、线段、签章、注释），同一页只建一次
+        index.query([x0, y0, x1, y1], kind="text") / index.nearest(x, y, kind="seal") 等，单位 mm，见 extract.spatial
+        """
+        key = (doc_no, pg_no, cell)
+        if key not in self._page_indexes:
+            data = self._load()
+            assert data, f"data is None"
+            doc = data[doc_no]
+            page = doc.get("page_info", {}).get(pg_no)
+            assert page is not None, f"pg_no Error: {pg_no}"
+            self._page_indexes[key] = PageIndex(page,
+                                                signatures=(doc.get("signatures_page_id") or {}).get(pg_no),
+                                                annotations=(doc.get("annotation_info") or {}).get(pg_no),
+                                                cell=cell)
+        return self._page_indexes[key]
+
+    def extract_tables(self, page_list=None):
+        """
+        不绘制，按 PathObject 线段识别表格并把文本分配到单元格
+        返回 [{"doc_no", "page", "tables": [...]}]，表格结构见 extract.table.page_tables
+        """
+        data = self._load()
+        assert data, f"data is None"
+        if isinstance(page_list, int):
+            page_list = [page_list]
+        out = []
+        for doc_no, doc in enumerate(data):
+            for pg_no, page in doc.get("page_info", {}).items():
+                if page_list is not None and pg_no not in page_list:
+                    continue
+                out.append({
+                    "doc_no": doc.get("doc_no"),
+                    "page": pg_no,
+                    "tables": page_tables(page, index=self.page_index(pg_no, doc_no=doc_no)),
+                })
+        return out
 
     def save(self, ):
         """
@@ -62,33 +271,104 @@ class OFD(object):
         ofd_byte = OFDWrite()(pdfbyte, optional_text=optional_text)
         return ofd_byte
 
-    def to_pdf(self, render_mode='line', page_list=None, with_signature=True):
-        """return ofdbytes"""
+    @staticmethod
+    def _finish(result, stats, return_stats):
+        """结束统计；return_stats 时与结果一并返回"""
+        stats.finish()
+        return (result, stats) if return_stats else result
 
-        assert self.data, f"data is None"
-        logger.info(f"to_pdf")
-        return DrawPDF(self.data, render_mode=render_mode, page_list=page_list, with_signature=with_signature).draw_pdf()
+    def to_pdf(self, render_mode='line', page_list=None, with_signature=True, workers=None, output=None,
+               stats: ConversionStats = None, return_stats=False):
+        """
+        return pdfbytes
+        workers: None/1 单进程绘制; 0 按CPU核数自动; N 使用N个子进程并行绘制页面块
+        页数不超过 DrawPDF.single_thread_threshold 时自动回退单进程
+        output: 文件路径或可写二进制流，指定后按页面块流式写出并返回 None；绘制产生的画布、解码图片按块释放。
+            read(..., lazy=True) 时图片、签章值按页从源文件读取，峰值约为页面结构加一个页面块；
+            否则解析结果（含全部图片资源的 base64）常驻内存，峰值约为解析结果加一个页面块
+        启用缓存时命中直接返回缓存结果；流式写出未命中时不写入缓存，避免把整份 pdf 读回内存
+        stats: ConversionStats，记录各阶段耗时与对象计数，结束时触发其 callback
+        return_stats: 返回 (pdfbytes, stats)，未传入 stats 时新建一个
+        """
+        if return_stats and stats is None:
+            stats = ConversionStats()
+        stats = resolve(stats)
+        pdfbytes = self._to_pdf(render_mode, page_list, with_signature, workers, output, stats)
+        if pdfbytes is not None:
+            stats.incr("bytes_out", len(pdfbytes))
+        elif stats.enabled and isinstance(output, (str, os.PathLike)):
+            stats.incr("bytes_out", os.path.getsize(output))
+        return self._finish(pdfbytes, stats, return_stats)
 
-    def pdf2img(self, pdfbytes):
+    def _to_pdf(self, render_mode, page_list, with_signature, workers, output, stats):
+        key = self._cache_key("pdf", render_mode=render_mode, page_list=page_list, with_signature=with_signature)
+        if key:
+            with stats.stage("cache"):
+                pdfbytes = self.cache.get(key)
+            if pdfbytes is not None:
+                logger.info(f"to_pdf cache hit")
+                stats.incr("cache_hits")
+                if output is not None:
+                    self._write_output(output, pdfbytes)
+                    return None
+                return pdfbytes
+            stats.incr("cache_misses")
 
-        image_list = []
+        data = self._load(stats)
+        assert data, f"data is None"
+        logger.info(f"to_pdf")
+        draw_pdf = DrawPDF(data, render_mode=render_mode, page_list=page_list, with_signature=with_signature,
+                           max_workers=workers, stats=stats)
+        if output is not None:
+            draw_pdf.draw_pdf_to(output)
+            return None
+        pdfbytes = draw_pdf.draw_pdf()
+        if key:
+            self.cache.set(key, pdfbytes)
+        return pdfbytes
 
-        doc = fitz.open(stream=pdfbytes, filetype="pdf")
-
-        for page in doc:
-            rotate = int(0)
-            zoom_x, zoom_y = 1.6, 1.6
-            zoom_x, zoom_y = 2, 2
-            mat = fitz.Matrix(zoom_x, zoom_y).prerotate(rotate)
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-            pil_image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            # image = np.ndarray((pix.height, pix.width, 3), dtype=np.uint8, buffer=pix.samples)
-            # print(image.shape)
-            # print(image[2])
-            image_list.append(pil_image)
+    def pdf2img(self, pdfbytes, workers=None, output_dir=None, options: RasterOptions = None,
+                stats: ConversionStats = None):
+        """
+        return pil list
+        workers: None/1 单进程; 0 按CPU核数; N 使用N个子进程按页区间并行栅格化
+        output_dir: 指定后由子进程直接写出 png/jpg 文件，返回按页序排列的文件路径列表
+        options: RasterOptions，控制 dpi、颜色空间与输出格式（PIL / png、jpeg 字节 / numpy），默认 144dpi RGB PIL
+        stats: ConversionStats，记录 rasterize 耗时与页数
+        """
+        draw_img = DrawImage(pdfbytes, options=options, stats=stats)
+        if workers in (None, 1) and not output_dir:
+            image_list = draw_img()
+        else:
+            image_list = draw_img.render_parallel(workers=1 if workers is None else workers, output_dir=output_dir)
         logger.info(f"pdf2img")
         return image_list
 
+    def page_nos(self, page_list=None):
+        """按绘制顺序返回页码，与 to_pdf 输出页序一致"""
+        assert self.data, f"data is None"
+        if isinstance(page_list, int):
+            page_list = [page_list]
+        return [pg_no for doc in self.data for pg_no in doc.get("page_info")
+                if page_list is None or pg_no in page_list]
+
+    def iter_images(self, render_mode='line', page_list=None, with_signature=True, workers=None, prefetch=1,
+                    options: RasterOptions = None, stats: ConversionStats = None):
+        """
+        逐页产出 (页码, PIL图片)，不在内存中保留整份图片列表
+        prefetch: 后台线程预渲染页数，调用方处理当前页时下一页同时渲染；0 表示不预取
+        options: RasterOptions，见 pdf2img；OCR 场景可用 RasterOptions.ocr()
+        stats: ConversionStats，全部页面产出后 finish
+        """
+        stats = resolve(stats)
+        data = self._load(stats)
+        assert data, f"data is None"
+        page_nos = self.page_nos(page_list)
+        pdfbytes = self._to_pdf(render_mode, page_list, with_signature, workers, None, stats)
+        for page_idx, image in DrawImage(pdfbytes, options=options, stats=stats).iter_images(prefetch=prefetch):
+            yield page_nos[page_idx] if page_idx < len(page_nos) else page_idx, image
+        stats.finish()
+
     def jpg2ofd(self, imglist: list):
         """
         imglist: pil image list
@@ -106,15 +386,127 @@ class OFD(object):
         data = OFDParser(None).img2data(imglist)
         return DrawPDF(data)()
 
-    def to_jpg(self, render_mode='line', page_list=None, with_signature=True):
+    def to_jpg(self, render_mode='line', page_list=None, with_signature=True, workers=None,
+               options: RasterOptions = None, stats: ConversionStats = None, return_stats=False):
         """
         return pil list
+        workers: 同时用于 pdf 绘制与栅格化的进程数，见 to_pdf / pdf2img
+        options: RasterOptions，见 pdf2img
+        启用缓存时 png/jpeg 输出整体缓存；PIL/numpy 输出只复用缓存的 pdf，栅格化重新执行
+        stats / return_stats: 见 to_pdf，bytes_out 只统计 png/jpeg 编码后的图片字节
         """
-        assert self.data, f"data is None"
+        if return_stats and stats is None:
+            stats = ConversionStats()
+        stats = resolve(stats)
+        key = None
+        if options is not None and options.fmt in ("png", "jpeg"):
+            key = self._cache_key("img", render_mode=render_mode, page_list=page_list, with_signature=with_signature,
+                                  dpi=options.dpi, colorspace=options.colorspace, fmt=options.fmt,
+                                  quality=options.quality, threshold=options.threshold, rotate=options.rotate,
+                                  backend=f"fitz-{fitz.VersionBind}")
+            cached = None
+            if key:
+                with stats.stage("cache"):
+                    cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"to_jpg cache hit")
+                stats.incr("cache_hits")
+                image_list = unpack_blobs(cached)
+                stats.incr("bytes_out", sum(len(image) for image in image_list))
+                return self._finish(image_list, stats, return_stats)
+            if key:
+                stats.incr("cache_misses")
+
         image_list = []
-        pdfbytes = self.to_pdf(render_mode=render_mode, page_list=page_list, with_signature=with_signature)
-        image_list = self.pdf2img(pdfbytes)
-        return image_list
+        pdfbytes = self._to_pdf(render_mode, page_list, with_signature, workers, None, stats)
+        image_list = self.pdf2img(pdfbytes, workers=workers, options=options, stats=stats)
+        if key:
+            self.cache.set(key, pack_blobs(image_list))
+        return self._finish(image_list, stats, return_stats)
+
+    async def aread(self, ofd_f: Union[str, bytes, BytesIO], fmt="b64", executor: AsyncExecutor = None):
+        """read 的异步版本，解析在执行器中进行，executor 默认见 aio.get_default_executor"""
+        executor = executor or get_default_executor()
+        if executor.in_process:
+            await executor.run(self.read, ofd_f, fmt=fmt)
+            # 启用转换缓存时 read 延迟解析，这里不触发，留给 ato_pdf 在执行器中按需解析
+            return
+        if fmt == "io":
+            ofd_f, fmt = ofd_f.getvalue(), "binary"
+        if self.cache is None:
+            self.data = await executor.run(parse_ofd, ofd_f, fmt)
+            return
+        # 内容哈希在子进程中随解析一起计算，之后同步的 to_pdf / to_jpg 按新文档寻址转换缓存
+        self.data, content_digest = await executor.run(parse_ofd, ofd_f, fmt, True)
+        self.content_hash = content_digest
+
+    async def ato_pdf(self, render_mode='line', page_list=None, with_signature=True,
+                      executor: AsyncExecutor = None):
+        """to_pdf 的异步版本，返回 pdfbytes"""
+        executor = executor or get_default_executor()
+        if executor.in_process:
+            return await executor.run(self.to_pdf, render_mode=render_mode, page_list=page_list,
+                                      with_signature=with_signature)
+        assert self.data, f"data is None"
+        return await executor.run(draw_pdf, self.data, {"render_mode": render_mode, "page_list": page_list,
+                                                        "with_signature": with_signature})
+
+    async def ato_images(self, render_mode='line', page_list=None, with_signature=True,
+                         options: RasterOptions = None, executor: AsyncExecutor = None, prefetch=2,
+                         pages_per_task=4):
+        """
+        iter_images 的异步版本，async for 逐页产出 (页码, 图片)
+        先生成 pdf，再按页码区间提交栅格化，至多 prefetch 个区间同时在执行器中渲染，按页序产出
+        线程池：文档只打开一次，每个区间一页，fitz 调用经 FITZ_LOCK 串行（MuPDF 不支持并发渲染）；
+        进程池：每个任务打开一次文档渲染 pages_per_task 页，pdf 字节按区间而非按页传给子进程
+        """
+        executor = executor or get_default_executor()
+        options = options or RasterOptions()
+        pdfbytes = await self.ato_pdf(render_mode=render_mode, page_list=page_list, with_signature=with_signature,
+                                      executor=executor)
+        if executor.in_process:
+            page_nos = await executor.run(self.page_nos, page_list)
+        else:
+            page_nos = self.page_nos(page_list)
+        total = await executor.run(page_count, pdfbytes)
+
+        doc = None
+        if executor.in_process:
+            step = 1
+            draw_img = DrawImage(pdfbytes, options=options)
+            doc = await executor.run(open_pdf, pdfbytes)
+        else:
+            step = max(1, pages_per_task)
+
+        def submit(page_range):
+            if doc is not None:
+                return executor.run(render_pages, draw_img, doc, page_range)
+            return executor.run(render_pdf_range, pdfbytes, page_range, options)
+
+        ranges = deque(list(range(i, min(i + step, total))) for i in range(0, total, step))
+        pending = deque()
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < max(1, prefetch):
+                    page_range = ranges.popleft()
+                    pending.append((page_range, asyncio.ensure_future(submit(page_range))))
+                page_range, task = pending.popleft()
+                images = await task
+                for n, page_idx in enumerate(page_range):
+                    if doc is not None:
+                        image = images[n]
+                    else:
+                        image = images.pop(page_idx)
+                        if isinstance(image, tuple):
+                            image = decode_samples(image, options)
+                    yield page_nos[page_idx] if page_idx < len(page_nos) else page_idx, image
+        finally:
+            # 调用方提前结束迭代时取消尚未开始的区间，等待已在执行的区间结束后再关闭文档
+            for _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+            if doc is not None:
+                await executor.run(close_pdf, doc)
 
     def del_data(self, ):
         """销毁self.data"""
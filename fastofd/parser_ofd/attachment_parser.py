@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 23:30
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 只解析附件与自定义标引，附件内容按需读取，不解析页面内容与字体
+import posixpath
+from xml.etree import ElementTree
+
+import xmltodict
+from loguru import logger
+
+from .file_deal import decode_xml
+from .file_attachment_parser import AttachmentsFileParser
+from .file_customtag_parser import CustomTagsFileParser, CustomTagFileParser
+from .file_doc_parser import DocumentFileParser
+from .file_ofd_parser import OFDFileParser
+from .package import OFDPackage
+
+# 可被标引引用的页面对象
+PAGE_OBJECT_TAGS = ("TextObject", "PathObject", "ImageObject", "CompositeObject")
+
+
+def _loc(value):
+    """Document.xml 中 ofd:Attachments / ofd:CustomTags 可能是文本，也可能带属性"""
+    if isinstance(value, dict):
+        value = value.get("#text") or value.get("@BaseLoc")
+    return value.strip() if isinstance(value, str) else None
+
+
+class AttachmentParser(OFDPackage):
+    """
+    附件、自定义标引快速解析
+    OFD.xml > Document.xml > Attachments.xml / CustomTags.xml，zip 成员按需读取；
+    attachments() 只列元数据，read() 读取单个附件内容，custom_tags() 只解析被引用的页面
+    """
+
+    def __init__(self, ofd_bytes: bytes):
+        super().__init__(ofd_bytes)
+        self._ofd_info = None
+        self._docs = None
+        self._doc_infos = {}
+        self._attachments = None
+        self._page_contents = {}  # {Content.xml 成员名: page_content 结果}
+
+    def ofd_info(self) -> dict:
+        """OFDFileParser 结果，只解析一次"""
+        if self._ofd_info is None:
+            ofd_xml_obj, _ = self._read_xml("OFD.xml")
+            self._ofd_info = OFDFileParser(ofd_xml_obj)() if ofd_xml_obj else {}
+        return self._ofd_info
+
+    def documents(self) -> list:
+        """[(doc_no, Document.xml 成员名, Document.xml 对象)]，只读取一次"""
+        if self._docs is None:
+            self._docs = []
+            for doc_no, doc_root in enumerate(self.ofd_info().get("doc_root") or []):
+                doc_xml_obj, doc_name = self._read_xml(doc_root)
+                if doc_xml_obj:
+                    self._docs.append((doc_no, doc_name, doc_xml_obj))
+        return self._docs
+
+    def document_info(self, doc_no) -> dict:
+        """DocumentFileParser 结果，只解析一次"""
+        if doc_no not in self._doc_infos:
+            doc_xml_obj = next(doc[2] for doc in self.documents() if doc[0] == doc_no)
+            self._doc_infos[doc_no] = DocumentFileParser(doc_xml_obj)()
+        return self._doc_infos[doc_no]
+
+    def attachments(self) -> list:
+        """
+        附件列表，不读取附件内容：
+        {"doc_no", "ID", "Name", "Format", "CreationDate", "ModDate", "Size", "Visible", "Usage", "FileLoc",
+         "loc": zip 成员名（找不到时为 None）}
+        """
+        if self._attachments is not None:
+            return [dict(i) for i in self._attachments]
+        out = []
+        for doc_no, doc_name, doc_xml_obj in self.documents():
+            doc_base = posixpath.dirname(doc_name)
+            for loc in self.document_info(doc_no).get("attachments") or []:
+                attachments_xml_obj, attachments_name = self._read_xml(_loc(loc), doc_base)
+                if not attachments_xml_obj:
+                    continue
+                attachments_base = posixpath.dirname(attachments_name)
+                for attachment in AttachmentsFileParser(attachments_xml_obj)():
+                    attachment["doc_no"] = doc_no
+                    attachment["loc"] = self._resolve(attachment.get("FileLoc"), attachments_base)
+                    out.append(attachment)
+        self._attachments = out
+        return [dict(i) for i in out]
+
+    def _find(self, attachment):
+        """attachment: attachments() 中的一项，或附件 ID / 名称"""
+        if isinstance(attachment, dict):
+            return attachment.get("loc")
+        for cell in self.attachments():
+            if attachment in (cell.get("ID"), cell.get("Name"), cell.get("FileLoc")):
+                return cell.get("loc")
+        return None
+
+    def read(self, attachment) -> bytes:
+        """读取附件内容，找不到返回 None"""
+        name = self._find(attachment)
+        return self.zip_file.read(name) if name else None
+
+    def read_xml(self, attachment) -> dict:
+        """读取 xml 附件（如电子发票 original_invoice.xml）并解析为 dict"""
+        name = self._find(attachment)
+        if not name:
+            return None
+        return xmltodict.parse(decode_xml(self.zip_file.read(name), name))
+
+    def page_content(self, content_name) -> dict:
+        """
+        页面 Content.xml 中可引用的对象，含 PageBlock 内嵌对象，只解析一次
+        {"objects": {ID: {"type", "boundary", "text"}}, "templates": [引用的模板 ID]}
+        页面内容是最大的 xml，这里只需遍历元素，用 ElementTree 解析，不转 dict
+        """
+        if content_name in self._page_contents:
+            return self._page_contents[content_name]
+        objects, templates = {}, []
+        data, name = self._read(content_name)
+        root = None
+        if data is not None:
+            try:
+                root = ElementTree.fromstring(decode_xml(data, name))
+            except ElementTree.ParseError as e:
+                logger.warning(f"{name} 解析失败: {e}")
+        for element in root.iter() if root is not None else ():
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag in PAGE_OBJECT_TAGS and element.get("ID"):
+                boundary = element.get("Boundary")
+                text = None
+                if tag == "TextObject":
+                    text = "".join(child.text or "" for child in element
+                                   if child.tag.rsplit("}", 1)[-1] == "TextCode")
+                objects[element.get("ID")] = {
+                    "type": tag,
+                    "boundary": [float(i) for i in boundary.split()] if boundary else [],
+                    "text": text,
+                }
+            elif tag == "Template" and element.get("TemplateID"):
+                templates.append(element.get("TemplateID"))
+        self._page_contents[content_name] = {"objects": objects, "templates": templates}
+        return self._page_contents[content_name]
+
+    @staticmethod
+    def page_locs(doc_xml_obj) -> dict:
+        """{页面 ID: (页码, 页面 BaseLoc)}，按文档顺序，页码与 OFDParser 一致"""
+        parser = DocumentFileParser(doc_xml_obj)
+        pages: list = []
+        parser.recursion_ext(doc_xml_obj, pages, "ofd:Page")
+        return {
+            i.get("@ID"): (parser.loc2page_no(i.get("@BaseLoc"), idx), i.get("@BaseLoc"))
+            for idx, i in enumerate(pages) if isinstance(i, dict)
+        }
+
+    def custom_tags(self) -> list:
+        """
+        自定义标引，引用的页面对象已解析：
+        [{"doc_no", "TypeID", "NameSpace", "SchemaLoc", "FileLoc", "loc",
+          "items": [{"name", "path", "value", "refs": [{"PageRef", "ObjectID", "page", "type", "boundary", "text"}]}]}]
+        boundary 为对象 Boundary [x, y, w, h]（毫米）；只读取被引用的页面 Content.xml
+        """
+        out = []
+        for doc_no, doc_name, doc_xml_obj in self.documents():
+            doc_base = posixpath.dirname(doc_name)
+            page_locs = None
+            for loc in self.document_info(doc_no).get("custom_tag") or []:
+                tags_xml_obj, tags_name = self._read_xml(_loc(loc), doc_base)
+                if not tags_xml_obj:
+                    continue
+                tags_base = posixpath.dirname(tags_name)
+                for tag in CustomTagsFileParser(tags_xml_obj)():
+                    tag_xml_obj, tag_name = self._read_xml(tag.get("FileLoc"), tags_base)
+                    items = CustomTagFileParser(tag_xml_obj)() if tag_xml_obj else []
+                    for item in items:
+                        for ref in item["refs"]:
+                            if page_locs is None:
+                                page_locs = self.page_locs(doc_xml_obj)
+                            pg_no, page_loc = page_locs.get(ref.get("PageRef"), (None, None))
+                            content_name = self._resolve(page_loc, doc_base) if page_loc else None
+                            obj = self.page_content(content_name)["objects"].get(ref["ObjectID"], {}) \
+                                if content_name else {}
+                            ref.update({"page": pg_no, "type": obj.get("type"),
+                                        "boundary": obj.get("boundary"), "text": obj.get("text")})
+                    out.append(dict(tag, doc_no=doc_no, loc=tag_name, items=items))
+        return out
+
+    def __call__(self, load=False):
+        """
+        {"attachments": attachments()，load=True 时每项附带 "data" 字节, "custom_tags": custom_tags()}
+        """
+        attachments = self.attachments()
+        if load:
+            for attachment in attachments:
+                attachment["data"] = self.read(attachment)
+        return {"attachments": attachments, "custom_tags": self.custom_tags()}
@@ -28,7 +28,7 @@ class AnnotationsParser(FileParserBase):
         annotations_res: list = []
         annotations_res_key = "ofd:Page"
         self.recursion_ext(self.xml_obj, annotations_res, annotations_res_key)
-        logger.debug(f"annotations_res is {annotations_res}")
+        logger.debug("annotations_res is {}", annotations_res)
         if annotations_res:
             for i in annotations_res:
                 page_id =  i.get("@PageID")
@@ -40,12 +40,12 @@ class AnnotationsParser(FileParserBase):
                     logger.debug(f"file_Loc is null ")
                     continue
                 else:
-                    logger.debug(f"page_id is {page_id}, file_Loc is {file_Loc}")
+                    logger.debug("page_id is {}, file_Loc is {}", page_id, file_Loc)
                     match = re.search(r'Page_(\d+)', file_Loc)
                     if match:
                         page_no = int(match.group(1))
                     else:
-                        logger.debug(f"page_no is null, text is {text}")
+                        logger.debug("page_no is null, file_Loc is {}", file_Loc)
                         page_no = 0
                     info[page_id] = {
                         "FileLoc": file_Loc,
@@ -4,4 +4,39 @@
 # CREATE_TIME: 2025/4/9 18:52
 # E_MAIL: renoyuan@foxmail.com
 # AUTHOR: reno
-# NOTE:
+# NOTE: 附件列表解析
+
+from .file_parser_base import FileParserBase
+
+
+class AttachmentsFileParser(FileParserBase):
+    """
+    Parser Attachments
+    附件列表，只取元数据，不读取附件内容
+    /xml_dir/Doc_0/Attachs/Attachments.xml
+    """
+
+    def __call__(self):
+        info = []
+        attachment_res: list = []
+        attachment_res_key = "ofd:Attachment"
+        self.recursion_ext(self.xml_obj, attachment_res, attachment_res_key)
+
+        for i in attachment_res:
+            if not isinstance(i, dict):
+                continue
+            file_loc = i.get("ofd:FileLoc") or i.get("@FileLoc") or ""
+            if isinstance(file_loc, dict):
+                file_loc = file_loc.get("#text", "")
+            info.append({
+                "ID": i.get("@ID"),
+                "Name": i.get("@Name"),
+                "Format": i.get("@Format"),
+                "CreationDate": i.get("@CreationDate"),
+                "ModDate": i.get("@ModDate"),
+                "Size": i.get("@Size"),
+                "Visible": i.get("@Visible", "true"),
+                "Usage": i.get("@Usage", "none"),
+                "FileLoc": file_loc,
+            })
+        return info
@@ -4,4 +4,80 @@
 # CREATE_TIME: 2025/4/9 18:51
 # E_MAIL: renoyuan@foxmail.com
 # AUTHOR: reno
-# NOTE:
+# NOTE: 自定义标引解析
+
+from .file_parser_base import FileParserBase
+
+
+def _text(value):
+    if isinstance(value, dict):
+        value = value.get("#text", "")
+    return value.strip() if isinstance(value, str) else ""
+
+
+class CustomTagsFileParser(FileParserBase):
+    """
+    Parser CustomTags
+    自定义标引列表
+    /xml_dir/Doc_0/Tags/CustomTags.xml
+    """
+
+    def __call__(self):
+        info = []
+        custom_tag_res: list = []
+        custom_tag_res_key = "ofd:CustomTag"
+        self.recursion_ext(self.xml_obj, custom_tag_res, custom_tag_res_key)
+
+        for i in custom_tag_res:
+            if not isinstance(i, dict):
+                continue
+            info.append({
+                "TypeID": i.get("@TypeID"),
+                "NameSpace": i.get("@NameSpace"),
+                "SchemaLoc": _text(i.get("ofd:SchemaLoc")),
+                "FileLoc": _text(i.get("ofd:FileLoc")) or i.get("@FileLoc", ""),
+            })
+        return info
+
+
+class CustomTagFileParser(FileParserBase):
+    """
+    Parser CustomTag
+    标引文件：每个叶子标签一项，引用页面对象时记录 ObjectRef
+    [{"name": 去掉命名空间前缀的标签名, "path": 自根节点起的标签路径, "value": 标签文本,
+      "refs": [{"PageRef": 页面 ID, "ObjectID": 页面对象 ID}]}]
+    """
+
+    @staticmethod
+    def _local_name(key):
+        return key.split(":", 1)[-1]
+
+    def _walk(self, node, path, out):
+        if isinstance(node, list):
+            for cell in node:
+                self._walk(cell, path, out)
+            return
+        if not isinstance(node, dict):
+            out.append({"name": path[-1], "path": "/".join(path), "value": _text(node), "refs": []})
+            return
+        refs = node.get("ofd:ObjectRef")
+        children = [(k, v) for k, v in node.items()
+                    if not k.startswith("@") and k not in ("#text", "ofd:ObjectRef")]
+        if refs is not None or not children:
+            refs = refs if isinstance(refs, list) else [refs] if refs is not None else []
+            out.append({
+                "name": path[-1],
+                "path": "/".join(path),
+                "value": _text(node),
+                "refs": [{"PageRef": ref.get("@PageRef") if isinstance(ref, dict) else None,
+                          "ObjectID": _text(ref)} for ref in refs],
+            })
+        for key, value in children:
+            self._walk(value, path + [self._local_name(key)], out)
+
+    def __call__(self):
+        out = []
+        for key, value in self.xml_obj.items():
+            if not key.startswith("@"):
+                self._walk(value, [self._local_name(key)], out)
+        return out
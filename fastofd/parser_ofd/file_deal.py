@@ -17,6 +17,61 @@ import re
 from loguru import logger
 
 from .path_parser import PathParser
+from fastofd.stats import resolve
+
+
+def decode_xml(data: bytes, name: str = "") -> str:
+    """xml 字节按声明或常见编码解码，均失败时按 latin-1 忽略错误解码"""
+    enc = None
+    head = data[:512]
+    m = re.search(br'encoding=["\']([A-Za-z0-9_\-]+)["\']', head)
+    if m:
+        try:
+            enc = m.group(1).decode('ascii', 'ignore').lower()
+        except Exception:
+            enc = None
+    candidates = []
+    if enc:
+        candidates.append(enc)
+    candidates += ['utf-8', 'gbk', 'gb2312', 'big5', 'utf-16', 'utf-16le', 'utf-16be']
+    tried = set()
+    for codec in candidates:
+        if codec in tried:
+            continue
+        tried.add(codec)
+        try:
+            return data.decode(codec)
+        except UnicodeDecodeError:
+            continue
+        except Exception:
+            continue
+    logger.warning(f"XML decode fallback latin-1 for {name}")
+    return data.decode('latin-1', errors='ignore')
+
+
+class ZipResource(object):
+    """
+    延迟读取的 ofd 资源文件（图片、签章值、字体），只记录 ofd 文件路径与 zip 成员名
+    FileRead(path=...) 时代替 base64 字符串放入解析结果，使用方需要时再读取；读取前 ofd 文件不能移动或修改
+    """
+    __slots__ = ("zip_path", "name")
+
+    def __init__(self, zip_path: str, name: str):
+        self.zip_path = zip_path
+        self.name = name
+
+    def read(self, zip_file: zipfile.ZipFile = None) -> bytes:
+        """zip_file: 已打开的同一个 ofd，连续读取多个资源时复用，省去每次解析 zip 目录"""
+        if zip_file is not None:
+            return zip_file.read(self.name)
+        with zipfile.ZipFile(self.zip_path, 'r') as f:
+            return f.read(self.name)
+
+    def b64(self, zip_file: zipfile.ZipFile = None) -> str:
+        return str(base64.b64encode(self.read(zip_file)), "utf-8")
+
+    def __repr__(self):
+        return f"ZipResource({self.zip_path!r}, {self.name!r})"
 
 
 class FileRead(object):
@@ -25,11 +80,13 @@ class FileRead(object):
     'root': OFD.xml 
     "root_doc" Doc_0/Document.xml
     xml_path : xml_obj
-    other_path : b64string
+    other_path : b64string，path 模式下为 ZipResource
     """
-    def __init__(self, ofdb64:str):
-
-        self.ofdbyte = base64.b64decode(ofdb64) 
+    def __init__(self, ofdb64:str, stats=None, path=None):
+        """path: ofd 文件路径，指定时忽略 ofdb64，直接按路径读取 zip，不整体读入内存、不解压到磁盘"""
+        self.path = os.path.abspath(path) if path else None
+        self.ofdbyte = None if self.path else base64.b64decode(ofdb64)
+        self.stats = resolve(stats)
         pid=os.getpid()
         self.name = f"{pid}_{str(uuid1())}.ofd"
         self.pdf_name = self.name.replace(".ofd",".pdf")
@@ -63,31 +120,7 @@ class FileRead(object):
         except Exception as e:
             logger.error(f"read xml file error {abs_path}: {e}")
             return ""
-        enc = None
-        head = data[:512]
-        m = re.search(br'encoding=["\']([A-Za-z0-9_\-]+)["\']', head)
-        if m:
-            try:
-                enc = m.group(1).decode('ascii', 'ignore').lower()
-            except Exception:
-                enc = None
-        candidates = []
-        if enc:
-            candidates.append(enc)
-        candidates += ['utf-8', 'gbk', 'gb2312', 'big5', 'utf-16', 'utf-16le', 'utf-16be']
-        tried = set()
-        for codec in candidates:
-            if codec in tried:
-                continue
-            tried.add(codec)
-            try:
-                return data.decode(codec)
-            except UnicodeDecodeError:
-                continue
-            except Exception:
-                continue
-        logger.warning(f"XML decode fallback latin-1 for {abs_path}")
-        return data.decode('latin-1', errors='ignore')
+        return decode_xml(data, abs_path)
 
     def buld_file_tree(self):
         "xml读取对象其他b64"
@@ -108,12 +141,47 @@ class FileRead(object):
         if os.path.exists(self.zip_path):
             os.remove(self.zip_path)
                    
+    def build_lazy_tree(self):
+        """path 模式：xml 直接从 zip 读取解析，其余资源文件只记录为 ZipResource"""
+        # 与解压模式相同的虚拟根目录，仅用于路径匹配，不在磁盘上创建
+        root = self.zip_path.split('.')[0]
+        self.file_tree["root"] = root
+        self.file_tree["pdf_name"] = self.pdf_name
+        with zipfile.ZipFile(self.path, 'r') as f:
+            for info in f.infolist():
+                if info.is_dir():
+                    continue
+                abs_path = os.path.join(root, *[i for i in info.filename.replace("\\", "/").split("/") if i])
+                self.file_tree[abs_path] = ZipResource(self.path, info.filename) \
+                    if "xml" not in os.path.basename(abs_path) else xmltodict.parse(decode_xml(f.read(info), abs_path))
+            if self.save_xml:
+                print("saving xml {}".format(self.xml_name))
+                f.extractall(path=self.xml_name)
+        root_doc = os.path.join(root, "OFD.xml")
+        self.file_tree["root_doc"] = root_doc if root_doc in self.file_tree else ""
+
     def __call__(self, *args: Any, **kwds: Any) -> Any:
         self.save_xml=kwds.get("save_xml",False)
         self.xml_name=kwds.get("xml_name")
-    
-        self.unzip_file()
-        self.buld_file_tree()
+
+        if self.path:
+            self.stats.incr("bytes_in", os.path.getsize(self.path))
+            with self.stats.stage("xml_parse"):
+                self.build_lazy_tree()
+            return self.file_tree
+
+        self.stats.incr("bytes_in", len(self.ofdbyte))
+        try:
+            with self.stats.stage("unzip"):
+                self.unzip_file()
+            with self.stats.stage("xml_parse"):
+                self.buld_file_tree()
+        finally:
+            # 损坏文件解压失败时同样清理临时文件
+            if self.unzip_path and os.path.exists(self.unzip_path):
+                shutil.rmtree(self.unzip_path)
+            if os.path.exists(self.zip_path):
+                os.remove(self.zip_path)
         return self.file_tree 
 
 if __name__ == "__main__":
@@ -53,9 +53,15 @@ class DocumentFileParser(FileParserBase):
         tpls: list = []
         template_page_key = "ofd:TemplatePage"
         self.recursion_ext(self.xml_obj, tpls, template_page_key)
+        tpl_id_map = {}
+        tpl_zorder = {}  # {BaseLoc: ZOrder}，页面引用未指定 ZOrder 时使用
         if tpls:
+            tpl_id_map = {i.get("@ID"): i.get("@BaseLoc") for i in tpls if isinstance(i, dict)}
+            tpl_zorder = {i.get("@BaseLoc"): i.get("@ZOrder") for i in tpls if isinstance(i, dict) and i.get("@ZOrder")}
             tpls = [i.get("@BaseLoc") if isinstance(i, dict) else i for i in tpls]
         document_info["tpls"] = tpls
+        document_info["tpl_id_map"] = tpl_id_map
+        document_info["tpl_zorder"] = tpl_zorder
 
         # ofd:Page 正文
         page: list = []
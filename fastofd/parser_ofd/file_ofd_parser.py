@@ -38,4 +38,12 @@ class OFDFileParser(FileParserBase):
         self.recursion_ext(self.xml_obj, reation_date, creation_date_key)
         info["creationDate"] = reation_date
 
+        # ofd:CustomData 自定义元数据 {Name: 值}
+        custom_data: list = []
+        custom_data_key = "ofd:CustomData"
+        self.recursion_ext(self.xml_obj, custom_data, custom_data_key)
+        info["custom_datas"] = {
+            i.get("@Name"): (i.get("#text") or "").strip() for i in custom_data if isinstance(i, dict)
+        }
+
         return info
\ No newline at end of file
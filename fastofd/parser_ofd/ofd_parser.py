@@ -19,7 +19,7 @@ from PIL.Image import Image as ImageClass
 from loguru import logger
 
 from .img_deal import DealImg
-from .file_deal import FileRead
+from .file_deal import FileRead, ZipResource
 from .file_ofd_parser import OFDFileParser
 from .file_doc_parser import DocumentFileParser
 from .file_docres_parser import DocumentResFileParser
@@ -28,8 +28,12 @@ from .file_annotation_parser import AnnotationFileParser,AnnotationsParser
 from .file_publicres_parser import PublicResFileParser
 from .file_signature_parser import SignaturesFileParser,SignatureFileParser
 from .path_parser import PathParser
+from fastofd.stats import resolve
 # todo 解析流程需要大改
 
+PARSER_VERSION = 5  # 解析结果结构变化时递增，DocumentCache 中的旧结果随之失效
+TRANSCODE_SUFFIXES = ('jb2', 'bmp', 'tif', 'gif')  # 绘制前需要转成 jpg / png 的图片格式
+
 
 class OFDParser(object):
     """
@@ -41,9 +45,15 @@ class OFDParser(object):
     图层顺序 tlp>content>annotation
     """
 
-    def __init__(self, ofdb64):
+    def __init__(self, ofdb64, stats=None, path=None):
+        """
+        path: ofd 文件路径，指定时忽略 ofdb64 直接读取文件；图片、签章值、字体不读入内存，
+        解析结果中 imgb64 / SignedValue / font_b64 为 ZipResource，图片用 load_image 读取并转码
+        """
         self.img_deal = DealImg()
+        self.stats = resolve(stats)
         self.ofdb64 = ofdb64
+        self.path = path
         self.file_tree = None
         self.jbig2dec_path = r"C:/msys64/mingw64/bin/jbig2dec.exe"
 
@@ -115,6 +125,30 @@ class OFDParser(object):
         # logger.info(f"{label} ofd file path is not")
         return ""
 
+    @staticmethod
+    def page_template_ids(page_xml_obj) -> list:
+        """页面 ofd:Template 引用，[(模板 ID, ZOrder)]，未指定 ZOrder 时为 None"""
+        if not page_xml_obj:
+            return []
+        tpl_refs = page_xml_obj.get("ofd:Page", {}).get("ofd:Template") or []
+        if isinstance(tpl_refs, dict):
+            tpl_refs = [tpl_refs]
+        return [(i.get("@TemplateID"), i.get("@ZOrder")) for i in tpl_refs
+                if isinstance(i, dict) and i.get("@TemplateID")]
+
+    @staticmethod
+    def merge_page_info(page_info: dict, tpls: list):
+        """
+        模板内容合并进页面，列表顺序即绘制顺序，不重新排序
+        tpls: [(模板解析结果, ZOrder)]，按引用顺序叠放；
+        ZOrder 为 Foreground 的模板在页面内容之后（上层），其余（Background，默认）在之前
+        """
+        for key in ("text_list", "img_list", "line_list"):
+            background, foreground = [], []
+            for tpl_info, zorder in tpls:
+                (foreground if zorder == "Foreground" else background).extend(tpl_info.get(key) or [])
+            page_info[key] = background + (page_info.get(key) or []) + foreground
+
     def jb22png(self, img_d: dict):
         """
         jb22png
@@ -150,8 +184,7 @@ class OFDParser(object):
 
         fileName = img_d["fileName"]
         new_fileName = img_d['fileName'].replace(".bmp", ".jpg")
-        b64_nmp = self.get_xml_obj(fileName)
-        image_data = base64.b64decode(b64_nmp)
+        image_data = base64.b64decode(img_d["imgb64"])
         image = Image.open(io.BytesIO(image_data))
         rgb_image = image.convert("RGB")
         output_buffer = io.BytesIO()
@@ -171,8 +204,7 @@ class OFDParser(object):
     def tif2jpg(self, img_d: dict):
         fileName = img_d["fileName"]
         new_fileName = img_d['fileName'].replace(".tif", ".jpg")
-        tif_nmp = self.get_xml_obj(fileName)
-        image_data = base64.b64decode(tif_nmp)
+        image_data = base64.b64decode(img_d["imgb64"])
         image = Image.open(io.BytesIO(image_data))
         if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
             image = image.convert("RGB")
@@ -201,8 +233,7 @@ class OFDParser(object):
     def gif2jpg(self, img_d: dict):
         fileName = img_d["fileName"]
         new_fileName = img_d['fileName'].replace(".bmp", ".jpg")
-        b64_gif = self.get_xml_obj(fileName)
-        image_data = base64.b64decode(b64_gif)
+        image_data = base64.b64decode(img_d["imgb64"])
         image = Image.open(io.BytesIO(image_data))
         if image.mode != "RGB":
             image = image.convert("RGB")
@@ -220,6 +251,21 @@ class OFDParser(object):
             img_d["format"] = "jpg"
             img_d["imgb64"] = b64_jpeg
 
+    def transcode(self, img_d: dict):
+        """jb2 / bmp / tif / gif 转为可绘制的 png / jpg，原地修改 img_d"""
+        if img_d["suffix"] not in TRANSCODE_SUFFIXES:
+            return
+        with self.stats.stage("image_transcode"):
+            self.stats.incr("images_transcoded")
+            if img_d["suffix"] == 'jb2':
+                self.jb22png(img_d)
+            elif img_d["suffix"] == 'bmp':
+                self.bmp2jpg(img_d)
+            elif img_d["suffix"] == 'tif':
+                self.tif2jpg(img_d)
+            elif img_d["suffix"] == 'gif':
+                self.gif2jpg(img_d)
+
     def parser(self, ):
         """
         解析流程
@@ -236,10 +282,13 @@ class OFDParser(object):
             ofd_obj_res = OFDFileParser(ofd_xml_obj)()
             doc_root_name = ofd_obj_res.get("doc_root")
             signatures = ofd_obj_res.get("signatures")
+            creator = ofd_obj_res.get("creator")
+            creation_date = ofd_obj_res.get("creationDate")
         else:
             # 考虑根节点丢失情况
             doc_root_name = ["Doc_0/Document.xml"]
             signatures = ["Doc_0/Signs/Signatures.xml"]
+            creator, creation_date = [], []
 
         doc_root_xml_obj = self.get_xml_obj(doc_root_name[0])
         doc_root_info = DocumentFileParser(doc_root_xml_obj)()
@@ -277,21 +326,17 @@ class OFDParser(object):
             for img_id, img_v in img_info.items():
                 img_v["imgb64"] = self.get_xml_obj(img_v.get("fileName"))
                 # todo ib2 转png C:/msys64/mingw64/bin/jbig2dec.exe -o F:\code\easyofd\test\image_80.png F:\code\easyofd\test\image_80.jb2
-                if img_v["suffix"] == 'jb2':
-                    self.jb22png(img_v)
-                elif img_v["suffix"] == 'bmp':
-                    self.bmp2jpg(img_v)
-                elif img_v["suffix"] == 'tif':
-                    self.tif2jpg(img_v)
-                elif img_v["suffix"] == 'gif':
-                    self.gif2jpg(img_v)
+                # 延迟读取的图片在 load_image 时再转码
+                if not isinstance(img_v["imgb64"], ZipResource):
+                    self.transcode(img_v)
 
         page_id_map: list = doc_root_info.get("page_id_map")
         signatures_page_id = {}
+        seals = {}  # {SignedValue 路径: {"SignedValue": b64}}
 
         # 签章信息
         if signatures and (signatures_xml_obj := self.get_xml_obj(signatures[0])):
-            logger.debug(f"signatures_xml_obj is {signatures_xml_obj } signatures is {signatures} ")
+            logger.debug("signatures_xml_obj is {} signatures is {}", signatures_xml_obj, signatures)
             signatures_overview = SignaturesFileParser(signatures_xml_obj)()
             if signatures_overview:  # 获取签章具体信息
                 for _, signatures_cell in signatures_overview.items():
@@ -302,7 +347,7 @@ class OFDParser(object):
                     prefix = BaseLoc.split("/")[0]
                     signatures_list = SignatureFileParser(signature_xml_obj)(prefix=prefix)
                     # print(signatures_list)
-                    logger.debug(f"signatures_list {signatures_list}")
+                    logger.debug("signatures_list {}", signatures_list)
                     
                     # 遍历处理每个签章信息
                     for signature_info in signatures_list:
@@ -315,36 +360,29 @@ class OFDParser(object):
                         # print(SignedValue, self.get_xml_obj(SignedValue))
                         # with open("b64.txt","w") as f:
                         #     f.write(self.get_xml_obj(SignedValue))
-                        if signatures_page_id.get(sing_page_no):
-                            signatures_page_id[sing_page_no].append(
-                                {
-                                    "sing_page_no": sing_page_no,
-                                    "PageRef": PageRef,
-                                    "Boundary": Boundary,
-                                    "SignedValue": self.get_xml_obj(SignedValue),
-                                }
-                            )
-                        else:
-                            signatures_page_id[sing_page_no] = [
-                                {
-                                    "sing_page_no": sing_page_no,
-                                    "PageRef": PageRef,
-                                    "Boundary": Boundary,
-                                    "SignedValue": self.get_xml_obj(SignedValue),
-                                }
-                            ]
+                        # 同一签章值（如骑缝章）在多页出现时只保存一份，各页通过 SealRef 引用
+                        if SignedValue not in seals:
+                            seals[SignedValue] = {"SignedValue": self.get_xml_obj(SignedValue)}
+                        signatures_page_id.setdefault(sing_page_no, []).append(
+                            {
+                                "sing_page_no": sing_page_no,
+                                "PageRef": PageRef,
+                                "Boundary": Boundary,
+                                "SealRef": SignedValue,
+                            }
+                        )
 
         # 注释信息 按照页码信息
         annotation_info = {}
         annotations_name: list = doc_root_info.get("Annotations") #获取到入口文件
-        logger.debug(f"annotations_name is {annotations_name}")
+        logger.debug("annotations_name is {}", annotations_name)
         if annotations_name and (annotations_xml_obj:= self.get_xml_obj(annotations_name[0])) : # and False
             # TODO 注释解析
             
             try:
                 annotations_info = AnnotationsParser(annotations_xml_obj)()
                 if annotations_info:
-                    logger.debug(f"annotations_info is {annotations_info}")
+                    logger.debug("annotations_info is {}", annotations_info)
                     for page_id, annotations_cell in annotations_info.items():
                         file_loc = annotations_cell.get("FileLoc")
                         anno_page_no = annotations_cell.get("pageNo")
@@ -352,10 +390,10 @@ class OFDParser(object):
                             annotation_xml_obj = self.get_xml_obj(file_loc)
                             if annotation_xml_obj:
                                 # 解析注释文件
-                                logger.debug(f"annotation_xml_obj is {annotation_xml_obj}")
+                                logger.debug("annotation_xml_obj is {}", annotation_xml_obj)
                                 annotation_page_info = AnnotationFileParser(annotation_xml_obj)()
                                 annotation_info[anno_page_no] = annotation_page_info
-                logger.debug(f"annotation_info is {annotation_info}")
+                logger.debug("annotation_info is {}", annotation_info)
             except Exception as e:
                 logger.error(f"AnnotationFileParser error  {e}")
                 
@@ -367,6 +405,7 @@ class OFDParser(object):
         page_name: list = doc_root_info.get("page")
 
         page_info_d = {}
+        page_tpl_ids = {}  # {页码: [引用的模板 ID]}
         if page_name:
             for index, _page in enumerate(page_name):
                 page_xml_obj = self.get_xml_obj(_page)
@@ -390,34 +429,30 @@ class OFDParser(object):
                 else:
                     pg_no = index
                 page_info_d[pg_no] = page_info
+                page_tpl_ids[pg_no] = self.page_template_ids(page_xml_obj)
 
-        # 模板信息
+        # 模板信息 按页面 ofd:Template 引用合并到对应页面，一个模板只解析一次
         tpls_name: list = doc_root_info.get("tpls")
         if tpls_name:
-            for index, _tpl in enumerate(tpls_name):
+            tpl_id_map: dict = doc_root_info.get("tpl_id_map") or {}
+            tpl_zorder: dict = doc_root_info.get("tpl_zorder") or {}
+            tpl_infos = {}
+            for _tpl in tpls_name:
                 tpl_xml_obj = self.get_xml_obj(_tpl)
-                tpl_info = ContentFileParser(tpl_xml_obj)()
-                tpl_no = re.search(r"\d+", _tpl)
-
-                if tpl_no:
-                    tpl_no = int(tpl_no.group())
-                else:
-                    tpl_no = index
-
-                if tpl_no in page_info_d:
-                    page_info_d[pg_no]["text_list"].extend(tpl_info["text_list"])
-                    page_info_d[pg_no]["text_list"].sort(
-                        key=lambda pos_text: (float(pos_text.get("pos")[1]), float(pos_text.get("pos")[0])))
-                    page_info_d[pg_no]["img_list"].extend(tpl_info["img_list"])
-                    page_info_d[pg_no]["img_list"].sort(
-                        key=lambda pos_text: (float(pos_text.get("pos")[1]), float(pos_text.get("pos")[0])))
-                    page_info_d[pg_no]["line_list"].extend(tpl_info["line_list"])
-                    page_info_d[pg_no]["line_list"].sort(
-                        key=lambda pos_text: (float(pos_text.get("pos")[1]), float(pos_text.get("pos")[0])))
-                else:
-                    page_info_d[tpl_no] = tpl_info
-                    page_info_d[tpl_no].sort(
-                        key=lambda pos_text: (float(pos_text.get("pos")[1]), float(pos_text.get("pos")[0])))
+                if tpl_xml_obj:
+                    tpl_infos[_tpl] = ContentFileParser(tpl_xml_obj)()
+            merged = False
+            for pg_no, tpl_ids in page_tpl_ids.items():
+                tpls = [(tpl_infos[tpl_id_map.get(tpl_id)], zorder or tpl_zorder.get(tpl_id_map.get(tpl_id)))
+                        for tpl_id, zorder in tpl_ids if tpl_id_map.get(tpl_id) in tpl_infos]
+                if tpls and pg_no in page_info_d:
+                    self.merge_page_info(page_info_d[pg_no], tpls)
+                    merged = True
+            # 所有页面都没有声明引用（不规范文件）时，按文档公共模板合并到每一页
+            if not merged:
+                tpls = [(tpl_info, tpl_zorder.get(tpl_loc)) for tpl_loc, tpl_info in tpl_infos.items()]
+                for page_info in page_info_d.values():
+                    self.merge_page_info(page_info, tpls)
         docNo = 0  # 没遇到过doc多个的情况 出现再看
         # print("page_info",len(page_info))
         doc_list.append({
@@ -427,9 +462,12 @@ class OFDParser(object):
             "doc_no": docNo,
             "images": img_info,
             "signatures_page_id": signatures_page_id,
+            "seals": seals,
             "annotation_info": annotation_info,
             "page_id_map": page_id_map,
             "fonts": font_info,
+            "creator": creator[0] if creator and isinstance(creator[0], str) else "",
+            "creation_date": creation_date[0] if creation_date and isinstance(creation_date[0], str) else "",
             "page_info": page_info_d,
             "page_tpl_info": page_info_d,
             "page_content_info": page_info_d,
@@ -443,9 +481,23 @@ class OFDParser(object):
         """
         save_xml = kwargs.get("save_xml", False)
         xml_name = kwargs.get("xml_name")
-        self.file_tree = FileRead(self.ofdb64)(save_xml=save_xml, xml_name=xml_name)
+        self.file_tree = FileRead(self.ofdb64, stats=self.stats, path=self.path)(save_xml=save_xml, xml_name=xml_name)
         # logger.info(self.file_tree)
-        return self.parser()
+        with self.stats.stage("parse"):
+            return self.parser()
+
+
+def load_image(img_v: dict, zip_file=None, stats=None) -> dict:
+    """
+    读取 OFDParser(path=...) 延迟的图片资源并按需转码，返回新的资源字典，不修改解析结果
+    imgb64 已是 base64 的原样返回；zip_file 同 ZipResource.read
+    """
+    resource = img_v.get("imgb64")
+    if not isinstance(resource, ZipResource):
+        return img_v
+    img_d = dict(img_v, imgb64=resource.b64(zip_file))
+    OFDParser(None, stats=stats).transcode(img_d)
+    return img_d
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 23:20
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: ofd 包按需读取：zip 成员不解压到磁盘，只读用到的 xml
+import io
+import posixpath
+import zipfile
+
+import xmltodict
+from loguru import logger
+
+from .file_deal import decode_xml
+
+
+class OFDPackage(object):
+    """
+    ofd 包内文件按需读取，供只解析部分结构的解析器共用（签章、附件、自定义标引）
+    """
+
+    def __init__(self, ofd_bytes: bytes):
+        self.zip_file = zipfile.ZipFile(io.BytesIO(ofd_bytes))
+        self.names = {name.lstrip("/"): name for name in self.zip_file.namelist()}
+
+    def _resolve(self, loc, base=""):
+        """
+        loc 转为 zip 成员名：以 / 开头为包内绝对路径，否则先按所在文件目录解析，
+        再按包根目录解析，最后按路径段后缀匹配（兼容不规范的路径，image.png 不会匹配 myimage.png）；
+        后缀匹配到多个成员时优先 base 目录下、路径最短的
+        """
+        if not loc:
+            return None
+        loc = loc.strip().replace("\\", "/")
+        candidates = [posixpath.normpath(loc.lstrip("/"))]
+        if not loc.startswith("/") and base:
+            candidates.insert(0, posixpath.normpath(posixpath.join(base, loc)))
+        for name in candidates:
+            if name in self.names:
+                return self.names[name]
+        # 去掉开头的 ../ 与 ./ 段，按完整路径段匹配
+        parts = candidates[-1].split("/")
+        while parts and parts[0] in ("..", ".", ""):
+            parts.pop(0)
+        if not parts:
+            return None
+        suffix = "/".join(parts)
+        matches = [name for name in self.names if name == suffix or name.endswith("/" + suffix)]
+        if not matches:
+            return None
+        prefix = base.rstrip("/") + "/" if base else ""
+        return self.names[min(matches, key=lambda name: (not name.startswith(prefix), len(name), name))]
+
+    def _read(self, loc, base=""):
+        name = self._resolve(loc, base)
+        if name is None:
+            logger.warning(f"ofd 中找不到 {loc}")
+            return None, None
+        return self.zip_file.read(name), name
+
+    def _read_xml(self, loc, base=""):
+        data, name = self._read(loc, base)
+        if data is None:
+            return None, None
+        return xmltodict.parse(decode_xml(data, name)), name
+
+    def close(self):
+        self.zip_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
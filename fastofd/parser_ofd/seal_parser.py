@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 20:30
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 只解析签章，不解压、不解析页面内容与字体
+import io
+import posixpath
+
+from .file_doc_parser import DocumentFileParser
+from .file_ofd_parser import OFDFileParser
+from .file_parser_base import FileParserBase
+from .file_signature_parser import SignaturesFileParser, SignatureFileParser
+from .package import OFDPackage
+
+
+class SealParser(OFDPackage):
+    """
+    签章快速解析
+    OFD.xml > Document.xml（只取页面 ID 映射）> Signatures.xml > Signature.xml > SignedValue，
+    zip 成员按需读取，页面、模板、资源、字体均不读取
+    """
+
+    @staticmethod
+    def _signer_info(signature_xml_obj):
+        """签章人/签章时间等元数据"""
+        parser = FileParserBase(signature_xml_obj)
+        info = {}
+        for key, xml_key in (("provider", "ofd:Provider"), ("signature_method", "ofd:SignatureMethod"),
+                             ("signature_datetime", "ofd:SignatureDateTime"), ("seal_loc", "ofd:Seal")):
+            values = []
+            parser.recursion_ext(signature_xml_obj, values, xml_key)
+            value = values[0] if values else None
+            if isinstance(value, dict):
+                if xml_key == "ofd:Provider":
+                    value = {k.lstrip("@"): v for k, v in value.items() if k.startswith("@")}
+                else:
+                    value = value.get("ofd:BaseLoc") or value.get("#text")
+            info[key] = value
+        return info
+
+    @staticmethod
+    def _encode_image(image, image_format):
+        if image_format == "png":
+            buf = io.BytesIO()
+            image.save(buf, format="PNG")
+            return buf.getvalue()
+        return image
+
+    def __call__(self, image_format="pil"):
+        """
+        返回签章列表，每个签章位置一项：
+        {"doc_no", "page", "page_id", "boundary": [x, y, w, h]（毫米）, "signature_id", "signature_type",
+         "signature_loc", "provider", "signature_method", "signature_datetime", "seal_loc", "seal_ref", "image"}
+        image_format: "pil" 返回 PIL 图片，"png" 返回 png 字节，None 不读取签章值、不提取图片
+        同一签章值（骑缝章）只提取一次，各页共享同一图片对象
+        """
+        from fastofd.draw.find_seal_img import SealExtract
+
+        assert image_format in ("pil", "png", None), f"image_format Error: {image_format}"
+        ofd_xml_obj, _ = self._read_xml("OFD.xml")
+        if not ofd_xml_obj:
+            return []
+        ofd_info = OFDFileParser(ofd_xml_obj)()
+        doc_roots = ofd_info.get("doc_root") or []
+        signatures_locs = ofd_info.get("signatures") or []
+
+        seals = []
+        images = {}  # {SignedValue 成员名: 图片}
+        for doc_no, signatures_loc in enumerate(signatures_locs):
+            signatures_xml_obj, signatures_name = self._read_xml(signatures_loc)
+            if not signatures_xml_obj:
+                continue
+            page_id_map = {}
+            if doc_no < len(doc_roots):
+                doc_xml_obj, _ = self._read_xml(doc_roots[doc_no])
+                if doc_xml_obj:
+                    page_id_map = DocumentFileParser(doc_xml_obj)().get("page_id_map") or {}
+
+            signatures_base = posixpath.dirname(signatures_name)
+            for signature_cell in (SignaturesFileParser(signatures_xml_obj)() or {}).values():
+                signature_xml_obj, signature_name = self._read_xml(signature_cell.get("BaseLoc"), signatures_base)
+                if not signature_xml_obj:
+                    continue
+                signature_base = posixpath.dirname(signature_name)
+                signer_info = self._signer_info(signature_xml_obj)
+                for stamp in SignatureFileParser(signature_xml_obj)(prefix=""):
+                    # SignatureFileParser 拼接了 prefix，这里按 Signature.xml 所在目录重新解析
+                    signed_value_loc = stamp.get("SignedValue", "").lstrip("/")
+                    signed_value_name = self._resolve(signed_value_loc, signature_base)
+                    image = None
+                    if image_format and signed_value_name:
+                        if signed_value_name not in images:
+                            extracted = SealExtract()(data=self.zip_file.read(signed_value_name))
+                            images[signed_value_name] = \
+                                self._encode_image(extracted[0], image_format) if extracted else None
+                        image = images[signed_value_name]
+                    boundary = stamp.get("Boundary")
+                    seals.append(dict({
+                        "doc_no": doc_no,
+                        "page": page_id_map.get(stamp.get("PageRef")),
+                        "page_id": stamp.get("PageRef"),
+                        "boundary": [float(i) for i in boundary.split()] if boundary else [],
+                        "signature_id": signature_cell.get("ID"),
+                        "signature_type": signature_cell.get("Type"),
+                        "signature_loc": signature_name,
+                        "seal_ref": signed_value_name,
+                        "image": image,
+                    }, **signer_info))
+        return seals
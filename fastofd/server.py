@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 18:20
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 本地 http 转换服务 fastofd serve
+import json
+import queue
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+
+from fastofd.cache import ConversionCache, content_hash
+from fastofd.supervisor import SupervisedWorker
+
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "zip": "application/zip",
+    "text": "text/plain; charset=utf-8",
+}
+RENDER_MODES = ("line", "char")
+COLORSPACES = ("rgb", "gray", "mono")
+
+
+def warmup():
+    """子进程预热：完成导入并加载默认中文字体，首个请求不再承担这部分开销"""
+    from reportlab.pdfgen import canvas
+    from fastofd.ofd import OFD
+
+    OFD()
+    c = canvas.Canvas(BytesIO())
+    c.setFont("STSong-Light", 10)
+    c.drawString(0, 0, "预热")
+    c.save()
+
+
+def convert_job(ofd_bytes, params):
+    """
+    子进程任务，返回 (body, 类型, 各阶段耗时)
+    params: to(pdf|jpg|png|text) page_list render_mode with_signature dpi colorspace quality
+    """
+    from fastofd.draw.draw_img import DrawImage, RasterOptions
+    from fastofd.ofd import OFD
+
+    timings = {}
+    start = time.time()
+    ofd = OFD()
+    ofd.read(ofd_bytes, fmt="binary")
+    timings["parse"] = time.time() - start
+    to = params["to"]
+    if to == "text":
+        return ofd.extract_text(page_list=params["page_list"]).encode("utf-8"), "text", timings
+
+    start = time.time()
+    pdfbytes = ofd.to_pdf(render_mode=params["render_mode"], page_list=params["page_list"],
+                          with_signature=params["with_signature"])
+    timings["render"] = time.time() - start
+    if to == "pdf":
+        return pdfbytes, "pdf", timings
+
+    start = time.time()
+    options = RasterOptions(dpi=params["dpi"], colorspace=params["colorspace"],
+                            fmt="jpeg" if to == "jpg" else "png", quality=params["quality"])
+    images = DrawImage(pdfbytes, options=options)()
+    timings["rasterize"] = time.time() - start
+    if len(images) == 1:
+        return images[0], to, timings
+    # 多页图片打包为 zip，已压缩的图片只存储不再压缩
+    zip_io = BytesIO()
+    with zipfile.ZipFile(zip_io, "w", compression=zipfile.ZIP_STORED) as zf:
+        for idx, image in enumerate(images):
+            zf.writestr(f"page_{idx}.{options.suffix}", image)
+    return zip_io.getvalue(), "zip", timings
+
+
+class Metrics(object):
+    """Prometheus 文本格式指标：计数器、仪表与直方图"""
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}  # name -> 取值函数
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.setdefault(key, {"buckets": [0] * len(self.BUCKETS), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def gauge(self, name, func):
+        self.gauges[name] = func
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        items = list(labels) + list(extra)
+        if not items:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, func in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {func()}")
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{self._labels(labels)} {value}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                for bound, count in zip(self.BUCKETS, hist["buckets"]):
+                    lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {hist['count']}")
+                lines.append(f"{name}_sum{self._labels(labels)} {round(hist['sum'], 6)}")
+                lines.append(f"{name}_count{self._labels(labels)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class _Job(object):
+    def __init__(self, ofd_bytes, params):
+        self.ofd_bytes = ofd_bytes
+        self.params = params
+        self.reply = None
+        self.done = threading.Event()
+        self.enqueued = time.time()
+
+
+class ConvertService(object):
+    """
+    转换服务核心：有界任务队列 + workers 个预热的受监管子进程
+    队列满时 convert 直接返回 429，不阻塞请求线程
+    """
+
+    def __init__(self, workers=2, queue_size=16, timeout=120, memory_limit_mb=None, max_jobs=200,
+                 cache: ConversionCache = None):
+        self.timeout = timeout
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.cache = cache
+        self.metrics = Metrics()
+        self.busy = 0
+        self._busy_lock = threading.Lock()
+        self.workers = [SupervisedWorker(timeout=timeout, memory_limit_mb=memory_limit_mb, max_jobs=max_jobs,
+                                         initializer=warmup) for _ in range(workers)]
+        self.threads = []
+        self.metrics.gauge("fastofd_queue_depth", self.jobs.qsize)
+        self.metrics.gauge("fastofd_queue_capacity", lambda: self.jobs.maxsize)
+        self.metrics.gauge("fastofd_workers_busy", lambda: self.busy)
+        self.metrics.gauge("fastofd_workers", lambda: len(self.workers))
+        self.metrics.gauge("fastofd_worker_restarts", lambda: sum(w.restarts for w in self.workers))
+
+    def start(self):
+        for idx, worker in enumerate(self.workers):
+            worker.start()  # 启动即预热，不等第一个请求
+            thread = threading.Thread(target=self._dispatch, args=(worker,), name=f"fastofd-dispatch-{idx}",
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        for worker in self.workers:
+            worker.stop()
+
+    def _dispatch(self, worker):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            self.metrics.observe("fastofd_stage_seconds", time.time() - job.enqueued, stage="queue")
+            with self._busy_lock:
+                self.busy += 1
+            try:
+                job.reply = worker.run(convert_job, job.ofd_bytes, job.params)
+            finally:
+                with self._busy_lock:
+                    self.busy -= 1
+                job.done.set()
+
+    def cache_key(self, ofd_bytes, params):
+        if self.cache is None:
+            return None
+        return self.cache.make_key(content_hash(ofd_bytes), "serve", **params)
+
+    def convert(self, ofd_bytes, params):
+        """
+        返回 (status, body, 类型)
+        命中缓存直接返回；队列满返回 429；子进程超时/崩溃返回 504/500
+        """
+        start = time.time()
+        key = self.cache_key(ofd_bytes, params)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.metrics.inc("fastofd_cache_hits_total")
+                body_type, body = cached.split(b"\n", 1)
+                return 200, body, body_type.decode()
+            self.metrics.inc("fastofd_cache_misses_total")
+
+        job = _Job(ofd_bytes, params)
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            return 429, "转换队列已满，请稍后重试".encode("utf-8"), "text"
+        job.done.wait()
+        reply = job.reply
+        self.metrics.observe("fastofd_request_seconds", time.time() - start, to=params["to"])
+        if reply["status"] != "ok":
+            logger.warning(f"转换失败 {reply['error_type']}: {reply['error']}")
+            status = 504 if reply["error_type"] == "timeout" else 422 if reply["error_type"] == "exception" else 500
+            body = json.dumps({"error_type": reply["error_type"], "error": reply["error"]}, ensure_ascii=False)
+            return status, body.encode("utf-8"), "json"
+        body, body_type, timings = reply["result"]
+        for stage, seconds in timings.items():
+            self.metrics.observe("fastofd_stage_seconds", seconds, stage=stage)
+        if key:
+            self.cache.set(key, body_type.encode() + b"\n" + body)
+        return 200, body, body_type
+
+
+def parse_params(query):
+    """查询参数 -> 转换参数"""
+    qs = {k: v[-1] for k, v in parse_qs(query).items()}
+    to = qs.get("to", "pdf")
+    assert to in ("pdf", "jpg", "png", "text"), f"to Error: {to}"
+    render_mode = qs.get("render_mode", "line")
+    assert render_mode in RENDER_MODES, f"render_mode Error: {render_mode}"
+    colorspace = qs.get("colorspace", "rgb")
+    assert colorspace in COLORSPACES, f"colorspace Error: {colorspace}"
+    assert not (colorspace == "mono" and to == "jpg"), "jpeg 不支持 1-bit 输出"
+    dpi, quality = int(qs.get("dpi", 144)), int(qs.get("quality", 85))
+    assert dpi > 0, f"dpi Error: {dpi}"
+    assert 0 < quality <= 100, f"quality Error: {quality}"
+    page_list = None
+    if qs.get("pages"):
+        page_list = [int(p) for p in qs["pages"].split(",") if p.strip()]
+    return {
+        "to": to,
+        "page_list": page_list,
+        "render_mode": render_mode,
+        "with_signature": qs.get("signature", "1") not in ("0", "false"),
+        "dpi": dpi,
+        "colorspace": colorspace,
+        "quality": quality,
+    }
+
+
+class ConvertHandler(BaseHTTPRequestHandler):
+    """
+    POST /convert?to=pdf|jpg|png|text&pages=0,1&dpi=144  请求体为 ofd 文件原始字节
+    GET /metrics  GET /healthz
+    """
+    service: ConvertService = None
+    max_body = 200 * 1024 * 1024
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send(self, status, body: bytes, body_type="text"):
+        self._status = status
+        self.send_response(status)
+        content_type = CONTENT_TYPES.get(body_type, "application/json; charset=utf-8")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            self._send(200, self.service.metrics.render().encode("utf-8"), "text")
+        elif path == "/healthz":
+            self._send(200, b"ok", "text")
+        else:
+            self._send(404, b"not found", "text")
+
+    def _reject(self, status, body: bytes):
+        """
+        未读取请求体就返回错误：关闭连接，
+        否则 keep-alive 下残留的请求体会被当作下一个请求解析
+        """
+        self.close_connection = True
+        self._send(status, body, "text")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self._status = None
+        try:
+            if url.path != "/convert":
+                self._reject(404, b"not found")
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length <= 0:
+                self._reject(400, "缺少请求体".encode("utf-8"))
+                return
+            if length > self.max_body:
+                self._reject(413, "文件过大".encode("utf-8"))
+                return
+            try:
+                params = parse_params(url.query)
+            except (AssertionError, ValueError) as e:
+                self._reject(400, str(e).encode("utf-8"))
+                return
+            ofd_bytes = self.rfile.read(length)
+            self._send(*self.service.convert(ofd_bytes, params))
+        finally:
+            self.service.metrics.inc("fastofd_requests_total", status=self._status or "error")
+
+
+def serve(host="127.0.0.1", port=8765, workers=2, queue_size=16, timeout=120, memory_limit_mb=None,
+          max_jobs=200, cache_mb=256):
+    """启动服务并阻塞，Ctrl+C 退出"""
+    cache = ConversionCache(max_items=256, max_memory_bytes=cache_mb * 1024 * 1024) if cache_mb else None
+    service = ConvertService(workers=workers, queue_size=queue_size, timeout=timeout,
+                             memory_limit_mb=memory_limit_mb, max_jobs=max_jobs, cache=cache)
+    service.start()
+    handler = type("BoundConvertHandler", (ConvertHandler,), {"service": service})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    logger.info(f"fastofd serve http://{host}:{port} workers={workers} queue={queue_size}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.stop()
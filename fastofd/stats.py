@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 19:40
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 转换过程统计：分阶段耗时、对象计数、输入输出字节
+import contextlib
+import time
+
+
+class ConversionStats(object):
+    """
+    单次转换的统计
+    stages: {阶段名: 累计秒数}，同名阶段多次出现时累加（如每页的 draw_text）
+    counters: {计数名: 数值}，如 pages、text_runs、glyphs、paths、images、seals、cache_hits、bytes_in、bytes_out
+    callback: finish 时调用 callback(stats)
+    tracer: OpenTelemetry 风格的 tracer，提供 start_as_current_span(name) 上下文管理器时，
+            每个阶段同时生成一个名为 fastofd.<阶段名> 的 span，不依赖 opentelemetry 包本身
+    """
+    enabled = True
+
+    def __init__(self, callback=None, tracer=None):
+        self.stages = {}
+        self.counters = {}
+        self.callback = callback
+        self.tracer = tracer
+        self._start = time.perf_counter()
+        self.total = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        span = self.tracer.start_as_current_span(f"fastofd.{name}") if self.tracer else contextlib.nullcontext()
+        start = time.perf_counter()
+        try:
+            with span:
+                yield self
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def incr(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other):
+        """合并另一份统计（ConversionStats 或 to_dict 结果），用于汇总子进程或多次调用"""
+        if isinstance(other, ConversionStats):
+            other = other.to_dict()
+        for name, seconds in (other.get("stages") or {}).items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        for name, value in (other.get("counters") or {}).items():
+            self.incr(name, value)
+
+    def finish(self):
+        """结束统计，记录总耗时并触发 callback，返回自身"""
+        self.total = time.perf_counter() - self._start
+        if self.callback is not None:
+            self.callback(self)
+        return self
+
+    def to_dict(self):
+        return {
+            "total": round(self.total, 6) if self.total is not None else None,
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def __repr__(self):
+        return f"ConversionStats({self.to_dict()})"
+
+
+class _NullStats(object):
+    """未开启统计时使用，所有方法为空操作，热路径上只多一次方法调用"""
+    enabled = False
+    _stage = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def incr(self, name, value=1):
+        pass
+
+    def merge(self, other):
+        pass
+
+    def finish(self):
+        return self
+
+
+NULL_STATS = _NullStats()
+
+
+def resolve(stats):
+    """None -> NULL_STATS"""
+    return NULL_STATS if stats is None else stats
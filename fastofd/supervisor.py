@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 17:10
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 受监管的转换子进程：超时、内存上限、定期重启
+import multiprocessing
+import time
+import traceback
+
+from loguru import logger
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+def _limit_memory(memory_limit_mb):
+    """限制子进程地址空间，超出时 python 侧抛 MemoryError"""
+    if not memory_limit_mb:
+        return
+    if resource is None:
+        logger.warning(f"当前平台不支持 resource.setrlimit，忽略内存上限")
+        return
+    limit = int(memory_limit_mb * 1024 * 1024)
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _worker_main(conn, memory_limit_mb, initializer=None):
+    """子进程循环：接收 (func, args, kwargs)，回传 ("ok", result) 或 ("error", error_type, error, traceback)"""
+    _limit_memory(memory_limit_mb)
+    if initializer is not None:
+        try:
+            initializer()
+        except Exception as e:
+            logger.warning(f"子进程初始化失败: {e}")
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        func, args, kwargs = job
+        try:
+            reply = ("ok", func(*args, **kwargs))
+        except MemoryError:
+            reply = ("error", "memory", f"超出内存上限 {memory_limit_mb}MB", traceback.format_exc(limit=5))
+        except Exception as e:
+            reply = ("error", "exception", f"{type(e).__name__}: {e}", traceback.format_exc(limit=5))
+        try:
+            conn.send(reply)
+        except MemoryError:
+            conn.send(("error", "memory", f"结果超出内存上限 {memory_limit_mb}MB", ""))
+    conn.close()
+
+
+class SupervisedWorker(object):
+    """
+    受监管的单个子进程，任务在子进程中执行，父进程只负责收发与计时
+    timeout: 单任务墙钟超时秒数，超时直接 kill 子进程并重启
+    memory_limit_mb: 子进程地址空间上限（RLIMIT_AS），None 不限制
+    max_jobs: 子进程执行 max_jobs 个任务后重启，回收 reportlab/fitz 等累积的内存
+    initializer: 子进程启动（含重启）后先执行的预热函数，如完成导入、注册字体
+    run 返回 {"status": "ok", "result": ..., "seconds": ...}
+    或 {"status": "error", "error_type": timeout|memory|crash|exception, "error": ..., "seconds": ...}
+    """
+
+    def __init__(self, timeout=300, memory_limit_mb=None, max_jobs=50, initializer=None):
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs = max_jobs
+        self.initializer = initializer
+        self.process = None
+        self.conn = None
+        self.jobs_done = 0
+        self.restarts = 0
+
+    def start(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_main,
+                                               args=(child_conn, self.memory_limit_mb, self.initializer),
+                                               name="fastofd-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.jobs_done = 0
+
+    def stop(self, kill=False):
+        if self.process is None:
+            return
+        if not kill and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def restart(self, kill=False):
+        self.stop(kill=kill)
+        self.restarts += 1
+        self.start()
+
+    def run(self, func, *args, **kwargs):
+        """在子进程中执行 func(*args, **kwargs)，func 需可被 pickle（模块级函数）"""
+        if self.process is None or not self.process.is_alive():
+            if self.process is not None:
+                self.restart(kill=True)
+            else:
+                self.start()
+        elif self.max_jobs and self.jobs_done >= self.max_jobs:
+            self.restart()
+
+        start = time.time()
+        self.jobs_done += 1
+        try:
+            self.conn.send((func, args, kwargs))
+            ready = self.conn.poll(self.timeout)
+        except (OSError, BrokenPipeError) as e:
+            self.restart(kill=True)
+            return self._error("crash", f"子进程通信失败: {e}", start)
+        if not ready:
+            logger.warning(f"任务超时 {self.timeout}s，重启子进程")
+            self.restart(kill=True)
+            return self._error("timeout", f"超过 {self.timeout}s 未完成", start)
+        try:
+            reply = self.conn.recv()
+        except (EOFError, OSError):
+            self.process.join(1)
+            exitcode = self.process.exitcode
+            self.restart(kill=True)
+            return self._error("crash", f"子进程异常退出 exitcode={exitcode}", start)
+
+        if reply[0] == "ok":
+            return {"status": "ok", "result": reply[1], "seconds": round(time.time() - start, 3)}
+        _, error_type, error, tb = reply
+        if error_type == "memory":
+            # 内存耗尽后子进程状态不可信
+            self.restart(kill=True)
+        result = self._error(error_type, error, start)
+        result["traceback"] = tb
+        return result
+
+    @staticmethod
+    def _error(error_type, error, start):
+        return {"status": "error", "error_type": error_type, "error": error, "seconds": round(time.time() - start, 3)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __del__(self):
+        try:
+            self.stop(kill=True)
+        except Exception:
+            pass
+
+
+def convert_ofd(ofd_bytes, to="pdf", render_mode="line", page_list=None, with_signature=True, options=None):
+    """
+    子进程任务：ofd 字节转 pdf 字节，或转为编码后的图片字节列表
+    options: RasterOptions，to="jpg" 时使用，fmt 需为 png/jpeg，默认 jpeg
+    """
+    from fastofd.draw.draw_img import RasterOptions
+    from fastofd.ofd import OFD
+
+    ofd = OFD()
+    ofd.read(ofd_bytes, fmt="binary")
+    if to == "pdf":
+        return ofd.to_pdf(render_mode=render_mode, page_list=page_list, with_signature=with_signature)
+    options = options or RasterOptions(fmt="jpeg")
+    assert options.fmt in ("png", "jpeg"), "子进程返回图片需要 png/jpeg 编码"
+    return ofd.to_jpg(render_mode=render_mode, page_list=page_list, with_signature=with_signature, options=options)
+
+
+def run_isolated(func, *args, timeout=300, memory_limit_mb=None, **kwargs):
+    """一次性在独立子进程中执行，返回结构同 SupervisedWorker.run"""
+    with SupervisedWorker(timeout=timeout, memory_limit_mb=memory_limit_mb, max_jobs=1) as worker:
+        return worker.run(func, *args, **kwargs)
@@ -28,7 +28,11 @@ setuptools.setup(
         "PyMuPDF>=1.23.4",
         "pyasn1>=0.6.0",
         "lxml>=6.0.2",
-        "pypdf>=6.1.3"
                      ],
+    entry_points={
+        "console_scripts": [
+            "fastofd=fastofd.cli:main",
+        ],
+    },
     python_requires='>=3.8',   
 )
\ No newline at end of file
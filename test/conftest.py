@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 21:40
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: pytest 公共配置
+import pytest
+from loguru import logger
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _quiet_logger():
+    """解析过程的调试日志不输出到测试结果"""
+    logger.remove()
+    yield
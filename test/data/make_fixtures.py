@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 21:10
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 生成 test/data 下的测试样本，样本已提交，修改后运行 python test/data/make_fixtures.py 重新生成
+import io
+import os
+import sys
+
+from PIL import Image, ImageDraw
+from pyasn1.codec.der.encoder import encode
+from pyasn1.type import char, tag, univ, useful
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DATA_DIR))
+
+from ofd_builder import NS, build_ofd, text_object  # noqa: E402
+
+# 发票票面取值：(标引标签, 对象 ID, x, y, 文本)，页面中故意把销售方排在购买方之前
+INVOICE_VALUES = (
+    ("InvoiceCode", 6590, 160, 10, "044031900111"),
+    ("InvoiceNo", 6591, 160, 16, "12345678"),
+    ("IssueDate", 6592, 160, 22, "2024年01月02日"),
+    ("InvoiceCheckCode", 6593, 160, 28, "12345 67890 12345 67890"),
+    ("SellerName", 6596, 40, 116, "某某商贸有限公司"),
+    ("SellerTaxID", 6597, 40, 121, "91110105MA0XXXXX2B"),
+    ("BuyerName", 6594, 40, 36, "某某科技有限公司"),
+    ("BuyerTaxID", 6595, 40, 41, "91440300MA5XXXXX1A"),
+    ("TaxExclusiveTotalAmount", 6598, 140, 95, "¥1,100.00"),
+    ("TaxTotalAmount", 6599, 180, 95, "¥143.00"),
+    ("TaxInclusiveTotalAmount", 6600, 160, 103, "（小写）¥1,243.00"),
+)
+# 模板标签 (x, y, 文本)
+INVOICE_LABELS = (
+    (130, 10, "发票代码："), (130, 16, "发票号码："), (130, 22, "开票日期："), (130, 28, "校验码："),
+    (5, 36, "名称："), (5, 41, "纳税人识别号："), (5, 116, "名 称："), (5, 121, "纳税人识别号："),
+    (5, 60, "项目名称"), (5, 95, "合 计"), (5, 103, "价税合计（大写）"),
+)
+ORIGINAL_INVOICE = """<?xml version="1.0" encoding="UTF-8"?>
+<EInvoice><Header><EIid>24442000000012345678</EIid><InherentLabel><EInvoiceType><LabelCode>01</LabelCode>
+<LabelName>电子发票（增值税专用发票）</LabelName></EInvoiceType></InherentLabel></Header>
+<EInvoiceData><SellerInformation><SellerIdNum>91110105MA0XXXXX2B</SellerIdNum><SellerName>某某商贸有限公司</SellerName>
+</SellerInformation><BuyerInformation><BuyerIdNum>91440300MA5XXXXX1A</BuyerIdNum><BuyerName>某某科技有限公司</BuyerName>
+</BuyerInformation><BasicInformation><TotalAmWithoutTax>1100.00</TotalAmWithoutTax><TotalTaxAm>143.00</TotalTaxAm>
+<TotalTax-includedAmount>1243.00</TotalTax-includedAmount><RequestTime>2024-01-02 10:00:00</RequestTime>
+<Drawer>张三</Drawer></BasicInformation></EInvoiceData>
+<TaxSupervisionInfo><InvoiceNumber>24442000000012345678</InvoiceNumber><IssueTime>2024-01-02 10:00:00</IssueTime>
+</TaxSupervisionInfo></EInvoice>"""
+
+
+def _seq(*components):
+    seq = univ.Sequence()
+    for idx, component in enumerate(components):
+        seq.setComponentByPosition(idx, component)
+    return seq
+
+
+def seal_png(size=96):
+    """红色圆形印章图片"""
+    img = Image.new("RGBA", (size, size), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((4, 4, size - 4, size - 4), outline=(220, 30, 30, 255), width=5)
+    draw.regular_polygon((size / 2, size / 2, size / 5), 5, fill=(220, 30, 30, 255))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def signed_value():
+    """
+    GM/T 0031-2014 V4 电子签章 SES_Signature：
+    SES_Signature { TBS_Sign { version, SESeal { SES_SealInfo { SES_Header, esID, SES_ESPropertyInfo,
+    SES_ESPictrueInfo { type, data, width, height } }, cert, signAlgID, signedValue }, timeInfo, dataHash,
+    propertyInfo }, cert, signatureAlgorithm, signature, [0] timeStamp }
+    证书与签名值为占位字节，结构与层级同实际签章
+    """
+    cert = encode(_seq(univ.Integer(2), univ.OctetString(b"fastofd test cert" * 8)))
+    header = _seq(char.IA5String("ES"), univ.Integer(4), char.IA5String("fastofd"))
+    property_info = _seq(univ.Integer(1), char.UTF8String("测试专用章"), univ.Integer(1),
+                         _seq(univ.OctetString(cert)), useful.GeneralizedTime("20261019000000Z"),
+                         useful.GeneralizedTime("20261019000000Z"), useful.GeneralizedTime("20361019000000Z"))
+    picture = _seq(char.IA5String("PNG"), univ.OctetString(seal_png()), univ.Integer(40), univ.Integer(40))
+    seal_info = _seq(header, char.IA5String("fastofd-seal-0001"), property_info, picture)
+    seal = _seq(seal_info, univ.OctetString(cert), univ.ObjectIdentifier("1.2.156.10197.1.501"),
+                univ.BitString(hexValue="00" * 64))
+    tbs = _seq(univ.Integer(4), seal, useful.GeneralizedTime("20261019120000Z"), univ.BitString(hexValue="11" * 32),
+               char.IA5String("Doc_0/Signs/Sign_0/Signature.xml"))
+    time_stamp = univ.BitString(hexValue="22" * 16).subtype(
+        implicitTag=tag.Tag(tag.tagClassContext, tag.tagFormatSimple, 0))
+    return encode(_seq(tbs, univ.OctetString(cert), univ.ObjectIdentifier("1.2.156.10197.1.501"),
+                       univ.BitString(hexValue="33" * 64), time_stamp))
+
+
+def invoice_text(oid, x, y, text, size=3):
+    """逐字等宽排版的发票文本对象，Boundary 宽度与文字一致"""
+    return text_object(oid, x, y, text, size=size, delta_x=f"g {len(text) - 1} {size}" if len(text) > 1 else None,
+                       width=len(text) * size, height=size + 1)
+
+
+def invoice_ofd(tags=False, attachment=False, custom_data=False):
+    """
+    电子发票样本：票面文本在页面，标签在背景模板；
+    tags: 自定义标引引用票面对象；attachment: original_invoice.xml 附件；custom_data: OFD.xml CustomData
+    """
+    page = "".join(invoice_text(oid, x, y, text) for _, oid, x, y, text in INVOICE_VALUES)
+    page += invoice_text(7000, 60, 103, "壹仟贰佰肆拾叁圆整")
+    labels = "".join(invoice_text(9000 + i, x, y, text) for i, (x, y, text) in enumerate(INVOICE_LABELS))
+    extra, files, doc_info = "", {}, ""
+    if attachment:
+        extra += "<ofd:Attachments>Attachs/Attachments.xml</ofd:Attachments>"
+        files["Attachs/Attachments.xml"] = (
+            f'<?xml version="1.0" encoding="UTF-8"?>\n<ofd:Attachments {NS}><ofd:Attachment ID="7" '
+            f'Name="original_invoice" Format="xml" CreationDate="2024-01-02" Visible="false">'
+            f'<ofd:FileLoc>original_invoice.xml</ofd:FileLoc></ofd:Attachment></ofd:Attachments>')
+        files["Attachs/original_invoice.xml"] = ORIGINAL_INVOICE
+    if tags:
+        extra += "<ofd:CustomTags>Tags/CustomTags.xml</ofd:CustomTags>"
+        files["Tags/CustomTags.xml"] = (
+            f'<?xml version="1.0" encoding="UTF-8"?>\n<ofd:CustomTags {NS}><ofd:CustomTag '
+            f'NameSpace="http://www.edrm.org.cn/schema/e-invoice/2019" TypeID="e-invoice">'
+            f'<ofd:FileLoc>CustomTag.xml</ofd:FileLoc></ofd:CustomTag></ofd:CustomTags>')
+        refs = "".join(f'<fp:{name}><ofd:ObjectRef PageRef="100">{oid}</ofd:ObjectRef></fp:{name}>'
+                       for name, oid, *_ in INVOICE_VALUES)
+        files["Tags/CustomTag.xml"] = (
+            f'<?xml version="1.0" encoding="UTF-8"?>\n<fp:eInvoice {NS} '
+            f'xmlns:fp="http://www.edrm.org.cn/schema/e-invoice/2019">{refs}'
+            f'<fp:InvoiceClerk>李四</fp:InvoiceClerk><fp:Note>备注信息</fp:Note></fp:eInvoice>')
+    if custom_data:
+        doc_info = ('<ofd:CustomDatas><ofd:CustomData Name="发票代码">044031900111</ofd:CustomData>'
+                    '<ofd:CustomData Name="发票号码">12345678</ofd:CustomData>'
+                    '<ofd:CustomData Name="开具日期">2024年01月02日</ofd:CustomData>'
+                    '<ofd:CustomData Name="校验码">12345 67890 12345 67890</ofd:CustomData>'
+                    '<ofd:CustomData Name="合计金额">1100.00</ofd:CustomData>'
+                    '<ofd:CustomData Name="合计税额">143.00</ofd:CustomData>'
+                    '<ofd:CustomData Name="购买方纳税人识别号">91440300MA5XXXXX1A</ofd:CustomData>'
+                    '<ofd:CustomData Name="销售方纳税人识别号">91110105MA0XXXXX2B</ofd:CustomData></ofd:CustomDatas>')
+    return build_ofd([(page, [(2, "Background")])], templates=[(2, labels, None)], page_size=(210, 140),
+                     document_extra=extra, files=files, doc_info=doc_info)
+
+
+def _signature(annots, signed_value_loc):
+    """Signature.xml，annots: [(StampAnnot ID, 页面 ID, Boundary)]"""
+    stamps = "".join(f'<ofd:StampAnnot ID="{aid}" PageRef="{page_id}" Boundary="{boundary}"/>'
+                     for aid, page_id, boundary in annots)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<ofd:Signature {NS}><ofd:SignedInfo>'
+            f'<ofd:Provider ProviderName="fastofd" Company="fastofd test" Version="1.0"/>'
+            f'<ofd:SignatureMethod>1.2.156.10197.1.501</ofd:SignatureMethod>'
+            f'<ofd:SignatureDateTime>20261019120000Z</ofd:SignatureDateTime>{stamps}'
+            f'<ofd:Seal><ofd:BaseLoc>Seal.esl</ofd:BaseLoc></ofd:Seal></ofd:SignedInfo>'
+            f'<ofd:SignedValue>{signed_value_loc}</ofd:SignedValue></ofd:Signature>')
+
+
+def signed_ofd(value):
+    """
+    三页、两个签章：Sign_0 为骑缝章，同一签章值盖在三页上（SignedValue 为绝对路径）；
+    Sign_1 只盖在第 2 页（Signatures.xml 中 BaseLoc、SignedValue 均为相对路径）
+    """
+    pages = [text_object(10 + idx, 20, 20, f"第{idx + 1}页") for idx in range(3)]
+    files = {
+        "Signs/Signatures.xml": (f'<?xml version="1.0" encoding="UTF-8"?>\n<ofd:Signatures {NS}>'
+                                 f'<ofd:MaxSignId>5</ofd:MaxSignId>'
+                                 f'<ofd:Signature ID="1" Type="Seal" BaseLoc="/Doc_0/Signs/Sign_0/Signature.xml"/>'
+                                 f'<ofd:Signature ID="2" Type="Seal" BaseLoc="Sign_1/Signature.xml"/>'
+                                 f'</ofd:Signatures>'),
+        "Signs/Sign_0/Signature.xml": _signature([(1, 100, "190 100 40 40"), (2, 101, "0 100 40 40"),
+                                                  (3, 102, "-20 100 40 40")], "/Doc_0/Signs/Sign_0/SignedValue.dat"),
+        "Signs/Sign_0/SignedValue.dat": value,
+        "Signs/Sign_1/Signature.xml": _signature([(4, 101, "120.5 200 42 42")], "SignedValue.dat"),
+        "Signs/Sign_1/SignedValue.dat": value,
+    }
+    return build_ofd(pages, files=files,
+                     doc_body_extra="<ofd:Signatures>Doc_0/Signs/Signatures.xml</ofd:Signatures>")
+
+
+INVOICE_FIXTURES = {
+    "invoice_tags.ofd": {"tags": True, "custom_data": True},
+    "invoice_attachment.ofd": {"attachment": True},
+    "invoice_custom_data.ofd": {"custom_data": True},
+    "invoice_layout.ofd": {},
+}
+
+
+def main():
+    value = signed_value()
+    with open(os.path.join(DATA_DIR, "SignedValue.dat"), "wb") as f:
+        f.write(value)
+    with open(os.path.join(DATA_DIR, "seal.ofd"), "wb") as f:
+        f.write(signed_ofd(value))
+    for name, kwargs in INVOICE_FIXTURES.items():
+        with open(os.path.join(DATA_DIR, name), "wb") as f:
+            f.write(invoice_ofd(**kwargs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 21:40
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 测试用 ofd 拼装：内存中生成最小 ofd 包
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+NS = 'xmlns:ofd="http://www.ofdspec.org/2016"'
+
+
+def text_object(oid, x, y, text, size=4, delta_x=None, ctm=None, width=80, height=6):
+    """TextObject，Boundary 起点 (x, y)，基线在框内 size 处"""
+    attrs = f' DeltaX="{delta_x}"' if delta_x else ""
+    ctm_attr = f' CTM="{ctm}"' if ctm else ""
+    return (f'<ofd:TextObject ID="{oid}" Boundary="{x} {y} {width} {height}" Font="2" Size="{size}"{ctm_attr}>'
+            f'<ofd:TextCode X="0" Y="{size}"{attrs}>{escape(text)}</ofd:TextCode></ofd:TextObject>')
+
+
+def path_object(oid, x0, y0, x1, y1, line_width=0.3):
+    """从 (x0, y0) 到 (x1, y1) 的单条线段 PathObject"""
+    return (f'<ofd:PathObject ID="{oid}" Boundary="{min(x0, x1)} {min(y0, y1)} {abs(x1 - x0) or line_width} '
+            f'{abs(y1 - y0) or line_width}" LineWidth="{line_width}"><ofd:AbbreviatedData>'
+            f'M {x0 - min(x0, x1)} {y0 - min(y0, y1)} L {x1 - min(x0, x1)} {y1 - min(y0, y1)}'
+            f'</ofd:AbbreviatedData></ofd:PathObject>')
+
+
+def _zorder(zorder):
+    return f' ZOrder="{zorder}"' if zorder else ""
+
+
+def _content(objects, refs=""):
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<ofd:Page {NS}>{refs}'
+            f'<ofd:Content><ofd:Layer ID="1">{objects}</ofd:Layer></ofd:Content></ofd:Page>')
+
+
+class _FixedTimeZip(object):
+    def __init__(self, archive):
+        self.archive = archive
+
+    def writestr(self, name, data):
+        info = zipfile.ZipInfo(name, date_time=(2026, 10, 19, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        self.archive.writestr(info, data)
+
+
+def build_ofd(pages, templates=(), page_size=(210, 297), document_extra="", files=None, doc_info="",
+              doc_body_extra="") -> bytes:
+    """
+    pages: [页面对象 xml] 或 [(页面对象 xml, [(模板 ID, ZOrder 或 None)])]
+    templates: [(模板 ID, 模板对象 xml, Document.xml 中的 ZOrder 或 None)]
+    document_extra: 追加到 ofd:Document 末尾的元素（Attachments / CustomTags）；files: {Doc_0 下的路径: 内容}
+    doc_body_extra: 追加到 OFD.xml ofd:DocBody 末尾的元素（Signatures）
+    """
+    width, height = page_size
+    tpl_pages = "".join(f'<ofd:TemplatePage ID="{tpl_id}" BaseLoc="Tpls/Tpl_{idx}/Content.xml"{_zorder(zorder)}/>'
+                        for idx, (tpl_id, _, zorder) in enumerate(templates))
+    page_refs = "".join(f'<ofd:Page ID="{100 + idx}" BaseLoc="Pages/Page_{idx}/Content.xml"/>'
+                        for idx in range(len(pages)))
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        # 固定时间戳，样本重新生成时字节不变
+        zf = _FixedTimeZip(archive)
+        zf.writestr("OFD.xml", f'<?xml version="1.0" encoding="UTF-8"?>\n<ofd:OFD {NS} Version="1.1" DocType="OFD">'
+                               f'<ofd:DocBody><ofd:DocInfo><ofd:DocID>fastofd-test</ofd:DocID>{doc_info}</ofd:DocInfo>'
+                               f'<ofd:DocRoot>Doc_0/Document.xml</ofd:DocRoot>{doc_body_extra}</ofd:DocBody></ofd:OFD>')
+        zf.writestr("Doc_0/Document.xml", f'<?xml version="1.0" encoding="UTF-8"?>\n<ofd:Document {NS}>'
+                                          f'<ofd:CommonData><ofd:MaxUnitID>9999</ofd:MaxUnitID><ofd:PageArea>'
+                                          f'<ofd:PhysicalBox>0 0 {width} {height}</ofd:PhysicalBox></ofd:PageArea>'
+                                          f'<ofd:PublicRes>PublicRes.xml</ofd:PublicRes>{tpl_pages}</ofd:CommonData>'
+                                          f'<ofd:Pages>{page_refs}</ofd:Pages>{document_extra}</ofd:Document>')
+        zf.writestr("Doc_0/PublicRes.xml", f'<?xml version="1.0" encoding="UTF-8"?>\n<ofd:Res {NS} BaseLoc="Res">'
+                                           f'<ofd:Fonts><ofd:Font ID="2" FontName="宋体" FamilyName="宋体"/>'
+                                           f'</ofd:Fonts></ofd:Res>')
+        for idx, page in enumerate(pages):
+            objects, tpl_refs = page if isinstance(page, tuple) else (page, [])
+            refs = "".join(f'<ofd:Template TemplateID="{tpl_id}"{_zorder(zorder)}/>' for tpl_id, zorder in tpl_refs)
+            zf.writestr(f"Doc_0/Pages/Page_{idx}/Content.xml", _content(objects, refs))
+        for idx, (_, objects, _) in enumerate(templates):
+            zf.writestr(f"Doc_0/Tpls/Tpl_{idx}/Content.xml", _content(objects))
+        for name, data in (files or {}).items():
+            zf.writestr(f"Doc_0/{name}", data)
+    return buf.getvalue()
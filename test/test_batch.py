@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/20 00:20
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 批量转换：失败隔离、manifest 续跑、进程池崩溃与超时，python -m pytest test/test_batch.py
+import json
+import os
+import time
+
+import fitz
+import pytest
+
+from fastofd.batch import BatchConverter, run_pool
+from fastofd.bench import make_ofd
+
+
+def work(n):
+    """run_pool 任务：-1 使子进程崩溃，-2 挂起，其余原样返回"""
+    if n == -1:
+        os._exit(1)
+    if n == -2:
+        time.sleep(60)
+    return ("ok", n)
+
+
+@pytest.fixture
+def sources(tmp_path):
+    src_dir = tmp_path / "src"
+    (src_dir / "sub").mkdir(parents=True)
+    (src_dir / "a.ofd").write_bytes(make_ofd(pages=1, texts_per_page=5, paths_per_page=2))
+    (src_dir / "sub" / "b.ofd").write_bytes(make_ofd(pages=2, texts_per_page=5, paths_per_page=2, seed=1))
+    (src_dir / "broken.ofd").write_bytes(b"not a zip")
+    return src_dir
+
+
+def read_manifest(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_invalid_input_and_resume(tmp_path, sources):
+    out_dir, manifest = tmp_path / "out", str(tmp_path / "manifest.jsonl")
+    converter = BatchConverter(str(out_dir), workers=2, manifest=manifest)
+    summary = converter.run(str(sources))
+    assert (summary["total"], summary["ok"], summary["failed"], summary["pages"]) == (3, 2, 1, 3)
+    assert summary["failures"][0]["src"] == str(sources / "broken.ofd")
+    # 保留子目录结构，其余文件照常转换
+    with fitz.open(str(out_dir / "sub" / "b.pdf")) as doc:
+        assert doc.page_count == 2
+    assert os.path.exists(out_dir / "a.pdf")
+    assert not [name for _, _, names in os.walk(out_dir) for name in names if name.endswith(".part")]
+    assert {r["src"]: r["status"] for r in read_manifest(manifest)} == {
+        str(sources / "a.ofd"): "ok", str(sources / "sub" / "b.ofd"): "ok", str(sources / "broken.ofd"): "error"}
+
+    # 重跑只处理失败的文件
+    summary = converter.run(str(sources))
+    assert (summary["total"], summary["skipped"], summary["failed"]) == (1, 2, 1)
+
+    # 内容变化（哈希不一致）或输出被删除的文件重新转换
+    (sources / "a.ofd").write_bytes(make_ofd(pages=3, texts_per_page=5, paths_per_page=2, seed=2))
+    os.remove(out_dir / "sub" / "b.pdf")
+    summary = converter.run(str(sources))
+    assert (summary["total"], summary["ok"], summary["skipped"], summary["pages"]) == (3, 2, 0, 5)
+    with fitz.open(str(out_dir / "a.pdf")) as doc:
+        assert doc.page_count == 3
+
+
+def test_manifest_partial_line(tmp_path, sources):
+    """上次中断时写了一半的行被忽略；后写入的失败记录覆盖先前的成功记录"""
+    out_dir, manifest = tmp_path / "out", str(tmp_path / "manifest.jsonl")
+    converter = BatchConverter(str(out_dir), workers=1, manifest=manifest)
+    converter.run([str(sources / "a.ofd")])
+    with open(manifest, "a", encoding="utf-8") as f:
+        f.write('{"src": "')
+    assert list(converter.load_manifest()) == [str(sources / "a.ofd")]
+    with open(manifest, "a", encoding="utf-8") as f:
+        f.write("\n" + json.dumps({"src": str(sources / "a.ofd"), "status": "error"}) + "\n")
+    assert converter.load_manifest() == {}
+
+
+def test_run_pool_crash_isolation():
+    """子进程崩溃后重建进程池，在途任务逐个重试，只有导致崩溃的任务记为失败"""
+    results = []
+    run_pool(work, ((n,) for n in [0, 1, -1, 2, 3, 4, 5]), results.append, lambda job: ("crash", job[0]),
+             workers=2, max_pending=4)
+    assert sorted(results) == [("crash", -1)] + [("ok", n) for n in range(6)]
+
+
+def test_run_pool_timeout():
+    """超时任务记为失败，进程池重建后其余任务继续执行"""
+    results = []
+    start = time.time()
+    run_pool(work, ((n,) for n in [0, -2, 1, 2, 3]), results.append, lambda job: ("crash", job[0]),
+             workers=2, max_pending=4, timeout=1, on_timeout=lambda job: ("timeout", job[0]))
+    assert sorted(results) == [("ok", n) for n in range(4)] + [("timeout", -2)]
+    assert time.time() - start < 30
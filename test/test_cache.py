@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 23:58
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 转换缓存与文档缓存，python -m pytest test/test_cache.py
+import asyncio
+import base64
+import concurrent.futures
+import os
+import time
+
+import fitz
+import pytest
+
+from fastofd.aio import AsyncExecutor
+from fastofd.bench import make_ofd
+from fastofd.cache import ConversionCache, DocumentCache, _atomic_write, content_hash, pack_blobs, unpack_blobs
+from fastofd.ofd import OFD
+from fastofd.parser_ofd.ofd_parser import OFDParser, PARSER_VERSION
+
+
+@pytest.fixture(scope="module")
+def docs():
+    """一页、三页两份内容不同的文档"""
+    return make_ofd(pages=1, texts_per_page=5, paths_per_page=2), make_ofd(pages=3, texts_per_page=5,
+                                                                          paths_per_page=2, seed=1)
+
+
+def page_count(pdfbytes):
+    with fitz.open(stream=pdfbytes, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def age(path, seconds):
+    """把文件访问 / 修改时间调早 seconds 秒，淘汰按该时间排序"""
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def test_make_key():
+    digest = content_hash(b"ofd")
+    key = ConversionCache.make_key(digest, "pdf", render_mode="line", page_list=[0, 1], with_signature=True)
+    assert key == ConversionCache.make_key(digest, "pdf", with_signature=True, page_list=[0, 1], render_mode="line")
+    assert key != ConversionCache.make_key(digest, "jpg", render_mode="line", page_list=[0, 1], with_signature=True)
+    assert key != ConversionCache.make_key(digest, "pdf", render_mode="line", page_list=[1, 0], with_signature=True)
+    assert key != ConversionCache.make_key(content_hash(b"other"), "pdf", render_mode="line", page_list=[0, 1],
+                                           with_signature=True)
+
+
+def test_pack_blobs():
+    blobs = [b"", b"a", b"\x00" * 300]
+    assert unpack_blobs(pack_blobs(blobs)) == blobs
+    assert unpack_blobs(pack_blobs([])) == []
+
+
+def test_lru_by_items():
+    cache = ConversionCache(max_items=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"  # a 变为最近使用
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1" and cache.get("c") == b"3"
+    stats = cache.stats()
+    assert (stats["memory_items"], stats["memory_evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+
+
+def test_lru_by_bytes():
+    cache = ConversionCache(max_items=10, max_memory_bytes=10)
+    cache.set("a", b"x" * 6)
+    cache.set("b", b"y" * 6)
+    assert cache.get("a") is None and cache.get("b") == b"y" * 6
+    # 单个值超过内存上限时不进内存层，也不挤掉已有条目
+    cache.set("c", b"z" * 11)
+    assert cache.get("c") is None and cache.get("b") == b"y" * 6
+    assert cache.stats()["memory_bytes"] == 6
+
+
+def test_disk_layer(tmp_path):
+    cache = ConversionCache(max_items=0, cache_dir=str(tmp_path))
+    cache.set("ab" + "0" * 62, b"value")
+    assert cache.get("ab" + "0" * 62) == b"value"
+    assert cache.stats()["disk_hits"] == 1
+    # 同一目录的其他实例（其他进程）共享磁盘层
+    other = ConversionCache(cache_dir=str(tmp_path))
+    assert other.get("ab" + "0" * 62) == b"value"
+    assert other.get("cd" + "0" * 62) is None
+
+
+def test_disk_eviction(tmp_path):
+    cache = ConversionCache(max_items=0, cache_dir=str(tmp_path), max_disk_bytes=250)
+    keys = [f"{i:02d}" + "0" * 62 for i in range(4)]
+    for idx, key in enumerate(keys[:2]):
+        cache.set(key, b"x" * 100)
+        age(cache._path(key), 30 - idx * 10)
+    # 超过上限时按访问时间从旧到新删除，直到低于上限的 90%
+    cache.set(keys[2], b"x" * 100)
+    assert [os.path.exists(cache._path(key)) for key in keys[:3]] == [False, True, True]
+    assert cache.stats()["disk_bytes"] == 200
+    # 刚写入的大值即使单独接近上限也保留，其他文件全部淘汰
+    cache.set(keys[3], b"x" * 240)
+    assert cache.get(keys[3]) == b"x" * 240
+    assert [os.path.exists(cache._path(key)) for key in keys] == [False, False, False, True]
+    # 超过磁盘上限的值不写入
+    cache.set(keys[0], b"x" * 251)
+    assert not os.path.exists(cache._path(keys[0]))
+    assert cache.stats()["disk_evictions"] == 3
+
+
+def test_atomic_write(tmp_path, monkeypatch):
+    path = str(tmp_path / "sub" / "value.bin")
+    _atomic_write(path, b"old")
+    assert os.listdir(os.path.dirname(path)) == ["value.bin"]
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    # 替换失败时原文件保持完整，临时文件被清理
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        _atomic_write(path, b"new")
+    with open(path, "rb") as f:
+        assert f.read() == b"old"
+    assert os.listdir(os.path.dirname(path)) == ["value.bin"]
+
+
+def test_document_cache_round_trip(tmp_path, docs):
+    cache = DocumentCache(str(tmp_path))
+    data = OFDParser(str(base64.b64encode(docs[1]), encoding="utf-8"))()
+    key = DocumentCache.make_key(content_hash(docs[1]), PARSER_VERSION)
+    assert cache.get(key) is None
+    cache.set(key, data)
+    assert cache.get(key) == data
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_document_cache_shared_blobs(tmp_path):
+    """非字符串键、tuple 原样还原；相同资源在文档之间只存一份"""
+    cache = DocumentCache(str(tmp_path))
+    image = str(base64.b64encode(b"\x89PNG" + b"\x00" * 100), encoding="utf-8")
+    data = [{"page": {1: ("a", 2)}, "images": [{"imgb64": image}, {"imgb64": image}], "font_b64": ""}]
+    cache.set("a" * 64, data)
+    cache.set("b" * 64, [{"imgb64": image}])
+    assert cache.get("a" * 64) == data
+    assert cache.get("b" * 64) == [{"imgb64": image}]
+    blobs = [name for _, _, names in os.walk(tmp_path / "blobs") for name in names]
+    assert blobs == [content_hash(base64.b64decode(image))]
+
+
+def test_document_cache_blob_grace(tmp_path):
+    cache = DocumentCache(str(tmp_path), max_disk_bytes=1500)
+
+    def blob(fill):
+        return str(base64.b64encode(fill * 1000), encoding="utf-8")
+
+    def blob_path(fill):
+        return cache._blob_path(content_hash(fill * 1000))
+
+    cache.set("1" * 64, {"imgb64": blob(b"x")})
+    age(cache._doc_path("1" * 64), 60)
+    # 超过上限淘汰最旧文档；其引用的 blob 刚写入不久，留给可能正在写入引用它的其他进程
+    cache.set("2" * 64, {"imgb64": blob(b"y")})
+    assert cache.get("1" * 64) is None
+    assert os.path.exists(blob_path(b"x"))
+    assert cache.stats()["doc_evictions"] == 1 and cache.stats()["blob_evictions"] == 0
+
+    # 超过宽限期后，没有文档引用的 blob 被回收，被引用的保留
+    cache.BLOB_GRACE = 30
+    age(blob_path(b"x"), 60)
+    age(blob_path(b"y"), 60)
+    age(cache._doc_path("2" * 64), 60)
+    cache.set("3" * 64, {"imgb64": blob(b"z")})
+    assert not os.path.exists(blob_path(b"x")) and not os.path.exists(blob_path(b"y"))
+    assert cache.get("3" * 64) == {"imgb64": blob(b"z")}
+    assert cache.stats()["blob_evictions"] == 2
+
+
+def test_stale_key_after_data_replaced(docs):
+    """直接替换 data 后不能命中原文档的转换缓存"""
+    one, three = docs
+    ofd = OFD(cache=ConversionCache())
+    ofd.read(one, fmt="binary")
+    assert page_count(ofd.to_pdf()) == 1
+    assert len(ofd.to_jpg()) == 1
+    ofd.data = OFDParser(str(base64.b64encode(three), encoding="utf-8"))()
+    assert ofd.content_hash is None
+    assert page_count(ofd.to_pdf()) == 3
+    assert len(ofd.to_jpg()) == 3
+    # 重新 read 后按新内容寻址，再次命中
+    ofd.read(one, fmt="binary")
+    hits = ofd.cache.stats()["hits"]
+    assert page_count(ofd.to_pdf()) == 1
+    assert ofd.cache.stats()["hits"] == hits + 1
+
+
+def test_stale_key_after_process_aread(docs):
+    one, three = docs
+
+    async def main():
+        executor = AsyncExecutor(concurrent.futures.ProcessPoolExecutor(1))
+        try:
+            ofd = OFD(cache=ConversionCache())
+            ofd.read(one, fmt="binary")
+            assert page_count(ofd.to_pdf()) == 1
+            await ofd.aread(three, fmt="binary", executor=executor)
+            assert ofd.content_hash == content_hash(three)
+            assert page_count(ofd.to_pdf()) == 3
+        finally:
+            executor.shutdown()
+
+    asyncio.run(main())
+
+
+def test_lazy_read_key(tmp_path, docs):
+    """lazy 读取按文件分块计算哈希，与读入字节时相同，两种方式共享转换缓存"""
+    one, _ = docs
+    path = tmp_path / "one.ofd"
+    path.write_bytes(one)
+    ofd = OFD(cache=ConversionCache())
+    ofd.read(one, fmt="binary")
+    pdfbytes = ofd.to_pdf()
+    ofd.read(str(path), fmt="path", lazy=True)
+    assert ofd.content_hash == content_hash(one)
+    assert ofd.to_pdf() == pdfbytes and ofd.cache.stats()["hits"] == 1
+    with pytest.raises(AssertionError):
+        ofd.read(one, fmt="binary", lazy=True)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/20 00:50
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 多进程分块绘制、延迟读取资源与单进程结果一致，python -m pytest test/test_draw_pdf.py
+import base64
+import io
+
+import fitz
+import pytest
+
+from fastofd.bench import make_ofd
+from fastofd.draw import draw_pdf as draw_pdf_module
+from fastofd.draw.draw_pdf import DrawPDF
+from fastofd.parser_ofd.file_deal import ZipResource
+from fastofd.parser_ofd.ofd_parser import OFDParser
+
+PAGES = 12
+# 每块 2 页，12 页分 6 块，3 个子进程
+CHUNKED = {"max_workers": 3, "single_thread_threshold": 0, "optimized_pages_per_chunk": 2,
+           "stream_pages_per_chunk": 2}
+
+
+@pytest.fixture(scope="module")
+def data():
+    ofd_bytes = make_ofd(pages=PAGES, texts_per_page=8, paths_per_page=4, seals=2)
+    return OFDParser(str(base64.b64encode(ofd_bytes), encoding="utf-8"))()
+
+
+def page_texts(pdfbytes):
+    with fitz.open(stream=pdfbytes, filetype="pdf") as doc:
+        return [page.get_text() for page in doc]
+
+
+@pytest.fixture(scope="module")
+def expected(data):
+    texts = page_texts(DrawPDF(data, max_workers=1).draw_pdf())
+    # 每页文本不同，页序错乱可以被发现
+    assert len(texts) == PAGES and len(set(texts)) == PAGES
+    return texts
+
+
+def draw_to_bytes(data, **kwargs):
+    out = io.BytesIO()
+    DrawPDF(data, **kwargs).draw_pdf_to(out)
+    return out.getvalue()
+
+
+def test_multiprocess_page_order(data, expected):
+    assert page_texts(DrawPDF(data, **CHUNKED).draw_pdf()) == expected
+
+
+def test_stream_page_order(data, expected):
+    assert page_texts(draw_to_bytes(data, max_workers=1, stream_pages_per_chunk=5)) == expected
+    assert page_texts(draw_to_bytes(data, **CHUNKED)) == expected
+
+
+def test_pool_unavailable_fallback(data, expected, monkeypatch):
+    """进程池无法创建时在当前进程逐块绘制"""
+
+    def unavailable(*args, **kwargs):
+        raise OSError("no processes")
+
+    monkeypatch.setattr(draw_pdf_module.concurrent.futures, "ProcessPoolExecutor", unavailable)
+    assert page_texts(DrawPDF(data, **CHUNKED).draw_pdf()) == expected
+    assert page_texts(draw_to_bytes(data, **CHUNKED)) == expected
+
+
+DRAW_SUB_PDF = draw_pdf_module._draw_sub_pdf
+
+
+def failing_sub_pdf(chunk_pages, options):
+    """第 5、6 页（pg_no 从 0 开始）所在的块在子进程中失败"""
+    if chunk_pages[0]["pg_no"] == 4:
+        raise RuntimeError("sub pdf failed")
+    return DRAW_SUB_PDF(chunk_pages, options)
+
+
+def test_failed_chunk_fallback(data, expected, monkeypatch):
+    """子进程失败的页面块在当前进程补绘，页数与页序不变"""
+    monkeypatch.setattr(draw_pdf_module, "_draw_sub_pdf", failing_sub_pdf)
+    assert page_texts(DrawPDF(data, **CHUNKED).draw_pdf()) == expected
+
+
+def page_contents(pdfbytes):
+    with fitz.open(stream=pdfbytes, filetype="pdf") as doc:
+        return [(page.get_text(), len(page.get_images())) for page in doc]
+
+
+def test_lazy_resources(tmp_path):
+    """按路径解析时图片、签章值留在 ofd 中，绘制时逐页读取（bmp 此时才转码），结果与一次性读入相同"""
+    ofd_bytes = make_ofd(pages=6, texts_per_page=4, paths_per_page=2, images=2, image_format="bmp", seals=2)
+    ofd_path = tmp_path / "lazy.ofd"
+    ofd_path.write_bytes(ofd_bytes)
+    eager = OFDParser(str(base64.b64encode(ofd_bytes), encoding="utf-8"))()
+    lazy = OFDParser(None, path=str(ofd_path))()
+    expected = page_contents(DrawPDF(eager, max_workers=1).draw_pdf())
+    # 每页一张图片、前两页各一个签章
+    assert [count for _, count in expected] == [2, 2, 1, 1, 1, 1]
+
+    images, seals = lazy[0]["images"], lazy[0]["seals"]
+    assert images and all(isinstance(image["imgb64"], ZipResource) for image in images.values())
+    assert seals and all(isinstance(seal["SignedValue"], ZipResource) for seal in seals.values())
+    assert page_contents(DrawPDF(lazy, max_workers=1).draw_pdf()) == expected
+    assert page_contents(draw_to_bytes(lazy, **CHUNKED)) == expected
+    # 读取结果不写回解析结果
+    assert all(isinstance(image["imgb64"], ZipResource) and image["suffix"] == "bmp" for image in images.values())
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 23:00
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 文档库全文检索，python -m pytest test/test_index.py
+import pytest
+
+from fastofd.index import OFDIndex
+
+from ofd_builder import build_ofd, text_object
+
+
+@pytest.fixture()
+def index(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.ofd").write_bytes(build_ofd([text_object(1, 10, 20, "增值税电子普通发票")]))
+    (docs / "b.ofd").write_bytes(build_ofd([text_object(1, 10, 20, "采购合同"), text_object(1, 10, 20, "合同附件")]))
+    with OFDIndex(str(tmp_path / "index.db"), workers=1) as idx:
+        summary = idx.add(str(docs))
+        assert summary["indexed"] == 2
+        yield idx
+
+
+@pytest.mark.parametrize("query", ["", " ", "\t\n"])
+def test_empty_query(index, query):
+    assert index.search(query) == []
+
+
+def test_search(index):
+    hits = index.search("电子普通")
+    assert len(hits) == 1
+    assert hits[0]["paths"][0].endswith("a.ofd")
+    assert [hit["page"] for hit in index.search("合同")] == [0, 1]
+    assert index.search("发票 合同") == []
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 23:55
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 电子发票字段抽取，样本由 test/data/make_fixtures.py 生成，python -m pytest test/test_invoice.py
+import datetime
+import os
+from decimal import Decimal
+
+import pytest
+
+from fastofd.extract.invoice import FIELDS, convert, extract_invoice, extract_invoices, join_runs, layout_fields
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# 版式发票票面字段，类型已转换
+FACE = {
+    "invoice_code": "044031900111",
+    "invoice_no": "12345678",
+    "issue_date": datetime.date(2024, 1, 2),
+    "check_code": "12345678901234567890",
+    "buyer_name": "某某科技有限公司",
+    "buyer_tax_id": "91440300MA5XXXXX1A",
+    "seller_name": "某某商贸有限公司",
+    "seller_tax_id": "91110105MA0XXXXX2B",
+    "amount": Decimal("1100.00"),
+    "tax": Decimal("143.00"),
+    "total": Decimal("1243.00"),
+}
+CUSTOM_DATA_FIELDS = ("invoice_code", "invoice_no", "issue_date", "check_code", "amount", "tax",
+                      "buyer_tax_id", "seller_tax_id")
+
+
+def read(name):
+    with open(os.path.join(DATA_DIR, name), "rb") as f:
+        return f.read()
+
+
+def test_custom_tags():
+    """标引优先于同时存在的 CustomData，引用对象的文本按类型转换"""
+    result = extract_invoice(read("invoice_tags.ofd"))
+    assert result["fields"] == dict(FACE, invoice_type=None, machine_no=None, drawer="李四", note="备注信息")
+    assert set(result["source"].values()) == {"custom_tag"}
+    assert result["missing"] == ["invoice_type", "machine_no"]
+
+
+def test_attachment():
+    result = extract_invoice(read("invoice_attachment.ofd"))
+    fields = result["fields"]
+    assert fields["invoice_type"] == "电子发票（增值税专用发票）"
+    # 数电发票号码 20 位，InvoiceNumber / EIid 先出现的优先
+    assert fields["invoice_no"] == "24442000000012345678"
+    assert fields["issue_date"] == datetime.date(2024, 1, 2)
+    assert fields["total"] == Decimal("1243.00")
+    assert fields["drawer"] == "张三"
+    assert fields["buyer_name"] == FACE["buyer_name"] and fields["seller_name"] == FACE["seller_name"]
+    assert set(result["source"].values()) == {"attachment"}
+    # 核心字段齐全时不按版面补齐发票代码等
+    assert result["missing"] == ["invoice_code", "check_code", "machine_no", "note"]
+
+
+def test_custom_data():
+    result = extract_invoice(read("invoice_custom_data.ofd"), fallback=False)
+    assert {k: v for k, v in result["fields"].items() if v is not None} == {k: FACE[k] for k in CUSTOM_DATA_FIELDS}
+    assert result["source"] == {k: "custom_data" for k in CUSTOM_DATA_FIELDS}
+    # 缺少核心字段时按版面补齐，已有字段不覆盖
+    result = extract_invoice(read("invoice_custom_data.ofd"))
+    assert {k: result["fields"][k] for k in FACE} == FACE
+    assert result["source"] == dict({k: "custom_data" for k in CUSTOM_DATA_FIELDS},
+                                    buyer_name="layout", seller_name="layout", total="layout")
+
+
+def test_layout():
+    result = extract_invoice(read("invoice_layout.ofd"))
+    assert {k: result["fields"][k] for k in FACE} == FACE
+    assert result["source"] == {k: "layout" for k in FACE}
+    assert result["missing"] == ["invoice_type", "machine_no", "drawer", "note"]
+    assert extract_invoice(read("invoice_layout.ofd"), fallback=False)["fields"] == {k: None for k in FIELDS}
+
+
+def test_field_subset():
+    result = extract_invoice(read("invoice_tags.ofd"), fields=["total", "seller_name"])
+    assert result["fields"] == {"total": FACE["total"], "seller_name": FACE["seller_name"]}
+    assert result["source"] == {"total": "custom_tag", "seller_name": "custom_tag"}
+    with pytest.raises(AssertionError):
+        extract_invoice(read("invoice_tags.ofd"), fields=["unknown"])
+
+
+def test_extract_invoices():
+    names = ("invoice_tags.ofd", "invoice_attachment.ofd", "invoice_custom_data.ofd", "invoice_layout.ofd")
+    results = []
+    summary = extract_invoices([os.path.join(DATA_DIR, name) for name in names], results.append)
+    assert (summary["total"], summary["ok"], summary["failed"]) == (4, 4, 0)
+    assert {os.path.basename(r["src"]): r["fields"]["total"] for r in results} == {name: FACE["total"]
+                                                                                   for name in names}
+
+
+def run(x, y, text, size=3):
+    return {"text": text, "bbox": [x, y, x + len(text) * size, y + size + 1]}
+
+
+def test_party_labels_top_bottom():
+    """自上而下第一处“名称”为购买方，第二处为销售方，与对象顺序无关"""
+    runs = [run(5, 116, "名 称："), run(40, 116, "销售方公司"), run(5, 121, "纳税人识别号："),
+            run(40, 121, "91110105MA0XXXXX2B"),
+            run(5, 36, "名称："), run(40, 36, "购买方公司"), run(5, 41, "纳税人识别号："), run(40, 41, "91440300MA5XXXXX1A")]
+    found = layout_fields(runs, [210, 140], ["buyer_name", "seller_name", "buyer_tax_id", "seller_tax_id"])
+    assert found == {"buyer_name": "购买方公司", "seller_name": "销售方公司",
+                     "buyer_tax_id": "91440300MA5XXXXX1A", "seller_tax_id": "91110105MA0XXXXX2B"}
+
+
+def test_party_labels_side_by_side():
+    """数电发票购买方、销售方左右并排：同一行左侧为购买方"""
+    runs = [run(110, 30, "名称：销售方公司"), run(5, 30, "名称：购买方公司"),
+            run(110, 36, "统一社会信用代码/纳税人识别号：91110105MA0XXXXX2B"),
+            run(5, 36, "统一社会信用代码/纳税人识别号：91440300MA5XXXXX1A")]
+    found = layout_fields(runs, [210, 140], ["buyer_name", "seller_name", "buyer_tax_id", "seller_tax_id"])
+    assert found["buyer_name"] == "购买方公司" and found["seller_name"] == "销售方公司"
+    assert found["buyer_tax_id"] == "91440300MA5XXXXX1A"
+    # 标签与值在同一段且被右侧对象截断时，值取格式匹配的部分
+    assert found["seller_tax_id"] == "91110105MA0XXXXX2B"
+
+
+def test_labels_and_sums():
+    runs = [run(130, 10, "发票号码："), run(160, 10, "12345678"), run(130, 16, "开票日期：2024年01月02日"),
+            run(5, 60, "项目名称"), run(40, 60, "服务费"),
+            run(5, 95, "合 计"), run(140, 95, "¥1,100.00"), run(180, 95, "¥143.00"),
+            run(5, 103, "价税合计（大写）"), run(60, 103, "壹仟贰佰肆拾叁圆整"), run(160, 103, "（小写）¥1,243.00")]
+    found = layout_fields(runs, [210, 140], ["invoice_no", "issue_date", "amount", "tax", "total"])
+    assert found == {"invoice_no": "12345678", "issue_date": "2024年01月02日", "amount": "1,100.00",
+                     "tax": "143.00", "total": "1,243.00"}
+
+
+def test_regions_without_labels():
+    """没有表头标签时按页面右上角区域查找，同一个值不重复用于两个字段"""
+    runs = [run(150, 8, "044031900111"), run(150, 14, "12345678"), run(150, 20, "2024-01-02"),
+            run(10, 8, "999999999999")]
+    found = layout_fields(runs, [210, 140], ["invoice_code", "invoice_no", "issue_date"])
+    assert found == {"invoice_code": "044031900111", "invoice_no": "12345678", "issue_date": "2024-01-02"}
+    # 有标签的字段即使标签右侧没有值，也不再按区域猜测
+    runs.append(run(5, 50, "发票号码："))
+    assert layout_fields(runs, [210, 140], ["invoice_no", "issue_date"]) == {"issue_date": "2024-01-02"}
+
+
+@pytest.mark.parametrize("field, value, expect", [
+    ("issue_date", "2024年1月2日", datetime.date(2024, 1, 2)),
+    ("issue_date", "2024-01-02 10:00:00", datetime.date(2024, 1, 2)),
+    ("issue_date", "2024/01/02", datetime.date(2024, 1, 2)),
+    ("issue_date", "20240102", datetime.date(2024, 1, 2)),
+    ("issue_date", "2024年13月40日", None),
+    ("issue_date", "无", None),
+    ("total", "（小写）¥1,243.00", Decimal("1243.00")),
+    ("total", "¥ -12.50", Decimal("-12.50")),
+    ("amount", "100", Decimal("100")),
+    ("tax", "***", None),
+    ("check_code", " 12345 67890\n12345 67890 ", "12345678901234567890"),
+    ("buyer_name", "  某某科技有限公司 ", "某某科技有限公司"),
+    ("note", "   ", None),
+    ("note", None, None),
+])
+def test_convert(field, value, expect):
+    assert convert(field, value) == expect
+
+
+def test_join_runs():
+    """逐字排版的对象按行拼接，大间距处断开，缺少 Boundary 的对象忽略"""
+    objects = [
+        {"text": "号", "boundary": [13, 10.2, 3, 4]},
+        {"text": "发", "boundary": [10, 10, 3, 4]},
+        {"text": "12345678", "boundary": [30, 10, 16, 4]},
+        {"text": "码", "boundary": [16.5, 10, 3, 4]},
+        {"text": "第二行", "boundary": [10, 20, 9, 4]},
+        {"text": "无框", "boundary": []},
+        {"text": "", "boundary": [0, 0, 1, 1]},
+    ]
+    runs = join_runs(objects)
+    assert [r["text"] for r in runs] == ["发号码", "12345678", "第二行"]
+    assert runs[0]["bbox"] == [10, 10, 19.5, 14.2]
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 23:25
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: ofd 包内路径解析，python -m pytest test/test_package.py
+import io
+import zipfile
+
+import pytest
+
+from fastofd.parser_ofd.package import OFDPackage
+
+
+@pytest.fixture(scope="module")
+def package():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name in ("OFD.xml", "Doc_0/Document.xml", "Doc_0/Res/image.png", "Doc_0/Res/myimage.png",
+                     "Doc_0/Attachs/original_invoice.xml", "Doc_1/Attachs/original_invoice.xml",
+                     "/Doc_0/Signs/Sign_0/SignedValue.dat"):
+            zf.writestr(name, b"x")
+    return OFDPackage(buf.getvalue())
+
+
+@pytest.mark.parametrize("loc, base, expect", [
+    ("/Doc_0/Res/image.png", "", "Doc_0/Res/image.png"),
+    ("Res/image.png", "Doc_0", "Doc_0/Res/image.png"),
+    ("./Res/image.png", "Doc_0", "Doc_0/Res/image.png"),
+    ("../Res/image.png", "Doc_0/Pages", "Doc_0/Res/image.png"),
+    ("Doc_0\\\\Res\\\\image.png", "", "Doc_0/Res/image.png"),
+    ("Doc_0/./Pages/../Res/image.png", "", "Doc_0/Res/image.png"),
+    ("Doc_0/Signs/Sign_0/SignedValue.dat", "", "/Doc_0/Signs/Sign_0/SignedValue.dat"),
+])
+def test_resolve_exact(package, loc, base, expect):
+    assert package._resolve(loc, base) == expect
+
+
+def test_resolve_suffix_segment_boundary(package):
+    """后缀匹配按路径段：image.png 只匹配 image.png，不匹配 myimage.png"""
+    assert package._resolve("image.png", "Doc_0/Pages/Page_0") == "Doc_0/Res/image.png"
+    assert package._resolve("../../Res/image.png", "Doc_0/Pages/Page_0") == "Doc_0/Res/image.png"
+    assert package._resolve("age.png") is None
+    assert package._resolve("es/image.png") is None
+
+
+def test_resolve_prefers_base(package):
+    assert package._resolve("original_invoice.xml", "Doc_1") == "Doc_1/Attachs/original_invoice.xml"
+    assert package._resolve("original_invoice.xml", "Doc_0") == "Doc_0/Attachs/original_invoice.xml"
+
+
+@pytest.mark.parametrize("loc", [None, "", "..", "./", "/"])
+def test_resolve_empty(package, loc):
+    assert package._resolve(loc) is None
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 21:20
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 签章值 DER 遍历：GM/T 0031 签章样本与异常输入，python -m pytest test/test_seal_extract.py
+import io
+import os
+import random
+
+import pytest
+from PIL import Image
+
+from fastofd.draw.find_seal_img import SealExtract, image_format, iter_octet_strings, iter_seal_images, MAX_DEPTH
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def der(tag, content):
+    """定长 DER 元素"""
+    length = len(content)
+    if length < 0x80:
+        return bytes([tag, length]) + content
+    num = (length.bit_length() + 7) // 8
+    return bytes([tag, 0x80 | num]) + length.to_bytes(num, "big") + content
+
+
+def nested(depth, inner):
+    for _ in range(depth):
+        inner = der(0x30, inner)
+    return inner
+
+
+@pytest.fixture(scope="module")
+def signed_value():
+    with open(os.path.join(DATA_DIR, "SignedValue.dat"), "rb") as f:
+        return f.read()
+
+
+def test_signed_value_octet_strings(signed_value):
+    """按出现顺序产出：证书列表、印章图片、印章证书、签名者证书"""
+    contents = list(iter_octet_strings(signed_value))
+    assert all(isinstance(c, memoryview) for c in contents)
+    heads = [bytes(c[:4]) for c in contents]
+    assert heads.count(b"\x89PNG") == 1
+    assert heads.index(b"\x89PNG") == 2
+    # 内容为 SEQUENCE 的证书 OctetString 下钻后产出内层 OctetString
+    assert heads.count(b"fast") == 3
+
+
+def test_signed_value_seal_image(signed_value):
+    candidates = list(iter_seal_images(signed_value))
+    assert [fmt for fmt, _ in candidates] == ["png"]
+    images = SealExtract()(data=signed_value)
+    assert len(images) == 1
+    assert images[0].size == (96, 96)
+
+
+@pytest.mark.parametrize("fmt, mode", [("TIFF", "RGB"), ("TIFF", "1"), ("GIF", "P"), ("BMP", "RGB"), ("JPEG", "RGB")])
+def test_embedded_image_formats(fmt, mode):
+    """印章图片为 tiff（含两种字节序）、gif、bmp、jpeg 时同样识别并解码"""
+    buf = io.BytesIO()
+    Image.new(mode, (8, 6)).save(buf, format=fmt)
+    data = der(0x30, der(0x16, b"ESPIC") + der(0x04, buf.getvalue()))
+    candidates = list(iter_seal_images(data))
+    assert [c[0] for c in candidates] == [fmt.lower()]
+    images = SealExtract()(data=data)
+    assert [image.size for image in images] == [(8, 6)]
+
+
+def test_big_endian_tiff():
+    assert image_format(b"MM\x00*\x00\x00\x00\x08") == "tiff"
+    assert image_format(b"II*\x00\x08\x00\x00\x00") == "tiff"
+
+
+def test_truncated_signed_value(signed_value):
+    """任意截断都不抛异常，不产出越界内容"""
+    for size in range(0, len(signed_value), 7):
+        data = signed_value[:size]
+        for content in iter_octet_strings(data):
+            assert len(content) <= size
+    assert SealExtract()(data=signed_value[:len(signed_value) // 2]) == []
+
+
+@pytest.mark.parametrize("data", [
+    b"\x04\x84\xff\xff\xff\xff",  # 长度超出数据
+    b"\x04\x85\x00\x00\x00\x00\x01a",  # 长度字节数超过 4
+    b"\x04\x82\x00",  # 长度字节不完整
+    b"\x30\x05\x04\x10abc",  # 子元素长度超出父元素
+    b"\x04",
+    b"",
+])
+def test_invalid_lengths(data):
+    assert list(iter_octet_strings(data)) == []
+
+
+def test_indefinite_length():
+    """BER 不定长编码不解析"""
+    data = b"\x30\x80" + der(0x04, b"\x89PNG\r\n\x1a\n") + b"\x00\x00"
+    assert list(iter_octet_strings(data)) == []
+    # 不定长元素之后的同层元素不受影响
+    assert [bytes(c) for c in iter_octet_strings(der(0x30, der(0x04, b"a")) + b"\x30\x80\x00\x00")] == [b"a"]
+
+
+def test_deep_nesting():
+    """超过 max_depth 的层级跳过，深层嵌套不递归、不抛异常"""
+    assert [bytes(c) for c in iter_octet_strings(nested(MAX_DEPTH, der(0x04, b"x")))] == [b"x"]
+    assert list(iter_octet_strings(nested(MAX_DEPTH + 1, der(0x04, b"x")))) == []
+    assert list(iter_octet_strings(nested(20000, der(0x04, b"x")))) == []
+
+
+def test_nested_octet_string_depth():
+    """OctetString 封装的 SEQUENCE 同样计入层数"""
+    inner = der(0x04, b"x")
+    for _ in range(MAX_DEPTH + 5):
+        inner = der(0x04, der(0x30, inner))
+    contents = list(iter_octet_strings(inner))
+    assert b"x" not in [bytes(c) for c in contents]
+
+
+def test_max_nodes():
+    data = der(0x30, der(0x04, b"a") * 1000)
+    assert len(list(iter_octet_strings(data, max_nodes=100))) < 100
+    assert len(list(iter_octet_strings(data))) == 1000
+
+
+def test_random_bytes():
+    rnd = random.Random(0)
+    for _ in range(500):
+        data = bytes(rnd.randrange(256) for _ in range(rnd.randrange(1, 200)))
+        for content in iter_octet_strings(data):
+            assert len(content) <= len(data)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/20 01:10
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 签章快速解析 OFD.extract_seals，样本由 test/data/make_fixtures.py 生成，python -m pytest test/test_seal_parser.py
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from fastofd.draw.find_seal_img import SealExtract
+from fastofd.ofd import OFD
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SIGNER = {
+    "provider": {"ProviderName": "fastofd", "Company": "fastofd test", "Version": "1.0"},
+    "signature_method": "1.2.156.10197.1.501",
+    "signature_datetime": "20261019120000Z",
+    "seal_loc": "Seal.esl",
+}
+
+
+@pytest.fixture(scope="module")
+def seal_ofd():
+    with open(os.path.join(DATA_DIR, "seal.ofd"), "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    """记录 SealExtract 解码的签章值"""
+    calls = []
+    extract = SealExtract.__call__
+
+    def counting(self, path="", b64="", data=None):
+        calls.append(data)
+        return extract(self, path=path, b64=b64, data=data)
+
+    monkeypatch.setattr(SealExtract, "__call__", counting)
+    return calls
+
+
+def test_pages_and_boundaries(seal_ofd):
+    seals = OFD().extract_seals(seal_ofd, fmt="binary", image_format=None)
+    assert [(s["signature_id"], s["page"], s["page_id"], s["boundary"]) for s in seals] == [
+        ("1", 0, "100", [190.0, 100.0, 40.0, 40.0]),
+        ("1", 1, "101", [0.0, 100.0, 40.0, 40.0]),
+        ("1", 2, "102", [-20.0, 100.0, 40.0, 40.0]),
+        ("2", 1, "101", [120.5, 200.0, 42.0, 42.0]),
+    ]
+    # 绝对路径与相对 Signature.xml 所在目录的 SignedValue 都能定位
+    assert [s["seal_ref"] for s in seals] == ["Doc_0/Signs/Sign_0/SignedValue.dat"] * 3 + [
+        "Doc_0/Signs/Sign_1/SignedValue.dat"]
+    assert [s["signature_loc"] for s in seals] == ["Doc_0/Signs/Sign_0/Signature.xml"] * 3 + [
+        "Doc_0/Signs/Sign_1/Signature.xml"]
+    for seal in seals:
+        assert {key: seal[key] for key in SIGNER} == SIGNER
+        assert (seal["doc_no"], seal["signature_type"], seal["image"]) == (0, "Seal", None)
+
+
+def test_png_image(seal_ofd):
+    seals = OFD().extract_seals(seal_ofd, fmt="binary", image_format="png")
+    assert len(seals) == 4
+    for seal in seals:
+        assert seal["image"][:8] == b"\x89PNG\r\n\x1a\n"
+        with Image.open(io.BytesIO(seal["image"])) as image:
+            assert image.size == (96, 96)
+
+
+def test_cross_page_seal_decoded_once(seal_ofd, decode_calls):
+    seals = OFD().extract_seals(io.BytesIO(seal_ofd), fmt="io")
+    # 四处签章位置、两个签章值，骑缝章只解码一次，各页共享同一图片对象
+    assert len(decode_calls) == 2
+    assert all(isinstance(seal["image"], Image.Image) for seal in seals)
+    assert seals[0]["image"] is seals[1]["image"] is seals[2]["image"]
+    assert seals[3]["image"] is not seals[0]["image"]
+
+
+def test_metadata_only(seal_ofd, decode_calls):
+    assert len(OFD().extract_seals(seal_ofd, fmt="binary", image_format=None)) == 4
+    assert decode_calls == []
+
+
+def test_no_signatures():
+    with open(os.path.join(DATA_DIR, "invoice_layout.ofd"), "rb") as f:
+        assert OFD().extract_seals(f.read(), fmt="binary") == []
+
+
+def test_invalid_image_format(seal_ofd):
+    with pytest.raises(AssertionError):
+        OFD().extract_seals(seal_ofd, fmt="binary", image_format="jpeg")
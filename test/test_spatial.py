@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 22:20
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 网格空间索引与暴力查询对比，python -m pytest test/test_spatial.py
+import math
+import random
+
+import pytest
+
+from fastofd.extract.spatial import GridIndex, box_distance
+
+
+def brute_query(boxes, rect, contain=False):
+    x0, y0, x1, y1 = rect
+    if contain:
+        return [i for i, b in enumerate(boxes) if b[0] >= x0 and b[1] >= y0 and b[2] <= x1 and b[3] <= y1]
+    return [i for i, b in enumerate(boxes) if b[0] <= x1 and b[2] >= x0 and b[1] <= y1 and b[3] >= y0]
+
+
+@pytest.fixture(scope="module")
+def grid_boxes():
+    rnd = random.Random(7)
+    boxes = []
+    for _ in range(400):
+        x, y = rnd.uniform(0, 210), rnd.uniform(0, 297)
+        boxes.append([x, y, x + rnd.uniform(0, 30), y + rnd.uniform(0, 8)])
+    # 整页背景、远超页面的对象、无穷大坐标
+    boxes += [[0, 0, 210, 297], [-5000, -5000, 5000, 5000], [10, 10, math.inf, 20]]
+    grid = GridIndex(cell=10)
+    for box in boxes:
+        grid.insert(box)
+    return grid, boxes
+
+
+def test_large_objects_not_in_cells(grid_boxes):
+    grid, boxes = grid_boxes
+    assert set(grid._large) == {400, 401, 402}
+    assert max(len(ids) for ids in grid._cells.values()) < len(boxes)
+    i0, j0, i1, j1 = grid._bounds
+    assert (i1 - i0 + 1) * (j1 - j0 + 1) < 1000
+
+
+def test_query_matches_brute_force(grid_boxes):
+    grid, boxes = grid_boxes
+    rnd = random.Random(8)
+    rects = [[-math.inf, -math.inf, math.inf, math.inf], [1e9, 1e9, 1e9 + 1, 1e9 + 1], [-1e12, 50, 1e12, 60]]
+    for _ in range(200):
+        x, y = rnd.uniform(-50, 260), rnd.uniform(-50, 350)
+        rects.append([x, y, x + rnd.uniform(0, 80), y + rnd.uniform(0, 80)])
+    for rect in rects:
+        assert grid.query_ids(rect) == brute_query(boxes, rect)
+        assert grid.query_ids(rect, contain=True) == brute_query(boxes, rect, contain=True)
+
+
+def test_nearest_matches_brute_force(grid_boxes):
+    grid, boxes = grid_boxes
+    rnd = random.Random(9)
+    points = [(1e7, -1e7), (-300, 100)] + [(rnd.uniform(-50, 260), rnd.uniform(-50, 350)) for _ in range(200)]
+    for x, y in points:
+        expect = sorted(box_distance(b, x, y) for b in boxes)[:3]
+        got = [dist for dist, _ in grid.nearest(x, y, k=3)]
+        assert got == pytest.approx(expect)
+
+
+def test_empty_and_only_large():
+    grid = GridIndex(cell=5)
+    assert grid.query([0, 0, 10, 10]) == []
+    assert grid.nearest(1, 1) == []
+    grid.insert([0, 0, 1000, 1000], "page")
+    assert grid._bounds is None
+    assert grid.query([1, 1, 2, 2]) == ["page"]
+    assert grid.at(500, 500) == ["page"]
+    assert grid.nearest(2000, 1000) == [(1000.0, "page")]
+    assert grid.nearest(math.nan, 0) == []
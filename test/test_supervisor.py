@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/20 00:35
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 受监管子进程：超时、崩溃、内存上限、定期重启，python -m pytest test/test_supervisor.py
+import os
+import time
+
+import pytest
+
+from fastofd.supervisor import SupervisedWorker, resource, run_isolated
+
+
+def pid():
+    return os.getpid()
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def crash():
+    os._exit(3)
+
+
+def fail():
+    raise ValueError("bad input")
+
+
+def allocate(mb):
+    return len(bytearray(mb * 1024 * 1024))
+
+
+def vm_size_mb():
+    """当前进程地址空间大小，子进程 fork 后与之相同"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmSize:"):
+                return int(line.split()[1]) // 1024
+    return None
+
+
+def test_timeout_kill_and_restart():
+    with SupervisedWorker(timeout=1) as worker:
+        first = worker.run(pid)["result"]
+        start = time.time()
+        reply = worker.run(sleep, 30)
+        assert reply["status"] == "error" and reply["error_type"] == "timeout"
+        assert time.time() - start < 10
+        assert worker.restarts == 1
+        # 超时的子进程已被杀掉，新的子进程继续服务
+        reply = worker.run(pid)
+        assert reply["status"] == "ok" and reply["result"] != first
+        assert worker.run(sleep, 0)["status"] == "ok"
+
+
+def test_crash_and_exception():
+    with SupervisedWorker(timeout=10) as worker:
+        first = worker.run(pid)["result"]
+        reply = worker.run(crash)
+        assert (reply["status"], reply["error_type"]) == ("error", "crash")
+        assert "exitcode=3" in reply["error"]
+        second = worker.run(pid)["result"]
+        assert second != first
+        # 普通异常只回传错误，子进程不重启
+        reply = worker.run(fail)
+        assert (reply["error_type"], reply["error"]) == ("exception", "ValueError: bad input")
+        assert "Traceback" in reply["traceback"]
+        assert worker.run(pid)["result"] == second and worker.restarts == 1
+
+
+@pytest.mark.skipif(resource is None or vm_size_mb() is None, reason="需要 RLIMIT_AS 与 /proc")
+def test_memory_limit():
+    with SupervisedWorker(timeout=30, memory_limit_mb=vm_size_mb() + 256) as worker:
+        first = worker.run(pid)["result"]
+        assert worker.run(allocate, 64)["result"] == 64 * 1024 * 1024
+        reply = worker.run(allocate, 1024)
+        assert (reply["status"], reply["error_type"]) == ("error", "memory")
+        # 内存耗尽后重启子进程
+        assert worker.restarts == 1
+        reply = worker.run(allocate, 64)
+        assert reply["status"] == "ok"
+        assert worker.run(pid)["result"] != first
+
+
+def test_max_jobs_recycle():
+    with SupervisedWorker(timeout=10, max_jobs=2) as worker:
+        pids = [worker.run(pid)["result"] for _ in range(5)]
+    assert pids[0] == pids[1] and pids[2] == pids[3] and pids[1] != pids[2] != pids[4]
+    assert worker.restarts == 2
+
+
+def test_run_isolated():
+    assert run_isolated(pid)["result"] != os.getpid()
+    assert run_isolated(sleep, 30, timeout=1)["error_type"] == "timeout"
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 22:50
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 基于线段的表格识别：合并单元格与非表格线段，python -m pytest test/test_table.py
+import random
+
+from fastofd.ofd import OFD
+from fastofd.extract.table import page_tables
+
+from ofd_builder import build_ofd, path_object, text_object
+
+
+def extract(objects):
+    ofd = OFD()
+    ofd.read(build_ofd([objects]), fmt="binary")
+    return ofd.extract_tables()[0]["tables"]
+
+
+def grid(xs, ys, skip=()):
+    """xs / ys 围成的完整网格线段，skip 中的 (方向, 线序号, 段序号) 不画，用于构造合并单元格"""
+    objects, oid = [], 1000
+    for r, y in enumerate(ys):
+        for c in range(len(xs) - 1):
+            if ("h", r, c) not in skip:
+                objects.append(path_object(oid, xs[c], y, xs[c + 1], y))
+            oid += 1
+    for c, x in enumerate(xs):
+        for r in range(len(ys) - 1):
+            if ("v", c, r) not in skip:
+                objects.append(path_object(oid, x, ys[r], x, ys[r + 1]))
+            oid += 1
+    return "".join(objects)
+
+
+def cell_text(oid, x, y, text):
+    return text_object(oid, x + 2, y + 2, text, size=3, delta_x="g 20 3", width=30, height=4)
+
+
+def test_simple_table():
+    xs, ys = [10, 50, 90, 130], [20, 30, 40]
+    texts = "".join(cell_text(2000 + i, xs[c], ys[r], f"r{r}c{c}") for i, (r, c) in
+                    enumerate((r, c) for r in range(2) for c in range(3)))
+    tables = extract(grid(xs, ys) + texts)
+    assert len(tables) == 1
+    table = tables[0]
+    assert (table["rows"], table["cols"]) == (2, 3)
+    assert table["bbox"] == [10, 20, 130, 40]
+    assert table["data"] == [["r0c0", "r0c1", "r0c2"], ["r1c0", "r1c1", "r1c2"]]
+
+
+def test_spans():
+    """表头跨两列，首列跨两行：缺少的分隔线合并格子，被合并的位置 data 为 None"""
+    xs, ys = [10, 50, 90, 130], [20, 30, 40, 50]
+    skip = {("v", 2, 0), ("h", 2, 0)}
+    texts = (cell_text(2000, 10, 20, "项目") + cell_text(2001, 50, 20, "金额合计")
+             + cell_text(2002, 10, 30, "服务费") + cell_text(2003, 50, 30, "100") + cell_text(2004, 90, 30, "13"))
+    table = extract(grid(xs, ys, skip=skip) + texts)[0]
+    spans = {(c["row"], c["col"]): (c["rowspan"], c["colspan"]) for c in table["cells"]}
+    assert spans[(0, 1)] == (1, 2)
+    assert spans[(1, 0)] == (2, 1)
+    assert len(table["cells"]) == 7
+    assert table["data"][0] == ["项目", "金额合计", None]
+    assert table["data"][1] == ["服务费", "100", "13"]
+    assert table["data"][2] == [None, "", ""]
+
+
+def test_empty_grid_not_table():
+    """没有文本的网格（装饰线框、空白网格）不返回"""
+    assert extract(grid([10, 50, 90], [20, 30, 40])) == []
+
+
+def test_open_frame_not_table():
+    """外框不闭合的线段组不视为表格"""
+    objects = (path_object(1, 10, 20, 100, 20) + path_object(2, 10, 40, 100, 40)
+               + path_object(3, 30, 15, 30, 45) + path_object(4, 70, 15, 70, 45)
+               + cell_text(5, 30, 20, "文本") + cell_text(6, 70, 25, "文本"))
+    assert extract(objects) == []
+
+
+def test_underline_and_box_not_table():
+    """下划线、单个方框不构成表格"""
+    objects = (path_object(1, 10, 30, 80, 30) + cell_text(2, 10, 24, "签字")
+               + grid([100, 150], [100, 120]) + cell_text(3, 100, 100, "备注"))
+    assert extract(objects) == []
+
+
+def random_page(seed, segments=30):
+    rnd = random.Random(seed)
+    line_list, text_list = [], []
+    for i in range(segments):
+        x, y, length = rnd.uniform(0, 200), rnd.uniform(0, 290), rnd.uniform(5, 100)
+        if i % 2:
+            line_list.append({"pos": [x, y, length, 0.3], "AbbreviatedData": f"M 0 0 L {length} 0"})
+        else:
+            line_list.append({"pos": [x, y, 0.3, length], "AbbreviatedData": f"M 0 0 L 0 {length}"})
+    for _ in range(40):
+        text_list.append({"text": "随机文本", "pos": [rnd.uniform(0, 200), rnd.uniform(0, 290), 12, 4],
+                          "size": 3, "X": "0", "Y": "3", "DeltaX": "g 3 3"})
+    return {"line_list": line_list, "text_list": text_list}
+
+
+def test_random_paths_not_table():
+    """随机线段偶然相交形成的分组不视为表格"""
+    found = sum(len(page_tables(random_page(seed, segments))) for seed in range(100) for segments in (10, 30, 60))
+    assert found == 0
+
+
+def test_extended_frame_line():
+    """外框线延伸出表格（角上为 T 形）时仍识别"""
+    xs, ys = [10, 50, 90], [20, 30, 40]
+    objects = grid(xs, ys) + path_object(1, 90, 20, 200, 20) + cell_text(2, 10, 20, "名称") + cell_text(3, 50, 30, "值")
+    tables = extract(objects)
+    assert len(tables) == 1
+    assert tables[0]["data"] == [["名称", ""], ["", "值"]]
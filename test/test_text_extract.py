@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# PROJECT_NAME: fastofd
+# CREATE_TIME: 2026/10/19 21:50
+# E_MAIL: wohen@nivbi.com
+# AUTHOR: ihadyou
+# NOTE: 模板合并与免绘制文本抽取，python -m pytest test/test_text_extract.py
+import pytest
+
+from fastofd.ofd import OFD
+from fastofd.extract import text as text_extract
+from fastofd.extract.glyphs import expand_delta, glyph_boxes, run_glyphs
+
+from ofd_builder import build_ofd, text_object
+
+
+def parse(ofd_bytes):
+    ofd = OFD()
+    ofd.read(ofd_bytes, fmt="binary")
+    return ofd
+
+
+def page_texts(ofd):
+    """{页码: [文本对象内容，按列表顺序]}"""
+    return {pg_no: [t["text"] for t in page["text_list"]] for pg_no, page in ofd.data[0]["page_info"].items()}
+
+
+TPL_A = (2, text_object(30, 10, 10, "A"), None)
+TPL_B = (3, text_object(31, 10, 20, "B"), None)
+
+
+def test_template_per_page():
+    """模板只合并到通过 TemplateID 引用它的页面"""
+    ofd = parse(build_ofd([
+        (text_object(20, 10, 80, "P0"), [(2, None)]),
+        (text_object(21, 10, 80, "P1"), [(3, None)]),
+        text_object(22, 10, 80, "P2"),
+    ], templates=[TPL_A, TPL_B]))
+    assert page_texts(ofd) == {0: ["A", "P0"], 1: ["B", "P1"], 2: ["P2"]}
+
+
+def test_template_without_reference():
+    """所有页面都未声明引用时，文档模板合并到每一页"""
+    ofd = parse(build_ofd([text_object(20, 10, 80, "P0"), text_object(21, 10, 80, "P1")],
+                          templates=[TPL_A, TPL_B]))
+    assert page_texts(ofd) == {0: ["A", "B", "P0"], 1: ["A", "B", "P1"]}
+
+
+def test_multi_template_zorder():
+    """背景模板在页面内容之前，前景模板在之后，各自按引用顺序；页面引用的 ZOrder 优先于 Document.xml"""
+    tpl_c = (4, text_object(32, 10, 30, "C"), "Foreground")
+    ofd = parse(build_ofd([
+        (text_object(20, 10, 80, "P0"), [(4, None), (3, None), (2, None)]),
+        (text_object(21, 10, 80, "P1"), [(2, "Foreground"), (4, "Background")]),
+    ], templates=[TPL_A, TPL_B, tpl_c]))
+    assert page_texts(ofd) == {0: ["B", "A", "P0", "C"], 1: ["C", "P1", "A"]}
+
+
+def test_template_not_resorted():
+    """合并不按坐标重排，页面内容保持绘制顺序"""
+    ofd = parse(build_ofd([(text_object(20, 10, 80, "下") + text_object(21, 10, 5, "上"), [(2, None)])],
+                          templates=[TPL_A]))
+    assert page_texts(ofd) == {0: ["A", "下", "上"]}
+
+
+def test_expand_delta():
+    assert expand_delta("g 3 2.5 1") == [2.5, 2.5, 2.5, 1.0]
+    assert expand_delta("1 g 2 0.5") == [1.0, 0.5, 0.5]
+    assert expand_delta("") == []
+
+
+def test_delta_g_with_ctm():
+    """DeltaX 的 g 展开后与 CTM 缩放一起作用于逐字坐标"""
+    ofd = parse(build_ofd([text_object(20, 10, 50, "一二三四", size=2, delta_x="g 3 2.5", ctm="2 0 0 2 0 0")]))
+    text_d = ofd.data[0]["page_info"][0]["text_list"][0]
+    xs, ys, size = run_glyphs(text_d)
+    assert xs == pytest.approx([10, 15, 20, 25])
+    assert ys == pytest.approx([54] * 4)
+    assert size == pytest.approx(4)
+    boxes = glyph_boxes(text_d)
+    assert [char for char, _ in boxes] == list("一二三四")
+    assert boxes[0][1][2] == pytest.approx(15)
+    # 最后一个全角字按一个字号估算宽度
+    assert boxes[-1][1][2] == pytest.approx(29)
+
+
+def test_lines_and_words():
+    """同一基线的文本对象合为一行，大间距分词，空格分词，不同基线分行"""
+    ofd = parse(build_ofd([
+        text_object(20, 10, 20, "名称", delta_x="4")
+        + text_object(21, 40, 20, "fastofd", delta_x="g 6 2")
+        + text_object(22, 10, 30, "a b", delta_x="2 2"),
+    ]))
+    pages = list(ofd.iter_text(layout=False))
+    assert len(pages) == 1
+    lines = pages[0]["lines"]
+    assert [line["text"] for line in lines] == ["名称 fastofd", "a b"]
+    assert [word["text"] for word in lines[0]["words"]] == ["名称", "fastofd"]
+    name_box = lines[0]["words"][0]["bbox"]
+    assert name_box[0] == pytest.approx(10)
+    assert name_box[2] == pytest.approx(18)
+    assert lines[0]["bbox"][1] < lines[1]["bbox"][1]
+    assert pages[0]["size"] == [210.0, 297.0]
+
+
+def test_glyph_boxes_output():
+    ofd = parse(build_ofd([text_object(20, 10, 20, "ab", delta_x="2")]))
+    word = next(ofd.iter_text(layout=False, glyphs=True))["lines"][0]["words"][0]
+    assert [g["text"] for g in word["glyphs"]] == ["a", "b"]
+    assert word["glyphs"][0]["bbox"][2] == pytest.approx(12)
+
+
+def test_to_text_pages():
+    ofd = parse(build_ofd([
+        text_object(20, 10, 20, "第一行") + text_object(21, 10, 30, "第二行"),
+        text_object(22, 10, 20, "第二页"),
+    ]))
+    assert ofd.extract_text(layout=False) == "第一行\n第二行\f第二页"
+    assert ofd.extract_text(page_list=1, layout=False) == "第二页"
+
+
+def test_to_hocr():
+    ofd = parse(build_ofd([text_object(20, 25.4, 25.4, "x<y", delta_x="g 2 2.54")]))
+    hocr = ofd.extract_text(fmt="hocr", layout=False, dpi=100)
+    assert "class='ocr_page' id='page_1' title='bbox 0 0 827 1169; ppageno 0'" in hocr
+    assert hocr.count("class='ocr_line'") == 1
+    assert "class='ocrx_word' id='word_1_1_1' title='bbox 100 " in hocr
+    assert ">x&lt;y</span>" in hocr
+
+
+def test_page_text_empty():
+    assert text_extract.page_text([]) == []
+    assert text_extract.page_text([{"text": "   ", "pos": [0, 0, 10, 5], "size": 4}]) == []